@@ -0,0 +1,99 @@
+"""
+Цикл агента целиком: граф из main.py с фейковой моделью, которая проигрывает
+траекторию вызовов инструментов. Сеть не нужна; время вызовов модели
+вычитается, так что в отчете остаются накладные расходы графа, инструментов
+и управления контекстом.
+"""
+
+import io
+import os
+import tempfile
+from typing import Any
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks.harness import benchmark
+from modules.utils import telemetry
+from modules.utils.fake_llm import replay_trajectory, tool_call_turn
+from modules.utils.streaming import stream_turn
+
+TURNS = 40
+
+
+def edit_trajectory(files: list[str]) -> list[AIMessage]:
+    """Типичный ход: осмотреться, прочитать файлы, поправить один, ответить."""
+    target = files[0]
+    return [
+        tool_call_turn(
+            [
+                ("ListDirectory", {"path": os.path.dirname(target)}),
+                ("ReadFile", {"path": target}),
+                ("ReadFile", {"path": files[1]}),
+            ],
+            prefix="look",
+        ),
+        tool_call_turn(
+            [
+                (
+                    "ReplaceInFile",
+                    {
+                        "path": target,
+                        "old_string": "def handler(request):",
+                        "new_string": "def handler(request):",
+                        "replace_all": True,
+                    },
+                ),
+                (
+                    "WriteFile",
+                    {"path": "bench_agent/notes.md", "content": "# Заметки\n"},
+                ),
+            ],
+            prefix="edit",
+        ),
+        AIMessage(content="Готово: обработчики обновлены, заметки записаны."),
+    ]
+
+
+@benchmark("agent_turn")
+def bench_agent_turn(ctx: dict[str, Any]) -> dict[str, Any]:
+    from main import build_agent
+
+    agent = build_agent(
+        replay_trajectory(edit_trajectory(ctx["files"]), repeat=True), InMemorySaver()
+    )
+    telemetry_path = os.path.join(tempfile.mkdtemp(), "telemetry.jsonl")
+    handler = telemetry.TelemetryHandler(telemetry_path)
+    config = {"configurable": {"thread_id": "bench"}, "callbacks": [handler]}
+
+    for turn in range(TURNS):
+        handler.start_turn("bench")
+        stream_turn(
+            agent,
+            [HumanMessage(f"Обнови обработчики, попытка {turn}")],
+            config,
+            io.StringIO(),
+        )
+        handler.end_turn()
+
+    turns: list[float] = []
+    llm_ms: dict[str, float] = {}
+    for span in telemetry.read_spans(telemetry_path):
+        if span["kind"] == "turn":
+            turns.append(
+                (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e6
+            )
+            llm_ms[span["trace_id"]] = 0.0
+        elif span["kind"] == "llm":
+            llm_ms[span["trace_id"]] += span["attributes"]["duration_ms"]
+    overheads = [
+        turn_ms - model_ms for turn_ms, model_ms in zip(turns, llm_ms.values())
+    ]
+    total_s = sum(turns) / 1000
+    return {
+        "ops": len(turns),
+        "ops_per_sec": len(turns) / total_s,
+        "mean_ms": sum(turns) / len(turns),
+        "overhead_p50_ms": telemetry.percentile(overheads, 50),
+        "overhead_p95_ms": telemetry.percentile(overheads, 95),
+    }
@@ -0,0 +1,49 @@
+"""Запуск тестов проекта агента: обычный подпроцесс против теплого пула."""
+
+import os
+import sys
+from typing import Any
+
+from benchmarks.harness import benchmark, measure
+from modules.utils import runner
+
+PROJECT_TESTS = """
+import json
+
+
+def test_roundtrip():
+    assert json.loads(json.dumps({"a": 1})) == {"a": 1}
+
+
+def test_sum():
+    assert sum(range(10)) == 45
+"""
+
+
+def _project(ctx: dict[str, Any]) -> str:
+    path = os.path.join(ctx["root"], "runner_project")
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "test_project.py"), "w", encoding="utf-8") as f:
+        f.write(PROJECT_TESTS)
+    return path
+
+
+def _run_pytest(path: str, warm: bool) -> None:
+    # pytest агента явно, чтобы результат не зависел от PATH.
+    argv = [sys.executable, "-m", "pytest", "-q"]
+    result = runner.run(argv, path, timeout=60, warm=warm)
+    assert result.exit_code == 0, result.output
+
+
+@benchmark("run_tests_cold")
+def bench_run_tests_cold(ctx: dict[str, Any]) -> dict[str, Any]:
+    path = _project(ctx)
+    return measure(lambda i: _run_pytest(path, warm=False), min_ops=5)
+
+
+@benchmark("run_tests_warm")
+def bench_run_tests_warm(ctx: dict[str, Any]) -> dict[str, Any]:
+    path = _project(ctx)
+    # Первый запуск ждет, пока сервер импортирует pytest и его плагины.
+    _run_pytest(path, warm=True)
+    return measure(lambda i: _run_pytest(path, warm=True), min_ops=5)
@@ -0,0 +1,89 @@
+"""
+Время запуска CLI: от старта процесса до приглашения 'Вы: ' и разбор
+python -X importtime по самым дорогим импортам.
+
+    python -m benchmarks.bench_startup
+"""
+
+import os
+import subprocess
+import sys
+import time
+from typing import Any
+
+from benchmarks.harness import benchmark
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = "Вы: ".encode()
+TARGET_MS = 1000
+LAUNCHES = 5
+
+
+def _env() -> dict[str, str]:
+    # Без записи состояния в репозиторий и без сетевых вызовов.
+    return {**os.environ, "CHECKPOINTER": "memory", "TELEMETRY_ENABLED": "false"}
+
+
+def time_to_prompt() -> float:
+    """Миллисекунды от запуска main.py до приглашения ввода."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=REPO_ROOT,
+        env=_env(),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    output = b""
+    while PROMPT not in output:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            raise RuntimeError("main.py завершился, не показав приглашение.")
+        output += chunk
+    elapsed = (time.perf_counter() - started) * 1000
+    process.communicate("выход\n".encode())
+    return elapsed
+
+
+def slowest_imports(top: int = 15) -> list[tuple[str, int]]:
+    """Модули с наибольшим накопленным временем импорта (мкс) при импорте main."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=REPO_ROOT,
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        rows.append((name.rstrip(), int(cumulative)))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+
+@benchmark("startup")
+def bench_startup(ctx: dict[str, Any]) -> dict[str, Any]:
+    times = sorted(time_to_prompt() for _ in range(LAUNCHES))
+    mean_ms = sum(times) / len(times)
+    return {
+        "ops": len(times),
+        "ops_per_sec": 1000 / mean_ms,
+        "mean_ms": mean_ms,
+        "prompt_p50_ms": times[len(times) // 2],
+        "under_target": times[len(times) // 2] < TARGET_MS,
+    }
+
+
+if __name__ == "__main__":
+    times = sorted(time_to_prompt() for _ in range(LAUNCHES))
+    print(
+        f"До приглашения: p50 {times[len(times) // 2]:.0f} мс, "
+        f"min {times[0]:.0f} мс, max {times[-1]:.0f} мс (цель < {TARGET_MS} мс)"
+    )
+    print("\nСамые дорогие импорты main (накопленно):")
+    for name, cumulative in slowest_imports():
+        print(f"{cumulative / 1000:>8.1f} мс  {name}")
@@ -0,0 +1,136 @@
+"""Микробенчмарки файловых инструментов и менеджера контекста."""
+
+import os
+from typing import Any
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.harness import benchmark, measure
+from modules.utils import line_index, outline_index, tools
+from modules.utils.context import ContextManager
+
+
+@benchmark("safe_path")
+def bench_safe_path(ctx: dict[str, Any]) -> dict[str, Any]:
+    paths = ctx["files"][:1000] + [ctx["deep_dir"]]
+    return measure(lambda i: tools._get_safe_path(paths[i % len(paths)]))
+
+
+@benchmark("read_file_small")
+def bench_read_file_small(ctx: dict[str, Any]) -> dict[str, Any]:
+    paths = ctx["files"]
+    # Шаг 7919 (простое число) обходит файлы вразброс, мимо кэша индексов строк.
+    return measure(lambda i: tools.read_file(paths[i * 7919 % len(paths)]))
+
+
+@benchmark("read_file_large_window")
+def bench_read_file_large_window(ctx: dict[str, Any]) -> dict[str, Any]:
+    big = ctx["large_file"]
+    total = line_index.get_line_index(tools._get_safe_path(big)).line_count
+    return measure(
+        lambda i: tools.read_file(big, offset=(i * 104_729) % total + 1, limit=200)
+    )
+
+
+@benchmark("read_file_large_cold")
+def bench_read_file_large_cold(ctx: dict[str, Any]) -> dict[str, Any]:
+    big = ctx["large_file"]
+    safe_path = tools._get_safe_path(big)
+
+    def cold_read(i: int) -> None:
+        line_index.invalidate(safe_path)
+        tools.read_file(big, offset=1, limit=200)
+
+    return measure(cold_read, min_ops=2)
+
+
+@benchmark("write_file_small")
+def bench_write_file_small(ctx: dict[str, Any]) -> dict[str, Any]:
+    """Каждая запись меняет содержимое, поэтому файл действительно переписывается."""
+    body = "print('hello')\n" * 50
+    return measure(
+        lambda i: tools.write_file(f"bench_writes/file{i % 500}.py", f"# {i}\n{body}")
+    )
+
+
+@benchmark("write_file_unchanged")
+def bench_write_file_unchanged(ctx: dict[str, Any]) -> dict[str, Any]:
+    """Повторная запись того же содержимого: сравнение и пропуск без записи."""
+    content = "print('hello')\n" * 50
+    for n in range(500):
+        tools.write_file(f"bench_unchanged/file{n}.py", content)
+    return measure(
+        lambda i: tools.write_file(f"bench_unchanged/file{i % 500}.py", content)
+    )
+
+
+@benchmark("list_directory_tree_many")
+def bench_list_directory_tree_many(ctx: dict[str, Any]) -> dict[str, Any]:
+    return measure(lambda i: tools.list_directory_tree("src"))
+
+
+@benchmark("list_directory_tree_deep")
+def bench_list_directory_tree_deep(ctx: dict[str, Any]) -> dict[str, Any]:
+    return measure(lambda i: tools.list_directory_tree("deep", max_depth=64))
+
+
+@benchmark("repo_map_cold")
+def bench_repo_map_cold(ctx: dict[str, Any]) -> dict[str, Any]:
+    """Первое построение карты: обход и разбор всех модулей пакета."""
+
+    def cold(i: int) -> None:
+        outline_index._indexes.clear()
+        tools.repo_map(ctx["py_package"])
+
+    return measure(cold, min_ops=2)
+
+
+@benchmark("repo_map_warm")
+def bench_repo_map_warm(ctx: dict[str, Any]) -> dict[str, Any]:
+    tools.repo_map(ctx["py_package"])
+    return measure(lambda i: tools.repo_map(ctx["py_package"]))
+
+
+def _synthetic_turn(i: int) -> list:
+    call_id = f"call-{i}"
+    return [
+        HumanMessage(f"Задача {i}: " + "подробности " * 40, id=f"h{i}"),
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "ReadFile", "args": {"path": f"f{i}.py"}, "id": call_id}
+            ],
+            id=f"a{i}",
+        ),
+        ToolMessage("код " * 300, tool_call_id=call_id, id=f"t{i}"),
+        AIMessage("Готово: " + "пояснение " * 30, id=f"r{i}"),
+    ]
+
+
+@benchmark("manage_context")
+def bench_manage_context(ctx: dict[str, Any]) -> dict[str, Any]:
+    """Каждая операция — новый ход в растущей истории и сжатие окна."""
+    manager = ContextManager(token_budget=32_000, summary_max_tokens=2_000)
+    history = [HumanMessage("Исходная задача", id="first")]
+
+    def step(i: int) -> None:
+        history.extend(_synthetic_turn(i))
+        manager.manage(history)
+
+    result = measure(step)
+    result["history_messages"] = len(history)
+    return result
+
+
+def prepare(root: str, quick: bool) -> dict[str, Any]:
+    """Создает синтетические рабочие директории и возвращает их описание."""
+    from benchmarks import workspaces
+
+    os.makedirs(root, exist_ok=True)
+    return {
+        "root": root,
+        "files": workspaces.make_many_files(root, 1_000 if quick else 10_000),
+        "large_file": workspaces.make_large_file(root, 10 if quick else 100),
+        "deep_dir": workspaces.make_deep_tree(root, 10 if quick else 20),
+        "py_package": workspaces.make_python_package(root, 500 if quick else 5_000),
+    }
@@ -0,0 +1,45 @@
+import resource
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+BENCHMARKS: dict[str, Callable[[dict[str, Any]], dict[str, Any]]] = {}
+
+
+def benchmark(name: str):
+    """Регистрирует функцию бенчмарка: она получает описание рабочей директории."""
+
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def measure(
+    func: Callable[[int], Any], min_time: float = 1.0, min_ops: int = 3
+) -> dict[str, float]:
+    """
+    Вызывает func(i) до тех пор, пока не пройдет min_time секунд
+    и не наберется min_ops вызовов.
+    """
+    ops = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while ops < min_ops or elapsed < min_time:
+        func(ops)
+        ops += 1
+        elapsed = time.perf_counter() - started
+    return {
+        "ops": ops,
+        "ops_per_sec": ops / elapsed,
+        "mean_ms": elapsed / ops * 1000,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS текущего процесса в мегабайтах."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS — байты.
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
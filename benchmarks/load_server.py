@@ -0,0 +1,131 @@
+"""
+Нагрузочный прогон серверного режима: N одновременных клиентов, у каждого
+своя сессия и несколько ходов через SSE. Модель фейковая (ReactiveChatModel)
+с задержкой, имитирующей API; запросы идут в ASGI-приложение в том же
+процессе, так что меряется сам сервер — очередь ходов, лимит вызовов модели,
+граф и инструменты, — а не сетевой стек.
+
+    python -m benchmarks.load_server --clients 50 --turns 3
+    python -m benchmarks.load_server --clients 200 --llm-latency 0.2 --llm-concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from modules.server.app import AgentServer
+from modules.server.asgi_client import request
+from modules.utils.fake_llm import ReactiveChatModel
+from modules.utils.telemetry import percentile
+
+
+async def client(server: AgentServer, index: int, turns: int, stats: dict) -> None:
+    session_id = f"load-{index}"
+    started = time.perf_counter()
+    created = await request(server, "POST", "/sessions", {"session_id": session_id})
+    if created.status != 201:
+        stats["rejected"] += 1
+        return
+    for turn in range(turns):
+        sent = time.perf_counter()
+        response = await request(
+            server,
+            "POST",
+            f"/sessions/{session_id}/messages",
+            {"message": f"ход {turn}"},
+        )
+        if response.status != 200:
+            stats["rejected"] += 1
+            continue
+        if not response.events or response.events[-1][1]["type"] != "done":
+            stats["errors"] += 1
+            continue
+        stats["latency_ms"].append((response.events[-1][0] - sent) * 1000)
+        stats["first_event_ms"].append((response.events[0][0] - sent) * 1000)
+    await request(server, "DELETE", f"/sessions/{session_id}")
+    stats["session_ms"].append((time.perf_counter() - started) * 1000)
+
+
+async def run(args: argparse.Namespace, workspaces_dir: str) -> dict:
+    model = ReactiveChatModel(
+        tool_calls=[
+            ("WriteFile", {"path": "notes.txt", "content": "x" * args.file_bytes}),
+            ("ReadFile", {"path": "notes.txt"}),
+        ],
+        reply="Заметка сохранена и проверена.",
+        latency=args.llm_latency,
+    )
+    server = AgentServer(
+        model=model,
+        checkpointer=InMemorySaver(),
+        workspaces_dir=workspaces_dir,
+        max_sessions=args.clients,
+        max_active_turns=args.max_active,
+        max_queued_turns=args.max_queued,
+        llm_max_concurrency=args.llm_concurrency,
+        telemetry=False,
+    )
+    await server.get_agent()
+    stats = {
+        "latency_ms": [],
+        "first_event_ms": [],
+        "session_ms": [],
+        "rejected": 0,
+        "errors": 0,
+    }
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(client(server, i, args.turns, stats) for i in range(args.clients))
+    )
+    stats["elapsed_s"] = time.perf_counter() - started
+    stats["llm"] = server.llm_limiter.stats()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3, help="ходов на сессию")
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.05, help="задержка модели, с"
+    )
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--max-active", type=int, default=32)
+    parser.add_argument("--max-queued", type=int, default=1024)
+    parser.add_argument("--file-bytes", type=int, default=2048)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="agent-load-") as root:
+        stats = asyncio.run(run(args, os.path.join(root, "sessions")))
+
+    latency, first, sessions = (
+        stats["latency_ms"],
+        stats["first_event_ms"],
+        stats["session_ms"],
+    )
+    print(
+        f"Клиентов: {args.clients}, ходов на сессию: {args.turns}, задержка модели "
+        f"{args.llm_latency * 1000:.0f} мс, лимит вызовов модели {args.llm_concurrency}."
+    )
+    print(
+        f"Сессий/с: {len(sessions) / stats['elapsed_s']:.1f}, ходов/с: "
+        f"{len(latency) / stats['elapsed_s']:.1f} (за {stats['elapsed_s']:.2f} с)."
+    )
+    if latency:
+        print(
+            f"Ход: p50 {percentile(latency, 50):.0f} мс, p95 {percentile(latency, 95):.0f} мс, "
+            f"max {max(latency):.0f} мс; первое событие: p50 "
+            f"{percentile(first, 50):.0f} мс, p95 {percentile(first, 95):.0f} мс."
+        )
+    print(
+        f"Вызовов модели: {stats['llm']['calls']}, пик одновременных: {stats['llm']['peak']}; "
+        f"отказов (503): {stats['rejected']}, ошибок: {stats['errors']}."
+    )
+
+
+if __name__ == "__main__":
+    main()
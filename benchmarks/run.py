@@ -0,0 +1,147 @@
+"""
+Запуск бенчмарков и сравнение с сохраненной базовой линией.
+
+    python -m benchmarks.run                  # полный набор (10k файлов, 100 МБ)
+    python -m benchmarks.run --quick          # уменьшенные рабочие директории
+    python -m benchmarks.run --only safe_path read_file_small
+    python -m benchmarks.run --save-baseline  # записать результаты в baseline
+
+Каждый бенчмарк выполняется в отдельном процессе, поэтому пиковый RSS
+относится к нему одному. Код выхода 1 — есть регрессии относительно базовой линии.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+from typing import Any
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _load_benchmarks():
+    from benchmarks import bench_agent, bench_runner, bench_startup, bench_tools  # noqa: F401
+    from benchmarks.harness import BENCHMARKS
+
+    return BENCHMARKS
+
+
+def _run_one(name: str, ctx: dict[str, Any], queue) -> None:
+    from benchmarks.harness import peak_rss_mb
+    from benchmarks.workspaces import use_workspace
+
+    os.chdir(ctx["root"])
+    use_workspace(ctx["root"])
+    result = _load_benchmarks()[name](ctx)
+    result["peak_rss_mb"] = peak_rss_mb()
+    queue.put(result)
+
+
+def run_isolated(name: str, ctx: dict[str, Any]) -> dict[str, Any]:
+    spawn = multiprocessing.get_context("spawn")
+    queue = spawn.Queue()
+    process = spawn.Process(target=_run_one, args=(name, ctx, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare(
+    results: dict[str, dict[str, Any]], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Возвращает имена бенчмарков, где ops/s упал сильнее чем на tolerance."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        ratio = result["ops_per_sec"] / base["ops_per_sec"]
+        result["vs_baseline"] = ratio
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def format_report(results: dict[str, dict[str, Any]], regressions: list[str]) -> str:
+    lines = [
+        (
+            f"{'Бенчмарк':<26} {'ops/s':>10} {'мс/оп':>10} {'RSS, МБ':>8} "
+            f"{'к базе':>8}  доп."
+        )
+    ]
+    for name, result in results.items():
+        ratio = result.get("vs_baseline")
+        extra = ", ".join(
+            f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in result.items()
+            if key
+            not in ("ops", "ops_per_sec", "mean_ms", "peak_rss_mb", "vs_baseline")
+        )
+        lines.append(
+            f"{name:<26} {result['ops_per_sec']:>10.1f} {result['mean_ms']:>10.3f} "
+            f"{result['peak_rss_mb']:>8.1f} "
+            f"{(f'{ratio:.2f}x' if ratio else '—'):>8}"
+            f"{' !' if name in regressions else '  '}{extra}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--only", nargs="*")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="Сохранить результаты в JSON.")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(_load_benchmarks())
+    mode = "quick" if args.quick else "full"
+    with tempfile.TemporaryDirectory(prefix="agent-bench-") as tmp:
+        from benchmarks.bench_tools import prepare
+
+        print(f"Подготовка рабочих директорий ({mode})...", file=sys.stderr)
+        ctx = prepare(os.path.join(tmp, "workspace"), args.quick)
+        results = {}
+        for name in names:
+            print(f"  {name}...", file=sys.stderr)
+            results[name] = run_isolated(name, ctx)
+
+    report = {
+        "mode": mode,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    regressions: list[str] = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("mode") == mode:
+            regressions = compare(results, baseline, args.tolerance)
+        else:
+            print(
+                f"Базовая линия снята в режиме {baseline.get('mode')}, сравнение пропущено.",
+                file=sys.stderr,
+            )
+    print(format_report(results, regressions))
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if regressions:
+        print(f"Регрессии: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import os
+
+import modules.utils.tools
+from modules.utils.sandbox import Sandbox
+
+LINE = "def handler(request):  # синтетическая строка кода фиксированной длины\n"
+
+
+def use_workspace(root: str) -> str:
+    """Направляет инструменты в синтетическую рабочую директорию."""
+    modules.utils.tools.sandbox = Sandbox([root])
+    return modules.utils.tools.sandbox.root
+
+
+def make_many_files(root: str, count: int, per_dir: int = 100) -> list[str]:
+    """count небольших файлов, разложенных по папкам по per_dir штук."""
+    paths = []
+    for i in range(count):
+        rel_path = os.path.join("src", f"pkg{i // per_dir:04d}", f"module{i:05d}.py")
+        full_path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(LINE * 20)
+        paths.append(rel_path)
+    return paths
+
+
+def make_python_package(root: str, count: int, per_dir: int = 100) -> str:
+    """count модулей Python с классами, которые ссылаются на соседние модули."""
+    base = os.path.join(root, "pypkg")
+    for i in range(count):
+        full_path = os.path.join(base, f"sub{i // per_dir:04d}", f"mod{i:05d}.py")
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(
+                f"class Service{i}:\n"
+                f"    def handle(self, request: dict) -> dict:\n"
+                f"        return Service{(i * 7 + 1) % count}().handle(request)\n\n"
+                f"    def close(self) -> None:\n"
+                f"        pass\n\n\n"
+                f"def make_service{i}(config: dict | None = None) -> Service{i}:\n"
+                f"    return Service{i}()\n"
+            )
+    return "pypkg"
+
+
+def make_large_file(root: str, size_mb: int, name: str = "big.log") -> str:
+    """Текстовый файл размером size_mb мегабайт из одинаковых строк."""
+    block = (LINE * (1024 * 1024 // len(LINE.encode("utf-8")))).encode("utf-8")
+    with open(os.path.join(root, name), "wb") as f:
+        written = 0
+        while written < size_mb * 1024 * 1024:
+            f.write(block)
+            written += len(block)
+    return name
+
+
+def make_deep_tree(root: str, depth: int, fanout: int = 2) -> str:
+    """Дерево папок глубины depth с fanout подпапками и одним файлом на уровне."""
+    base = os.path.join(root, "deep")
+    level = [base]
+    for d in range(depth):
+        next_level = []
+        for dir_path in level:
+            os.makedirs(dir_path, exist_ok=True)
+            with open(os.path.join(dir_path, f"level{d}.txt"), "w") as f:
+                f.write(LINE)
+            if len(next_level) < 512:
+                next_level.extend(
+                    os.path.join(dir_path, f"d{i}") for i in range(fanout)
+                )
+        level = next_level
+    return os.path.relpath(os.path.join(base, *["d0"] * (depth - 1)), root)
@@ -1,33 +1,67 @@
-from langgraph.prebuilt import create_react_agent
+from modules.utils.utils import run_chat
 
-from modules.utils.llm import llm
-from modules.settings.developer_prompt import prompt
-from modules.utils import tools
-from modules.schemas import tools_schemas
-from modules.utils.utils import run_chat, get_structured_tools, snake_to_pascal
 
+def build_agent(model=None, checkpointer=None, compactor=None):
+    """
+    Собирает граф агента вокруг переданной модели (по умолчанию — основной
+    модели из настроек). Бенчмарки и тесты подставляют сюда фейковую модель,
+    чтобы прогонять цикл без сети. Сервер передает свой compactor, чтобы
+    очищать его при закрытии сессий. Все тяжелые импорты выполняются здесь,
+    а не при запуске.
+    """
+    from langgraph.prebuilt import ToolNode, create_react_agent
 
-tool2schema = {
-    tools.write_file: tools_schemas.WriteFileSpec,
-    tools.create_directory: tools_schemas.CreateDirectorySpec,
-    tools.append_to_file: tools_schemas.AppendToFileSpec,
-    tools.delete_file: tools_schemas.DeletePathSpec,
-    tools.delete_directory: tools_schemas.DeletePathSpec,
-    tools.read_file: tools_schemas.ReadFileSpec,
-    tools.list_directory: tools_schemas.ListDirectorySpec,
-    tools.list_directory_tree: tools_schemas.ListDirectorySpec,
-    tools.rename_or_move: tools_schemas.RenameOrMoveSpec,
-}
+    from modules.settings.agent_config import settings
+    from modules.settings.developer_prompt import prompt
+    from modules.utils import tools  # noqa: F401 — регистрирует инструменты
+    from modules.utils.checkpoint import make_checkpointer
+    from modules.utils.compaction import OutputCompactor
+    from modules.utils.concurrency import ToolCallScheduler
+    from modules.utils.registry import get_structured_tools, read_only_tool_names
+    from modules.utils.runner import warm_up
+    from modules.utils.utils import trim_context_hook
 
-structured_tools = get_structured_tools(
-    tools=tool2schema.keys(),
-    names=[snake_to_pascal(tool.__name__) for tool in tool2schema.keys()],
-    args_schemas=tool2schema.values(),
-    descriptions=[tool.__doc__ for tool in tool2schema.keys()],
-)
+    if model is None:
+        from modules.utils.llm import get_llm
 
-agent_executor = create_react_agent(model=llm, tools=structured_tools, prompt=prompt)
+        model = get_llm()
+    if checkpointer is None:
+        checkpointer = make_checkpointer()
+
+    scheduler = ToolCallScheduler(
+        read_only_tools=read_only_tool_names(),
+        max_workers=settings.TOOL_MAX_WORKERS,
+        mode=settings.TOOL_EXECUTION,
+    )
+    if compactor is None:
+        compactor = OutputCompactor.from_settings()
+    # Сервер теплых процессов импортирует pytest, пока модель думает над первым ходом.
+    warm_up()
+
+    # Планировщик снаружи: сжатие вывода выполняется внутри слота инструмента.
+    def wrap_tool_call(request, execute):
+        return scheduler.wrap_tool_call(
+            request, lambda r: compactor.wrap_tool_call(r, execute)
+        )
+
+    async def awrap_tool_call(request, execute):
+        return await scheduler.awrap_tool_call(
+            request, lambda r: compactor.awrap_tool_call(r, execute)
+        )
+
+    tool_node = ToolNode(
+        get_structured_tools(),
+        wrap_tool_call=wrap_tool_call,
+        awrap_tool_call=awrap_tool_call,
+    )
+    return create_react_agent(
+        model=model,
+        tools=tool_node,
+        prompt=prompt,
+        pre_model_hook=trim_context_hook,
+        checkpointer=checkpointer,
+    )
 
 
 if __name__ == "__main__":
-    run_chat(agent_executor)
+    run_chat(build_agent)
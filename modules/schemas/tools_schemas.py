@@ -1,5 +1,4 @@
 from pydantic import BaseModel, Field
-from typing import Optional
 
 
 class WriteFileSpec(BaseModel):
@@ -25,14 +24,200 @@ class DeletePathSpec(BaseModel):
 
 class ReadFileSpec(BaseModel):
     path: str = Field(..., description="Путь к файлу.")
+    offset: int = Field(
+        default=1, description="Номер строки (с 1), с которой начать чтение."
+    )
+    limit: int | None = Field(
+        default=None,
+        description="Сколько строк прочитать. По умолчанию — ограничение из настроек.",
+    )
+    max_bytes: int | None = Field(
+        default=None,
+        description="Максимальный размер ответа в байтах. По умолчанию — из настроек.",
+    )
+    line_numbers: bool = Field(
+        default=False,
+        description="Показать номера строк (удобно перед InsertLines/DeleteLines).",
+    )
 
 
 class ListDirectorySpec(BaseModel):
-    path: Optional[str] = Field(
+    path: str | None = Field(
         default=".", description="Путь к директории. По умолчанию - корень."
     )
 
 
+class ListDirectoryTreeSpec(ListDirectorySpec):
+    max_depth: int | None = Field(
+        default=None,
+        description="Максимальная глубина дерева. Более глубокие папки сворачиваются в сводку.",
+    )
+    max_entries: int | None = Field(
+        default=None, description="Максимальное количество строк в выводе."
+    )
+    exclude: list[str] | None = Field(
+        default=None,
+        description="Дополнительные шаблоны исключения в стиле .gitignore (например, '*.log').",
+    )
+
+
+class RepoMapSpec(BaseModel):
+    path: str = Field(
+        default=".",
+        description="Директория, для которой строится карта. По умолчанию - корень.",
+    )
+    max_tokens: int | None = Field(
+        default=None,
+        description="Ограничение размера карты в токенах; наименее используемые файлы отбрасываются.",
+    )
+
+
+class FileOutlineSpec(BaseModel):
+    path: str = Field(..., description="Путь к файлу.")
+
+
 class RenameOrMoveSpec(BaseModel):
     source_path: str = Field(..., description="Текущий Путь.")
     destination_path: str = Field(..., description="Новый Путь.")
+
+
+class ReplaceInFileSpec(BaseModel):
+    path: str = Field(..., description="Путь к файлу.")
+    old_string: str = Field(
+        ...,
+        description="Точный фрагмент текста, который нужно заменить (с отступами и переносами строк).",
+    )
+    new_string: str = Field(
+        ..., description="Текст, на который нужно заменить фрагмент."
+    )
+    replace_all: bool = Field(
+        default=False,
+        description="Заменить все вхождения. По умолчанию фрагмент должен быть уникальным.",
+    )
+
+
+class InsertLinesSpec(BaseModel):
+    path: str = Field(..., description="Путь к файлу.")
+    after_line: int = Field(
+        ...,
+        description="Номер строки (с 1), после которой вставить текст. 0 — в начало файла.",
+    )
+    content: str = Field(..., description="Вставляемые строки.")
+
+
+class DeleteLinesSpec(BaseModel):
+    path: str = Field(..., description="Путь к файлу.")
+    start_line: int = Field(..., description="Первая удаляемая строка (с 1).")
+    end_line: int = Field(..., description="Последняя удаляемая строка (включительно).")
+
+
+class ApplyPatchSpec(BaseModel):
+    path: str = Field(..., description="Путь к файлу.")
+    patch: str = Field(
+        ...,
+        description="Патч в формате unified diff с ханками '@@ -a,b +c,d @@' для этого файла.",
+    )
+
+
+class SearchWorkspaceSpec(BaseModel):
+    query: str = Field(..., description="Искомый текст или регулярное выражение.")
+    regex: bool = Field(
+        default=False, description="Интерпретировать query как регулярное выражение."
+    )
+    case_sensitive: bool = Field(default=True, description="Учитывать регистр.")
+    glob: str | None = Field(
+        default=None,
+        description=(
+            "Искать только в файлах, подходящих под шаблон (например, '*.py'); "
+            "путь сопоставляется относительно path, как в FindFiles."
+        ),
+    )
+    path: str = Field(
+        default=".", description="Директория поиска. По умолчанию - корень."
+    )
+    max_results: int = Field(
+        default=100, description="Максимальное количество возвращаемых совпадений."
+    )
+
+
+class FindFilesSpec(BaseModel):
+    pattern: str = Field(
+        ..., description="Glob-шаблон имени или пути файла, например '*.py'."
+    )
+    path: str = Field(
+        default=".", description="Директория поиска. По умолчанию - корень."
+    )
+    max_results: int = Field(
+        default=200, description="Максимальное количество возвращаемых путей."
+    )
+
+
+class ReadFilesSpec(BaseModel):
+    paths: list[str] = Field(..., description="Список путей к файлам.")
+    max_bytes_per_file: int | None = Field(
+        default=None,
+        description="Максимальный размер вывода для каждого файла в байтах.",
+    )
+
+
+class FileContentSpec(BaseModel):
+    path: str = Field(..., description="Путь к файлу.")
+    content: str = Field(..., description="Содержимое файла.")
+
+
+class WriteFilesSpec(BaseModel):
+    files: list[FileContentSpec] = Field(
+        ..., description="Список файлов для записи: путь и полное содержимое."
+    )
+
+
+class ReadToolOutputSpec(BaseModel):
+    output_id: str = Field(
+        ..., description="Номер вывода из пометки о сокращении (после #)."
+    )
+    start_line: int = Field(default=1, description="Первая строка (с 1).")
+    end_line: int | None = Field(
+        default=None,
+        description="Последняя строка включительно. По умолчанию — до конца.",
+    )
+
+
+class UndoSpec(BaseModel):
+    steps: int = Field(default=1, description="Сколько последних изменений отменить.")
+
+
+class SnapshotSpec(BaseModel):
+    name: str | None = Field(
+        default=None, description="Имя снимка. По умолчанию — по номеру шага журнала."
+    )
+
+
+class RestoreSpec(BaseModel):
+    name: str = Field(..., description="Имя снимка, к которому вернуться.")
+
+
+class RunCommandSpec(BaseModel):
+    command: str = Field(
+        ..., description="Команда с аргументами, например 'python main.py --help'."
+    )
+    cwd: str = Field(
+        default=".", description="Директория запуска. По умолчанию - корень."
+    )
+    timeout: float | None = Field(
+        default=None,
+        description="Ограничение времени в секундах (не больше заданного в настройках).",
+    )
+
+
+class RunTestsSpec(BaseModel):
+    path: str = Field(
+        default=".", description="Директория проекта, из которой запускается pytest."
+    )
+    args: list[str] | None = Field(
+        default=None,
+        description="Дополнительные аргументы pytest, например ['-k', 'login'] или ['tests/test_api.py'].",
+    )
+    timeout: float | None = Field(
+        default=None,
+        description="Ограничение времени в секундах (не больше заданного в настройках).",
+    )
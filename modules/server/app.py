@@ -0,0 +1,450 @@
+import asyncio
+import contextlib
+import json
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from modules.server.limits import (
+    CallLimiter,
+    ConcurrencyLimitedChatModel,
+    ServerBusyError,
+    TurnQueue,
+)
+from modules.server.sessions import Session, SessionManager
+from modules.settings.agent_config import settings
+from modules.utils.compaction import OutputCompactor
+
+MAX_BODY_BYTES = 1024 * 1024
+
+Emit = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+class SessionBusyError(Exception):
+    """В сессии уже выполняется ход."""
+
+
+def _sse(event: dict[str, Any]) -> bytes:
+    data = json.dumps(event, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {data}\n\n".encode()
+
+
+def _turn_events(mode: str, payload: Any) -> list[dict[str, Any]]:
+    """События хода для клиента из потока agent.astream(stream_mode=["messages", "updates"])."""
+    from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+    from modules.utils.streaming import _chunk_text
+
+    if mode == "messages":
+        chunk, metadata = payload
+        if metadata.get("langgraph_node") == "agent" and isinstance(
+            chunk, AIMessageChunk
+        ):
+            text = _chunk_text(chunk)
+            if text:
+                return [{"type": "token", "text": text}]
+        return []
+
+    events = []
+    for node, update in (payload or {}).items():
+        messages = update.get("messages", []) if isinstance(update, dict) else []
+        for message in messages:
+            if node == "agent" and isinstance(message, AIMessage):
+                events.extend(
+                    {
+                        "type": "tool_call",
+                        "id": call["id"],
+                        "name": call["name"],
+                        "args": call["args"],
+                    }
+                    for call in message.tool_calls
+                )
+                if not message.tool_calls:
+                    events.append({"type": "message", "text": _chunk_text(message)})
+            elif node == "tools" and isinstance(message, ToolMessage):
+                events.append(
+                    {
+                        "type": "tool_result",
+                        "id": message.tool_call_id,
+                        "name": message.name,
+                        "status": message.status,
+                        "content": message.content,
+                    }
+                )
+    return events
+
+
+class AgentServer:
+    """
+    ASGI-приложение с агентом из main.build_agent. Один скомпилированный граф
+    обслуживает все сессии в одном цикле событий; у каждой сессии своя
+    песочница (session_sandbox), свое хранилище полных выводов инструментов
+    (session_tool_outputs) и своя история (thread_id в чекпоинтере).
+
+    HTTP:
+        GET    /health                   — состояние очереди и лимита модели
+        POST   /sessions                 — создать сессию ({"session_id": ...} по желанию)
+        GET    /sessions/{id}            — сведения о сессии
+        DELETE /sessions/{id}            — закрыть сессию
+        POST   /sessions/{id}/messages   — ход агента, ответ — поток SSE
+    WebSocket:
+        /sessions/{id}/ws                — {"message": ...} -> поток событий JSON
+
+    Ходов одновременно не больше max_active_turns, в очереди — не больше
+    max_queued_turns (иначе 503); вызовов модели одновременно не больше
+    llm_max_concurrency. События отправляются по мере генерации, и медленный
+    клиент притормаживает свой ход, а не копит события в памяти.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        checkpointer=None,
+        workspaces_dir: str | None = None,
+        max_sessions: int | None = None,
+        max_active_turns: int | None = None,
+        max_queued_turns: int | None = None,
+        llm_max_concurrency: int | None = None,
+        telemetry: bool | None = None,
+    ):
+        self._model = model
+        self._checkpointer = checkpointer
+        self.sessions = SessionManager(
+            workspaces_dir or settings.SERVER_WORKSPACES_DIR,
+            max_sessions or settings.SERVER_MAX_SESSIONS,
+        )
+        self.turns = TurnQueue(
+            max_active_turns or settings.SERVER_MAX_ACTIVE_TURNS,
+            settings.SERVER_MAX_QUEUED_TURNS
+            if max_queued_turns is None
+            else max_queued_turns,
+        )
+        self.llm_limiter = CallLimiter(
+            llm_max_concurrency or settings.LLM_MAX_CONCURRENCY
+        )
+        self.telemetry = settings.TELEMETRY_ENABLED if telemetry is None else telemetry
+        self.compactor = OutputCompactor.from_settings()
+        self._agent = None
+        self._startup_lock = asyncio.Lock()
+        self._resources = contextlib.AsyncExitStack()
+
+    async def get_agent(self):
+        """Граф агента; собирается при старте сервера или при первом ходе."""
+        async with self._startup_lock:
+            if self._agent is None:
+                from main import build_agent
+
+                if self._checkpointer is None:
+                    from modules.utils.checkpoint import open_async_checkpointer
+
+                    self._checkpointer = await self._resources.enter_async_context(
+                        open_async_checkpointer()
+                    )
+                model = self._model
+                if model is None:
+                    from modules.utils.llm import get_llm
+
+                    model = await asyncio.to_thread(get_llm)
+                model = ConcurrencyLimitedChatModel(
+                    inner=model, limiter=self.llm_limiter
+                )
+                self._agent = await asyncio.to_thread(
+                    build_agent, model, self._checkpointer, self.compactor
+                )
+            return self._agent
+
+    async def aclose(self) -> None:
+        await self._resources.aclose()
+
+    def close_session(self, session_id: str) -> bool:
+        """
+        Закрывает сессию и освобождает ее состояние в памяти процесса
+        (конспект контекста и таблицу уже показанных выводов).
+        """
+        from modules.utils.utils import drop_context_manager
+
+        if not self.sessions.close(session_id):
+            return False
+        drop_context_manager(session_id)
+        self.compactor.forget(session_id)
+        return True
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "status": "ok",
+            "sessions": len(self.sessions),
+            "turns": self.turns.stats(),
+            "llm": self.llm_limiter.stats(),
+        }
+
+    @contextlib.asynccontextmanager
+    async def _claim(self, session: Session):
+        """
+        Занимает сессию на время хода. Свободный asyncio.Lock захватывается
+        без переключения задач, поэтому два запроса не могут занять сессию
+        одновременно; занятая сессия — SessionBusyError без ожидания.
+        """
+        if session.lock.locked():
+            raise SessionBusyError(f"В сессии '{session.id}' уже выполняется ход.")
+        async with session.lock:
+            yield
+
+    async def run_turn(self, session: Session, message: str, emit: Emit) -> None:
+        """
+        Выполняет ход в сессии, отправляя события через emit. Вызывающий
+        держит слот TurnQueue; сессия блокируется на время хода.
+        """
+        async with self._claim(session):
+            await self._turn(session, message, emit)
+
+    async def _turn(self, session: Session, message: str, emit: Emit) -> None:
+        """Ход в сессии, которую вызывающий уже занял (_claim)."""
+        from langchain_core.messages import HumanMessage
+
+        from modules.utils.compaction import session_tool_outputs
+        from modules.utils.streaming import aclose_dangling_tool_calls
+        from modules.utils.tools import session_sandbox
+
+        agent = await self.get_agent()
+        if self.telemetry and session.telemetry is None:
+            from modules.utils.telemetry import TelemetryHandler
+
+            session.telemetry = TelemetryHandler(settings.TELEMETRY_PATH)
+        config: dict[str, Any] = {"configurable": {"thread_id": session.id}}
+        if session.telemetry is not None:
+            config["callbacks"] = [session.telemetry]
+            session.telemetry.start_turn(session.id)
+
+        token = session_sandbox.set(session.sandbox)
+        outputs_token = session_tool_outputs.set(session.tool_outputs)
+        started = time.perf_counter()
+        status = "cancelled"
+        try:
+            final_text = ""
+            async for mode, payload in agent.astream(
+                {"messages": [HumanMessage(content=message)]},
+                config,
+                stream_mode=["messages", "updates"],
+            ):
+                for event in _turn_events(mode, payload):
+                    if event["type"] == "message":
+                        final_text = event["text"]
+                        continue
+                    await emit(event)
+            status = "ok"
+            session.turns += 1
+            session.last_active = time.time()
+            await emit(
+                {
+                    "type": "done",
+                    "text": final_text,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                }
+            )
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            session_sandbox.reset(token)
+            session_tool_outputs.reset(outputs_token)
+            if status != "ok":
+                # Ход оборван (ошибка или клиент ушел): история должна остаться валидной.
+                with contextlib.suppress(Exception):
+                    await aclose_dangling_tool_calls(agent, config)
+            if session.telemetry is not None:
+                session.telemetry.end_turn(status)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.get_agent()
+                except Exception as error:  # noqa: BLE001
+                    await send(
+                        {"type": "lifespan.startup.failed", "message": str(error)}
+                    )
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _json(send, status: int, payload: Any) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _read_json(receive) -> Any:
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ConnectionError("Клиент отключился.")
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY_BYTES:
+                raise ValueError("Слишком большое тело запроса.")
+            if not message.get("more_body"):
+                break
+        if not body.strip():
+            return {}
+        try:
+            return json.loads(body)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"Некорректный JSON: {error}") from error
+
+    async def _http(self, scope, receive, send) -> None:
+        method = scope["method"]
+        parts = [part for part in scope["path"].split("/") if part]
+        try:
+            if parts == ["health"] and method == "GET":
+                await self._json(send, 200, self.health())
+            elif parts == ["sessions"] and method == "POST":
+                body = await self._read_json(receive)
+                session = self.sessions.create(body.get("session_id"))
+                await self._json(send, 201, session.info())
+            elif len(parts) == 2 and parts[0] == "sessions" and method == "GET":
+                session = self.sessions.get(parts[1])
+                if session is None:
+                    await self._json(send, 404, {"error": "Сессия не найдена."})
+                else:
+                    await self._json(send, 200, session.info())
+            elif len(parts) == 2 and parts[0] == "sessions" and method == "DELETE":
+                closed = self.close_session(parts[1])
+                await self._json(send, 200 if closed else 404, {"closed": closed})
+            elif (
+                parts[:1] == ["sessions"]
+                and parts[2:] == ["messages"]
+                and method == "POST"
+            ):
+                body = await self._read_json(receive)
+                message = body.get("message")
+                if not isinstance(message, str) or not message.strip():
+                    raise ValueError("Нужно поле 'message' с текстом сообщения.")
+                await self._stream_sse(self.sessions.create(parts[1]), message, send)
+            else:
+                await self._json(send, 404, {"error": "Неизвестный путь."})
+        except ValueError as error:
+            await self._json(send, 400, {"error": str(error)})
+        except OverflowError as error:
+            await self._json(send, 503, {"error": str(error)})
+        except ConnectionError:
+            return
+
+    async def _stream_sse(self, session: Session, message: str, send) -> None:
+        try:
+            # Сессия занимается до начала ответа: занятая сессия получает 409,
+            # а не ошибку внутри потока с кодом 200.
+            async with self._claim(session), self.turns.slot():
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 200,
+                        "headers": [
+                            (b"content-type", b"text/event-stream; charset=utf-8"),
+                            (b"cache-control", b"no-cache"),
+                        ],
+                    }
+                )
+
+                async def emit(event: dict[str, Any]) -> None:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": _sse(event),
+                            "more_body": True,
+                        }
+                    )
+
+                try:
+                    await self._turn(session, message, emit)
+                except Exception as error:  # noqa: BLE001
+                    # Если ушел сам клиент, сообщить об ошибке уже некому.
+                    with contextlib.suppress(Exception):
+                        await emit({"type": "error", "message": str(error)})
+                with contextlib.suppress(Exception):
+                    await send(
+                        {"type": "http.response.body", "body": b"", "more_body": False}
+                    )
+        except SessionBusyError as error:
+            await self._json(send, 409, {"error": str(error)})
+        except ServerBusyError as error:
+            await self._json(send, 503, {"error": str(error)})
+
+    async def _websocket(self, scope, receive, send) -> None:
+        parts = [part for part in scope["path"].split("/") if part]
+        if (await receive())["type"] != "websocket.connect":
+            return
+        if not (len(parts) == 3 and parts[0] == "sessions" and parts[2] == "ws"):
+            await send({"type": "websocket.close", "code": 4404})
+            return
+        try:
+            session = self.sessions.create(parts[1])
+        except ValueError:
+            await send({"type": "websocket.close", "code": 4400})
+            return
+        except OverflowError:
+            await send({"type": "websocket.close", "code": 1013})
+            return
+        await send({"type": "websocket.accept"})
+
+        async def emit(event: dict[str, Any]) -> None:
+            await send(
+                {
+                    "type": "websocket.send",
+                    "text": json.dumps(event, ensure_ascii=False),
+                }
+            )
+
+        while True:
+            frame = await receive()
+            if frame["type"] == "websocket.disconnect":
+                return
+            if frame["type"] != "websocket.receive":
+                continue
+            try:
+                message = json.loads(frame.get("text") or frame.get("bytes") or b"")[
+                    "message"
+                ]
+            except (ValueError, KeyError, TypeError):
+                await emit(
+                    {
+                        "type": "error",
+                        "message": 'Ожидается JSON вида {"message": "..."}.',
+                    }
+                )
+                continue
+            try:
+                async with self._claim(session), self.turns.slot():
+                    await self._turn(session, message, emit)
+            except ServerBusyError as error:
+                await emit({"type": "error", "status": 503, "message": str(error)})
+            except SessionBusyError as error:
+                await emit({"type": "error", "status": 409, "message": str(error)})
+            except Exception as error:  # noqa: BLE001
+                await emit({"type": "error", "message": str(error)})
+
+
+def create_app(**overrides) -> AgentServer:
+    """Приложение с параметрами из настроек; overrides — аргументы AgentServer."""
+    return AgentServer(**overrides)
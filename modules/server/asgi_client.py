@@ -0,0 +1,113 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class Response:
+    """Ответ ASGI-приложения; для SSE — события с моментом получения (perf_counter)."""
+
+    status: int = 0
+    body: bytes = b""
+    events: list[tuple[float, dict[str, Any]]] = field(default_factory=list)
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+def _parse_sse(chunk: bytes) -> list[dict[str, Any]]:
+    events = []
+    for block in chunk.decode("utf-8").split("\n\n"):
+        for line in block.splitlines():
+            if line.startswith("data: "):
+                events.append(json.loads(line[len("data: ") :]))
+    return events
+
+
+async def request(app, method: str, path: str, payload: Any = None) -> Response:
+    """
+    HTTP-запрос к ASGI-приложению в том же процессе, без сети. Нужен тестам
+    и нагрузочному прогону, чтобы мерить сервер, а не сетевой стек.
+    """
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+    }
+    sent = False
+    finished = asyncio.Event()
+    response = Response()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response.status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            response.body += chunk
+            if chunk.startswith(b"event: "):
+                now = time.perf_counter()
+                response.events.extend((now, event) for event in _parse_sse(chunk))
+            if not message.get("more_body"):
+                finished.set()
+
+    await app(scope, receive, send)
+    return response
+
+
+async def websocket_turns(
+    app, path: str, messages: list[str]
+) -> list[list[dict[str, Any]]]:
+    """Открывает WebSocket, отправляет сообщения по одному и собирает события каждого хода."""
+    incoming: asyncio.Queue = asyncio.Queue()
+    outgoing: asyncio.Queue = asyncio.Queue()
+    scope = {
+        "type": "websocket",
+        "asgi": {"version": "3.0"},
+        "path": path,
+        "headers": [],
+    }
+
+    async def receive():
+        return await incoming.get()
+
+    async def send(message):
+        await outgoing.put(message)
+
+    await incoming.put({"type": "websocket.connect"})
+    server = asyncio.create_task(app(scope, receive, send))
+    accepted = await outgoing.get()
+    if accepted["type"] != "websocket.accept":
+        await server
+        raise ConnectionError(f"Соединение отклонено: {accepted}")
+
+    turns = []
+    for message in messages:
+        await incoming.put(
+            {"type": "websocket.receive", "text": json.dumps({"message": message})}
+        )
+        events = []
+        while True:
+            event = json.loads((await outgoing.get())["text"])
+            events.append(event)
+            if event["type"] in ("done", "error"):
+                break
+        turns.append(events)
+    await incoming.put({"type": "websocket.disconnect", "code": 1000})
+    await server
+    return turns
@@ -0,0 +1,143 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from pydantic import ConfigDict
+
+
+class ServerBusyError(Exception):
+    """Очередь ходов переполнена: запрос нужно повторить позже."""
+
+
+class CallLimiter:
+    """
+    Ограничение числа одновременных вызовов модели. Лишние вызовы ждут
+    своей очереди; счетчики нужны для /health и нагрузочного прогона.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak = 0
+        self.calls = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.calls += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak": self.peak,
+            "calls": self.calls,
+        }
+
+
+class TurnQueue:
+    """
+    Допуск ходов агента: не больше max_active одновременно, еще до max_queued
+    ждут в очереди, остальные сразу получают ServerBusyError (HTTP 503),
+    чтобы клиенты не копили запросы в памяти сервера.
+    """
+
+    def __init__(self, max_active: int, max_queued: int):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self._slots = asyncio.Semaphore(max_active)
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._slots.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise ServerBusyError("Сервер перегружен, повторите запрос позже.")
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "max_active": self.max_active,
+            "max_queued": self.max_queued,
+            "active": self.active,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
+
+
+class ConcurrencyLimitedChatModel(BaseChatModel):
+    """
+    Обертка над моделью, которая держит слот CallLimiter на время вызова
+    (включая стриминг ответа). Инструменты привязываются к внутренней модели,
+    а их параметры передаются в ее вызов, поэтому обертка прозрачна для
+    create_react_agent. Ограничение действует на асинхронные вызовы:
+    сервер работает в одном цикле событий.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    inner: BaseChatModel
+    limiter: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return self.inner._identifying_params
+
+    def bind_tools(self, tools, **kwargs):
+        bound = self.inner.bind_tools(tools, **kwargs)
+        return self.bind(**getattr(bound, "kwargs", {}))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.inner._generate(
+            messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.inner._stream(
+            messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        async with self.limiter.slot():
+            return await self.inner._agenerate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async with self.limiter.slot():
+            async for chunk in self.inner._astream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            ):
+                yield chunk
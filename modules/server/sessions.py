@@ -0,0 +1,87 @@
+import asyncio
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any
+
+from modules.utils.compaction import ToolOutputStore
+from modules.utils.sandbox import Sandbox
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+@dataclass
+class Session:
+    """
+    Сессия сервера: своя рабочая директория (песочница), свои полные выводы
+    инструментов для ReadToolOutput и своя история, которая хранится
+    в чекпоинтере графа под thread_id = id сессии.
+    Ходы одной сессии выполняются строго по очереди.
+    """
+
+    id: str
+    sandbox: Sandbox
+    created: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.time)
+    turns: int = 0
+    telemetry: Any = None
+    tool_outputs: ToolOutputStore = field(default_factory=ToolOutputStore.from_settings)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def workspace(self) -> str:
+        return self.sandbox.root
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "session_id": self.id,
+            "workspace": self.workspace,
+            "turns": self.turns,
+            "busy": self.lock.locked(),
+            "created": self.created,
+            "last_active": self.last_active,
+        }
+
+
+class SessionManager:
+    """Реестр сессий: создание с проверкой id и лимита, поиск и закрытие."""
+
+    def __init__(self, workspaces_dir: str, max_sessions: int):
+        self.workspaces_dir = os.path.abspath(workspaces_dir)
+        self.max_sessions = max_sessions
+        self._sessions: dict[str, Session] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, session_id: str | None = None) -> Session:
+        """
+        Новая сессия или уже открытая с тем же id. Повторное открытие
+        закрытой сессии продолжает ее историю из чекпоинтера.
+        """
+        session_id = session_id or uuid.uuid4().hex
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(
+                "Идентификатор сессии может содержать только латинские буквы, "
+                "цифры, '-' и '_' (до 64 символов)."
+            )
+        if session_id in self._sessions:
+            return self._sessions[session_id]
+        if len(self._sessions) >= self.max_sessions:
+            raise OverflowError(
+                f"Открыто максимальное число сессий ({self.max_sessions})."
+            )
+        session = Session(
+            session_id, Sandbox([os.path.join(self.workspaces_dir, session_id)])
+        )
+        self._sessions[session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Session | None:
+        return self._sessions.get(session_id)
+
+    def close(self, session_id: str) -> bool:
+        """Закрывает сессию; файлы рабочей директории и история сохраняются."""
+        return self._sessions.pop(session_id, None) is not None
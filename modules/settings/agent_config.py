@@ -1,7 +1,8 @@
+from typing import Any, Literal
+
 import yaml
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
-from typing import Any, Tuple
 
 load_dotenv()
 
@@ -24,10 +25,66 @@ class Settings(BaseSettings):
     # )
 
     WORKSPACE_DIR: str = "workspace"
-    CONTEXT_WINDOW_SIZE: int = 30
+    EXTRA_WORKSPACE_DIRS: list[str] = []
+    CONTEXT_TOKEN_BUDGET: int = 32000
+    CONTEXT_SUMMARY_MAX_TOKENS: int = 2000
+    CONTEXT_SUMMARIZER: Literal["extractive", "llm"] = "extractive"
+    CONTEXT_SUMMARIZER_MODEL: str = "gemini-2.0-flash-lite"
+    CHECKPOINTER: Literal["memory", "sqlite"] = "sqlite"
+    CHECKPOINT_DB_PATH: str = ".agent_state/checkpoints.sqlite"
+    THREAD_ID: str | None = None
+    TOOL_EXECUTION: Literal["parallel", "sequential"] = "parallel"
+    TOOL_MAX_WORKERS: int = 8
     LLM_MODEL_NAME: str = "gemini-2.0-flash"
     MAX_TOKENS: int = 1024
     TEMPERATURE: float = 0
+    LLM_CACHE: Literal["none", "memory", "sqlite"] = "none"
+    LLM_CACHE_PATH: str = ".agent_state/llm_cache.sqlite"
+    LLM_CACHE_MAX_ENTRIES: int = 10_000
+    LLM_CACHE_TTL_SECONDS: float | None = None
+    LLM_CACHE_REPLAY: bool = False
+    READ_FILE_MAX_LINES: int = 2000
+    READ_FILE_MAX_BYTES: int = 64 * 1024
+    WRITE_FSYNC: Literal["none", "file", "dir"] = "file"
+    JOURNAL_ENABLED: bool = True
+    JOURNAL_DIR: str = ".agent_state/journal"
+    JOURNAL_MAX_STEPS: int = 500
+    JOURNAL_MAX_BYTES: int = 1024 * 1024 * 1024
+    READ_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    READ_CACHE_MAX_FILE_BYTES: int = 4 * 1024 * 1024
+    LIST_TREE_MAX_DEPTH: int = 6
+    LIST_TREE_MAX_ENTRIES: int = 500
+    REPO_MAP_MAX_TOKENS: int = 2000
+    OUTLINE_WORKERS: int | None = None
+    OUTLINE_POOL_MIN_FILES: int = 200
+    RUN_TIMEOUT_SECONDS: float = 120
+    RUN_CPU_LIMIT_SECONDS: int = 300
+    RUN_MEMORY_LIMIT_MB: int = 2048
+    RUN_OUTPUT_MAX_BYTES: int = 256 * 1024
+    RUN_WARM_POOL: bool = True
+    RUN_WARM_WORKERS: int = 2
+    RUN_WARM_PRELOAD: list[str] = ["pytest"]
+    TOOL_OUTPUT_MAX_TOKENS: int = 4000
+    TOOL_OUTPUT_MAX_TOKENS_PER_TOOL: dict[str, int] = {
+        "ReadFile": 8000,
+        "ReadFiles": 12000,
+    }
+    TOOL_OUTPUT_COLLAPSE_REPEATS: int = 3
+    TOOL_OUTPUT_DEDUP_TOOLS: list[str] = ["ReadFile", "ReadFiles"]
+    TOOL_OUTPUT_STORE_ENTRIES: int = 256
+    TOOL_OUTPUT_STORE_MAX_BYTES: int = 32 * 1024 * 1024
+    TELEMETRY_ENABLED: bool = True
+    TELEMETRY_PATH: str = ".agent_state/telemetry.jsonl"
+    SERVER_HOST: str = "127.0.0.1"
+    SERVER_PORT: int = 8000
+    SERVER_WORKSPACES_DIR: str = "server_workspaces"
+    SERVER_MAX_SESSIONS: int = 256
+    SERVER_MAX_ACTIVE_TURNS: int = 32
+    SERVER_MAX_QUEUED_TURNS: int = 128
+    # RunCommand/RunTests не изолированы от файловой системы (в том числе
+    # от рабочих директорий других сессий), поэтому на сервере выключены.
+    SERVER_ALLOW_COMMANDS: bool = False
+    LLM_MAX_CONCURRENCY: int = 8
 
     @classmethod
     def settings_customise_sources(
@@ -37,7 +94,7 @@ class Settings(BaseSettings):
         env_settings,
         dotenv_settings,
         file_secret_settings,
-    ) -> Tuple[Any, ...]:
+    ) -> tuple[Any, ...]:
         return (
             env_settings,
             dotenv_settings,
@@ -0,0 +1,99 @@
+import contextlib
+import os
+import sqlite3
+import uuid
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING
+
+from modules.settings.agent_config import settings
+
+if TYPE_CHECKING:
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+
+
+def make_checkpointer() -> "BaseCheckpointSaver":
+    """
+    Хранилище состояния графа агента: в памяти процесса (memory) или
+    в локальной SQLite-базе (sqlite), которая переживает перезапуск.
+    """
+    if settings.CHECKPOINTER == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        return InMemorySaver()
+
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    os.makedirs(os.path.dirname(settings.CHECKPOINT_DB_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(settings.CHECKPOINT_DB_PATH, check_same_thread=False)
+    return SqliteSaver(conn)
+
+
+@contextlib.asynccontextmanager
+async def open_async_checkpointer() -> AsyncIterator["BaseCheckpointSaver"]:
+    """
+    Асинхронный вариант make_checkpointer для сервера: SqliteSaver не
+    поддерживает astream, поэтому для sqlite открывается AsyncSqliteSaver,
+    соединение закрывается при выходе из контекста.
+    """
+    if settings.CHECKPOINTER == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        yield InMemorySaver()
+        return
+
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    os.makedirs(os.path.dirname(settings.CHECKPOINT_DB_PATH) or ".", exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(settings.CHECKPOINT_DB_PATH) as saver:
+        yield saver
+
+
+def _thread_file() -> str:
+    return settings.CHECKPOINT_DB_PATH + ".thread"
+
+
+def current_thread_id() -> str:
+    """
+    Идентификатор текущей сессии. Для sqlite последняя сессия запоминается
+    рядом с базой, чтобы после перезапуска продолжить тот же диалог.
+    """
+    if settings.THREAD_ID:
+        return settings.THREAD_ID
+    if settings.CHECKPOINTER == "sqlite":
+        try:
+            with open(_thread_file(), "r", encoding="utf-8") as f:
+                thread_id = f.read().strip()
+            if thread_id:
+                return thread_id
+        except FileNotFoundError:
+            pass
+    return new_thread_id()
+
+
+def new_thread_id() -> str:
+    """Начинает новую сессию и, для sqlite, запоминает ее как текущую."""
+    thread_id = uuid.uuid4().hex
+    if settings.CHECKPOINTER == "sqlite":
+        os.makedirs(os.path.dirname(_thread_file()) or ".", exist_ok=True)
+        with open(_thread_file(), "w", encoding="utf-8") as f:
+            f.write(thread_id)
+    return thread_id
+
+
+def has_history(thread_id: str) -> bool:
+    """
+    Есть ли у сессии сохраненное состояние. Смотрит прямо в SQLite-базу,
+    чтобы не загружать langgraph до первого сообщения пользователя.
+    """
+    if settings.CHECKPOINTER != "sqlite" or not os.path.exists(
+        settings.CHECKPOINT_DB_PATH
+    ):
+        return False
+    try:
+        with sqlite3.connect(settings.CHECKPOINT_DB_PATH) as conn:
+            row = conn.execute(
+                "SELECT 1 FROM checkpoints WHERE thread_id = ? LIMIT 1", (thread_id,)
+            ).fetchone()
+    except sqlite3.Error:
+        return False
+    return row is not None
@@ -0,0 +1,324 @@
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, NamedTuple
+
+from modules.schemas import tools_schemas
+from modules.settings.agent_config import settings
+from modules.utils.context import CHARS_PER_TOKEN
+from modules.utils.registry import register_tool
+
+HEAD_SHARE = 0.6
+MAX_DEDUP_KEYS = 1024
+
+
+class ToolOutputStore:
+    """
+    Полные выводы инструментов, сокращенные перед отправкой модели.
+    Номера сквозные в пределах хранилища и начинаются со случайного префикса
+    хранилища: хранилище живет только в памяти процесса, а ссылки на выводы
+    остаются в истории чекпоинтера, и после перезапуска они не должны
+    указывать на чужие выводы. Старые записи вытесняются по числу и объему.
+    У каждой сессии сервера свое хранилище (session_tool_outputs).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.prefix = uuid.uuid4().hex[:8]
+        self._outputs: OrderedDict[str, str] = OrderedDict()
+        self._bytes = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "ToolOutputStore":
+        return cls(
+            settings.TOOL_OUTPUT_STORE_ENTRIES, settings.TOOL_OUTPUT_STORE_MAX_BYTES
+        )
+
+    def put(self, content: str) -> str:
+        with self._lock:
+            output_id = f"{self.prefix}-{self._next_id}"
+            self._next_id += 1
+            self._outputs[output_id] = content
+            self._bytes += len(content)
+            while self._outputs and (
+                len(self._outputs) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._outputs.popitem(last=False)
+                self._bytes -= len(evicted)
+            return output_id
+
+    def owns(self, output_id: str) -> bool:
+        """Выдан ли номер этим хранилищем (даже если запись уже вытеснена)."""
+        return output_id.startswith(f"{self.prefix}-")
+
+    def get(self, output_id: str) -> str | None:
+        with self._lock:
+            content = self._outputs.get(output_id)
+            if content is not None:
+                self._outputs.move_to_end(output_id)
+            return content
+
+
+tool_outputs = ToolOutputStore.from_settings()
+
+# Хранилище сессии сервера; в консольном режиме не задано, и действует общее tool_outputs.
+session_tool_outputs: ContextVar[ToolOutputStore | None] = ContextVar(
+    "session_tool_outputs", default=None
+)
+
+
+def current_tool_outputs() -> ToolOutputStore:
+    return session_tool_outputs.get() or tool_outputs
+
+
+class _Unit(NamedTuple):
+    first_line: int
+    last_line: int
+    text: str
+
+
+def _collapse(lines: list[str], min_repeats: int) -> list[_Unit]:
+    """Подряд идущие одинаковые строки сворачиваются в одну с пометкой."""
+    units: list[_Unit] = []
+    i = 0
+    while i < len(lines):
+        j = i
+        while j + 1 < len(lines) and lines[j + 1] == lines[i]:
+            j += 1
+        repeats = j - i + 1
+        if min_repeats and repeats >= min_repeats:
+            line = lines[i].rstrip("\n")
+            units.append(
+                _Unit(
+                    i + 1,
+                    j + 1,
+                    f"{line}\n[... строка повторяется еще {repeats - 1} раз]\n",
+                )
+            )
+        else:
+            units.extend(_Unit(k + 1, k + 1, lines[k]) for k in range(i, j + 1))
+        i = j + 1
+    return units
+
+
+def compact(content: str, max_tokens: int, output_id: str, min_repeats: int) -> str:
+    """
+    Сворачивает повторы строк и, если вывод не помещается в max_tokens,
+    оставляет начало и конец, а середину заменяет пометкой со ссылкой
+    на полный вывод (ReadToolOutput).
+    """
+    lines = content.splitlines(keepends=True)
+    units = _collapse(lines, min_repeats)
+    budget = max_tokens * CHARS_PER_TOKEN
+    if not max_tokens or sum(len(unit.text) for unit in units) <= budget:
+        return "".join(unit.text for unit in units)
+
+    head, used = [], 0
+    for unit in units:
+        if used + len(unit.text) > budget * HEAD_SHARE:
+            break
+        head.append(unit)
+        used += len(unit.text)
+    tail: list[_Unit] = []
+    for unit in reversed(units[len(head) :]):
+        if used + len(unit.text) > budget:
+            break
+        tail.insert(0, unit)
+        used += len(unit.text)
+
+    first_skipped = head[-1].last_line + 1 if head else 1
+    last_skipped = tail[0].first_line - 1 if tail else len(lines)
+    skipped_chars = sum(len(line) for line in lines[first_skipped - 1 : last_skipped])
+    head_text = "".join(unit.text for unit in head)
+    if not head:
+        # Одна огромная строка: показываем ее начало.
+        head_text = content[: int(budget * HEAD_SHARE)] + "\n"
+    marker = (
+        f"[... пропущены строки {first_skipped}-{last_skipped} из {len(lines)} "
+        f"(~{skipped_chars // CHARS_PER_TOKEN} токенов). Полный вывод: "
+        f'ReadToolOutput(output_id="{output_id}", start_line={first_skipped}, '
+        f"end_line={last_skipped}).]\n"
+    )
+    if head_text and not head_text.endswith("\n"):
+        head_text += "\n"
+    return head_text + marker + "".join(unit.text for unit in tail)
+
+
+class OutputCompactor:
+    """
+    Постобработка результатов инструментов перед тем, как они попадут
+    в историю: лимит токенов по инструментам, свертка повторов, сокращение
+    середины и ссылка на уже показанное содержимое вместо повторного чтения.
+    Подключается к ToolNode как перехватчик вызовов.
+    """
+
+    def __init__(
+        self,
+        store: ToolOutputStore,
+        max_tokens: int,
+        max_tokens_per_tool: dict[str, int],
+        min_repeats: int,
+        dedup_tools: list[str],
+    ):
+        self.store = store
+        self.max_tokens = max_tokens
+        self.max_tokens_per_tool = max_tokens_per_tool
+        self.min_repeats = min_repeats
+        self.dedup_tools = frozenset(dedup_tools)
+        # (сессия, инструмент, аргументы) -> (хэш вывода, номер первого такого вывода)
+        self._seen: OrderedDict[tuple[str, str, str], tuple[str, str | None]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "OutputCompactor":
+        return cls(
+            store=tool_outputs,
+            max_tokens=settings.TOOL_OUTPUT_MAX_TOKENS,
+            max_tokens_per_tool=settings.TOOL_OUTPUT_MAX_TOKENS_PER_TOOL,
+            min_repeats=settings.TOOL_OUTPUT_COLLAPSE_REPEATS,
+            dedup_tools=settings.TOOL_OUTPUT_DEDUP_TOOLS,
+        )
+
+    def _store(self) -> ToolOutputStore:
+        """Хранилище текущей сессии сервера или заданное при создании."""
+        return session_tool_outputs.get() or self.store
+
+    def _previous_output(
+        self, thread_id: str, name: str, args: dict[str, Any], content: str
+    ) -> str | None:
+        key = (thread_id, name, json.dumps(args, sort_keys=True, ensure_ascii=False))
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            previous = self._seen.get(key)
+            if (
+                previous is not None
+                and previous[0] == digest
+                and previous[1] is not None
+                and self._store().get(previous[1]) is not None
+            ):
+                self._seen.move_to_end(key)
+                return previous[1]
+            self._seen[key] = (digest, None)
+            self._seen.move_to_end(key)
+            while len(self._seen) > MAX_DEDUP_KEYS:
+                self._seen.popitem(last=False)
+            return None
+
+    def _remember(
+        self, thread_id: str, name: str, args: dict[str, Any], output_id: str
+    ):
+        key = (thread_id, name, json.dumps(args, sort_keys=True, ensure_ascii=False))
+        with self._lock:
+            if key in self._seen:
+                self._seen[key] = (self._seen[key][0], output_id)
+
+    def forget(self, thread_id: str) -> None:
+        """Забывает показанные выводы сессии (при ее закрытии)."""
+        with self._lock:
+            for key in [key for key in self._seen if key[0] == thread_id]:
+                del self._seen[key]
+
+    def process(self, request, result):
+        from langchain_core.messages import ToolMessage
+
+        if (
+            not isinstance(result, ToolMessage)
+            or result.status == "error"
+            or not isinstance(result.content, str)
+        ):
+            return result
+        name = request.tool_call["name"]
+        if name == "ReadToolOutput":
+            return result
+        args = request.tool_call.get("args") or {}
+        config = getattr(request.runtime, "config", None) or {}
+        thread_id = config.get("configurable", {}).get("thread_id", "default")
+        content = result.content
+
+        dedup = name in self.dedup_tools
+        if dedup:
+            previous = self._previous_output(thread_id, name, args, content)
+            if previous is not None:
+                return result.model_copy(
+                    update={
+                        "content": (
+                            f"[Результат совпадает с выводом #{previous}: содержимое "
+                            f'не изменилось. Полный текст: ReadToolOutput(output_id="{previous}").]'
+                        )
+                    }
+                )
+
+        output_id = self._store().put(content)
+        if dedup:
+            self._remember(thread_id, name, args, output_id)
+        compacted = compact(
+            content,
+            self.max_tokens_per_tool.get(name, self.max_tokens),
+            output_id,
+            self.min_repeats,
+        )
+        if compacted == content:
+            return result
+        return result.model_copy(update={"content": compacted})
+
+    def wrap_tool_call(self, request, execute):
+        """Синхронный перехватчик для ToolNode(wrap_tool_call=...)."""
+        return self.process(request, execute(request))
+
+    async def awrap_tool_call(self, request, execute):
+        """Асинхронный перехватчик для ToolNode(awrap_tool_call=...)."""
+        return self.process(request, await execute(request))
+
+
+@register_tool(tools_schemas.ReadToolOutputSpec, read_only=True)
+def read_tool_output(
+    output_id: str, start_line: int = 1, end_line: int | None = None
+) -> str:
+    """
+    Возвращает строки start_line..end_line полного вывода инструмента #output_id,
+    сокращенного перед отправкой (номер указан в пометке о пропущенных строках).
+    """
+    store = current_tool_outputs()
+    content = store.get(output_id)
+    if content is None and not store.owns(output_id):
+        return (
+            f"Ошибка: Вывод #{output_id} не найден: он получен в предыдущем запуске "
+            "агента или в другой сессии. Повторите исходный вызов инструмента."
+        )
+    if content is None:
+        return (
+            f"Ошибка: Вывод #{output_id} больше недоступен (вытеснен из хранилища). "
+            "Повторите исходный вызов инструмента."
+        )
+    lines = content.splitlines(keepends=True)
+    total = len(lines)
+    end_line = min(end_line or total, total)
+    if start_line < 1 or start_line > end_line:
+        return f"Ошибка: В выводе #{output_id} {total} строк, диапазон {start_line}-{end_line} пуст."
+
+    budget = settings.TOOL_OUTPUT_MAX_TOKENS * CHARS_PER_TOKEN
+    shown, used, last = [], 0, start_line - 1
+    for line in lines[start_line - 1 : end_line]:
+        if shown and used + len(line) > budget:
+            break
+        shown.append(line)
+        used += len(line)
+        last += 1
+    output = (
+        f"Вывод #{output_id} (строки {start_line}-{last} из {total}):\n\n"
+        + "".join(shown)
+    )
+    if last < end_line:
+        output += (
+            f"\n[... показаны строки {start_line}-{last}. Чтобы продолжить, "
+            f"вызовите ReadToolOutput с start_line={last + 1}.]"
+        )
+    return output
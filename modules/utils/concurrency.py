@@ -0,0 +1,182 @@
+import asyncio
+import contextvars
+import functools
+import posixpath
+import threading
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from langchain_core.messages import AIMessage, ToolCall
+
+from modules.settings.agent_config import settings
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Общий ограниченный пул потоков для асинхронных вариантов инструментов."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TOOL_MAX_WORKERS, thread_name_prefix="tool"
+            )
+        return _executor
+
+
+def make_coroutine(func: Callable[..., str]) -> Callable[..., Any]:
+    """
+    Асинхронный вариант синхронного инструмента: выполнение в общем пуле потоков
+    с контекстом вызывающей задачи (в нем, например, песочница сессии сервера).
+    """
+
+    @functools.wraps(func)
+    async def coroutine(**kwargs):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            get_tool_executor(), context.run, functools.partial(func, **kwargs)
+        )
+
+    return coroutine
+
+
+def _normalize(path: str) -> str:
+    path = posixpath.normpath(path.replace("\\", "/").lstrip("/"))
+    return "." if path in ("", ".") else path
+
+
+def tool_call_paths(tool_call: ToolCall) -> list[str]:
+    """
+    Пути, которых касается вызов: значения аргументов *path и элементы списков
+    путей (в том числе словари с ключом path). Вызов без путей считается
+    затрагивающим всю рабочую директорию.
+    """
+    paths = []
+
+    def collect(key: str, value: Any) -> None:
+        if isinstance(value, str) and key.endswith("path"):
+            paths.append(_normalize(value))
+        elif isinstance(value, dict):
+            for inner_key, inner_value in value.items():
+                collect(inner_key, inner_value)
+        elif isinstance(value, list):
+            for item in value:
+                collect(key.rstrip("s") if isinstance(item, str) else key, item)
+
+    for key, value in (tool_call.get("args") or {}).items():
+        collect(key, value)
+    return paths or ["."]
+
+
+def _paths_overlap(first: Iterable[str], second: Iterable[str]) -> bool:
+    for a in first:
+        for b in second:
+            if a == "." or b == "." or a == b:
+                return True
+            if a.startswith(b + "/") or b.startswith(a + "/"):
+                return True
+    return False
+
+
+class ToolCallScheduler:
+    """
+    Порядок выполнения вызовов инструментов из одного AIMessage.
+    Независимые вызовы выполняются параллельно; вызов, который пишет по пути,
+    пересекающемуся с путем более раннего вызова (или читает путь, в который
+    более ранний вызов пишет), ждет его завершения. Так чтение после записи
+    одного файла сохраняет порядок, в котором его запросила модель.
+    """
+
+    def __init__(self, read_only_tools: Iterable[str], max_workers: int, mode: str):
+        self.read_only_tools = frozenset(read_only_tools)
+        self.sequential = mode == "sequential"
+        self._slots = threading.BoundedSemaphore(1 if self.sequential else max_workers)
+        self._lock = threading.Lock()
+        self._steps: dict[str, dict[str, Any]] = {}
+
+    def _conflicts(self, earlier: ToolCall, later: ToolCall) -> bool:
+        if self.sequential:
+            return True
+        if (
+            earlier["name"] in self.read_only_tools
+            and later["name"] in self.read_only_tools
+        ):
+            return False
+        return _paths_overlap(tool_call_paths(earlier), tool_call_paths(later))
+
+    @staticmethod
+    def _sibling_calls(state: Any, call_id: str) -> list[ToolCall]:
+        messages = state.get("messages", []) if isinstance(state, dict) else []
+        for message in reversed(messages):
+            if isinstance(message, AIMessage) and any(
+                call["id"] == call_id for call in message.tool_calls
+            ):
+                return message.tool_calls
+        return []
+
+    def _dependencies(self, state: Any, tool_call: ToolCall) -> tuple[str, list[str]]:
+        calls = self._sibling_calls(state, tool_call["id"])
+        step_key = ",".join(call["id"] for call in calls)
+        dependencies = []
+        for call in calls:
+            if call["id"] == tool_call["id"]:
+                break
+            if self._conflicts(call, tool_call):
+                dependencies.append(call["id"])
+        return step_key, dependencies
+
+    def _step(self, step_key: str) -> dict[str, Any]:
+        with self._lock:
+            step = self._steps.get(step_key)
+            if step is None:
+                step = self._steps[step_key] = {
+                    "events": {},
+                    "pending": step_key.count(",") + 1,
+                }
+            return step
+
+    def _event(self, step: dict[str, Any], call_id: str, factory: Callable[[], Any]):
+        with self._lock:
+            event = step["events"].get(call_id)
+            if event is None:
+                event = step["events"][call_id] = factory()
+            return event
+
+    def _finish(self, step_key: str, step: dict[str, Any]) -> None:
+        with self._lock:
+            step["pending"] -= 1
+            if step["pending"] <= 0:
+                self._steps.pop(step_key, None)
+
+    def wrap_tool_call(self, request, execute):
+        """Синхронный перехватчик для ToolNode(wrap_tool_call=...)."""
+        step_key, dependencies = self._dependencies(request.state, request.tool_call)
+        if not step_key:
+            with self._slots:
+                return execute(request)
+        step = self._step(step_key)
+        try:
+            for call_id in dependencies:
+                self._event(step, call_id, threading.Event).wait()
+            with self._slots:
+                return execute(request)
+        finally:
+            self._event(step, request.tool_call["id"], threading.Event).set()
+            self._finish(step_key, step)
+
+    async def awrap_tool_call(self, request, execute):
+        """Асинхронный перехватчик для ToolNode(awrap_tool_call=...)."""
+        step_key, dependencies = self._dependencies(request.state, request.tool_call)
+        if not step_key:
+            return await execute(request)
+        step = self._step(step_key)
+        try:
+            for call_id in dependencies:
+                await self._event(step, call_id, asyncio.Event).wait()
+            return await execute(request)
+        finally:
+            self._event(step, request.tool_call["id"], asyncio.Event).set()
+            self._finish(step_key, step)
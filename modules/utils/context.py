@@ -0,0 +1,212 @@
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+)
+
+SUMMARY_HEADER = "[Краткое содержание более ранней части диалога]"
+CHARS_PER_TOKEN = 4
+MAX_CACHED_COUNTS = 10_000
+EXTRACT_CHARS = 300
+
+TokenCounter = Callable[[BaseMessage], int]
+Summarizer = Callable[[str, list[BaseMessage]], str]
+
+
+def _text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in message.content
+    )
+
+
+def estimate_tokens(
+    message: BaseMessage, chars_per_token: float = CHARS_PER_TOKEN
+) -> int:
+    """Грубая оценка числа токенов без обращения к API модели."""
+    chars = len(_text(message))
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        chars += len(tool_call["name"]) + len(str(tool_call["args"]))
+    return int(chars / chars_per_token) + 4
+
+
+def extractive_summary(previous: str, messages: list[BaseMessage]) -> str:
+    """
+    Дешевое сжатие без вызова модели: по одной строке на сообщение
+    с началом текста и именами вызванных инструментов.
+    """
+    lines = [previous] if previous else []
+    for message in messages:
+        text = " ".join(_text(message).split())[:EXTRACT_CHARS]
+        if isinstance(message, HumanMessage):
+            lines.append(f"- Пользователь: {text}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"  - Результат {message.name}: {text}")
+        elif isinstance(message, AIMessage):
+            for tool_call in message.tool_calls:
+                args = str(tool_call["args"])[:EXTRACT_CHARS]
+                lines.append(f"  - Агент вызвал {tool_call['name']}({args})")
+            if text:
+                lines.append(f"- Агент: {text}")
+    return "\n".join(lines)
+
+
+def make_llm_summarizer(llm) -> Summarizer:
+    """Сжатие вызовом (желательно дешевой) модели поверх экстрактивной выжимки."""
+
+    def summarize(previous: str, messages: list[BaseMessage]) -> str:
+        draft = extractive_summary("", messages)
+        response = llm.invoke(
+            [
+                HumanMessage(
+                    content=(
+                        "Сожми историю работы агента-программиста в краткий конспект: "
+                        "задачи пользователя, принятые решения, измененные файлы, "
+                        "нерешенные вопросы. Только факты, без вступлений.\n\n"
+                        f"Текущий конспект:\n{previous or '(пусто)'}\n\n"
+                        f"Новые события:\n{draft}"
+                    )
+                )
+            ]
+        )
+        return _text(response)
+
+    return summarize
+
+
+class ContextManager:
+    """
+    Держит историю в пределах бюджета токенов. Первое сообщение (исходная задача)
+    закреплено; сообщения, не помещающиеся в бюджет, сворачиваются в скользящий
+    конспект (его размер ограничен отдельно, summary_max_tokens), а не выбрасываются.
+    Вызов инструмента и его результаты (AIMessage с tool_calls и следующие
+    за ним ToolMessage) всегда сохраняются или сворачиваются вместе.
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        summary_max_tokens: int,
+        summarizer: Summarizer = extractive_summary,
+        token_counter: TokenCounter = estimate_tokens,
+    ):
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer
+        self.token_counter = token_counter
+        self.summary = ""
+        self.last_trimmed = 0
+        self._summarized_ids: set[str] = set()
+        self._counts: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.summary = ""
+            self.last_trimmed = 0
+            self._summarized_ids.clear()
+
+    def count(self, message: BaseMessage) -> int:
+        """Число токенов сообщения; считается один раз и кэшируется по id сообщения."""
+        if not message.id:
+            message.id = str(uuid.uuid4())
+        count = self._counts.get(message.id)
+        if count is None:
+            count = self._counts[message.id] = self.token_counter(message)
+            if len(self._counts) > MAX_CACHED_COUNTS:
+                self._counts.popitem(last=False)
+        return count
+
+    @staticmethod
+    def _units(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+        """Группирует сообщения так, чтобы вызов инструмента не отрывался от результата."""
+        units: list[list[BaseMessage]] = []
+        for message in messages:
+            if isinstance(message, ToolMessage) and units:
+                units[-1].append(message)
+            else:
+                units.append([message])
+        return units
+
+    def _summary_message(self) -> HumanMessage:
+        return HumanMessage(content=f"{SUMMARY_HEADER}\n{self.summary}", id="summary")
+
+    def _summary_tokens(self) -> int:
+        if not self.summary:
+            return 0
+        return self.token_counter(self._summary_message())
+
+    def _clip_summary(self) -> None:
+        chars_budget = self.summary_max_tokens * CHARS_PER_TOKEN
+        if len(self.summary) > chars_budget:
+            self.summary = "...\n" + self.summary[-chars_budget:].split("\n", 1)[-1]
+
+    def _fold(self, units: list[list[BaseMessage]]) -> None:
+        folded = [
+            message
+            for unit in units
+            for message in unit
+            if message.id not in self._summarized_ids
+        ]
+        if folded:
+            self.summary = self.summarizer(self.summary, folded)
+            self._clip_summary()
+            self._summarized_ids.update(message.id for message in folded)
+
+    def manage(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        with self._lock:
+            self.last_trimmed = 0
+            if not messages:
+                return messages
+            total = sum(self.count(message) for message in messages)
+            if total <= self.token_budget and not self._summarized_ids:
+                return messages
+
+            pinned, units = messages[0], self._units(messages[1:])
+            budget = self.token_budget - self.count(pinned)
+            # Конспект добавляется к отобранным сообщениям, поэтому его размер
+            # вычитается из бюджета заранее.
+            available = budget - self._summary_tokens()
+
+            kept: list[list[BaseMessage]] = []
+            for unit in reversed(units):
+                if unit[0].id in self._summarized_ids:
+                    break
+                unit_tokens = sum(self.count(message) for message in unit)
+                if kept and unit_tokens > available:
+                    break
+                available -= unit_tokens
+                kept.append(unit)
+            kept.reverse()
+
+            folded = units[: len(units) - len(kept)]
+            while True:
+                self._fold(folded)
+                # Конспект мог вырасти после сворачивания: если он больше не
+                # помещается, сворачиваются и самые старые из оставленных сообщений.
+                excess = (
+                    self._summary_tokens()
+                    + sum(self.count(message) for unit in kept for message in unit)
+                    - budget
+                )
+                if excess <= 0 or len(kept) <= 1:
+                    break
+                folded = []
+                while excess > 0 and len(kept) > 1:
+                    unit = kept.pop(0)
+                    excess -= sum(self.count(message) for message in unit)
+                    folded.append(unit)
+
+            recent = [message for unit in kept for message in unit]
+            self.last_trimmed = len(messages) - 1 - len(recent)
+            if not self.summary:
+                return [pinned] + recent
+            return [pinned, self._summary_message()] + recent
@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+import json
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+
+def _message_chunks(message: AIMessage) -> Iterator[ChatGenerationChunk]:
+    """Чанки ответа так, как их стримит настоящая модель."""
+    for word in message.content.split(" ") if message.content else []:
+        yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+    yield ChatGenerationChunk(
+        message=AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {
+                    "name": call["name"],
+                    "args": json.dumps(call["args"]),
+                    "id": call["id"],
+                    "index": i,
+                }
+                for i, call in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        )
+    )
+
+
+class ScriptedChatModel(GenericFakeChatModel):
+    """
+    Фейковая модель, которая по очереди воспроизводит заранее заданные ответы,
+    включая вызовы инструментов, и стримит их так же, как настоящая модель:
+    текст по словам, вызовы инструментов отдельным чанком. Нужна тестам,
+    бенчмаркам и нагрузочным прогонам цикла агента без сети.
+    """
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = next(self.messages)
+        if isinstance(message, str):
+            message = AIMessage(content=message)
+        for chunk in _message_chunks(message):
+            if run_manager and chunk.text:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class ReactiveChatModel(BaseChatModel):
+    """
+    Фейковая модель для нагрузочных прогонов сервера: на сообщение пользователя
+    отвечает вызовами tool_calls, на результаты инструментов — текстом reply.
+    Ответ зависит только от последнего сообщения, поэтому одну модель могут
+    делить параллельные сессии. latency имитирует время ответа API; в
+    асинхронном режиме ожидание не занимает поток.
+    """
+
+    tool_calls: list[tuple[str, dict]] = Field(default_factory=list)
+    reply: str = "Готово."
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "reactive-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _respond(self, messages) -> AIMessage:
+        if self.tool_calls and not isinstance(messages[-1], ToolMessage):
+            return tool_call_turn(self.tool_calls, prefix=uuid.uuid4().hex[:12])
+        return AIMessage(content=self.reply)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for chunk in _message_chunks(self._respond(messages)):
+            if run_manager and chunk.text:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for chunk in _message_chunks(self._respond(messages)):
+            if run_manager and chunk.text:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def tool_call_turn(
+    calls: Iterable[tuple[str, dict]], prefix: str = "call"
+) -> AIMessage:
+    """Ответ модели с вызовами инструментов (имя, аргументы) и уникальными id."""
+    return AIMessage(
+        content="",
+        tool_calls=[
+            {"name": name, "args": args, "id": f"{prefix}-{i}"}
+            for i, (name, args) in enumerate(calls)
+        ],
+    )
+
+
+def replay_trajectory(
+    trajectory: list[AIMessage], repeat: bool = False
+) -> ScriptedChatModel:
+    """Модель, проигрывающая траекторию один раз или по кругу."""
+    replies = itertools.cycle(trajectory) if repeat else iter(trajectory)
+    return ScriptedChatModel(messages=replies)
@@ -0,0 +1,131 @@
+import os
+import re
+from typing import NamedTuple
+
+DEFAULT_EXCLUDED_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".venv",
+        "venv",
+        "node_modules",
+        "__pycache__",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".tox",
+        "dist",
+        "build",
+    }
+)
+
+
+class IgnoreRule(NamedTuple):
+    base: str
+    pattern: str
+    negate: bool
+    dir_only: bool
+    anchored: bool
+    regex: re.Pattern[str]
+
+
+def translate_pattern(pattern: str) -> re.Pattern[str]:
+    """
+    Шаблон .gitignore в регулярное выражение: '*', '?' и '[...]' не выходят
+    за пределы одного сегмента пути, '**' совпадает с любым числом сегментов.
+    """
+    parts, i = [], 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[" and (end := pattern.find("]", i + 2)) != -1:
+            body = pattern[i + 1 : end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+            continue
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return re.compile("".join(parts) + r"\Z")
+
+
+def parse_gitignore(text: str, base: str = "") -> list[IgnoreRule]:
+    """
+    Разбирает содержимое .gitignore. base — путь директории с этим файлом
+    относительно корня (пустая строка для корня).
+    """
+    rules = []
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if line.startswith("**/"):
+            line, anchored = line[3:], False
+        if line:
+            rules.append(
+                IgnoreRule(
+                    base, line, negate, dir_only, anchored, translate_pattern(line)
+                )
+            )
+    return rules
+
+
+class IgnoreMatcher:
+    """
+    Набор правил исключения в стиле .gitignore: служебные директории по умолчанию
+    плюс правила из .gitignore, найденных при обходе. Поддерживаются отрицание (!),
+    правила только для директорий (/) и привязка к директории .gitignore.
+    Последнее подходящее правило побеждает, как в git.
+    """
+
+    def __init__(self, rules: list[IgnoreRule] | None = None, use_defaults=True):
+        self.rules = list(rules or [])
+        self.use_defaults = use_defaults
+
+    def load(self, dir_path: str, rel_dir: str) -> None:
+        """Добавляет правила из dir_path/.gitignore, если файл существует."""
+        try:
+            with open(os.path.join(dir_path, ".gitignore"), "r", encoding="utf-8") as f:
+                self.rules.extend(parse_gitignore(f.read(), rel_dir))
+        except (FileNotFoundError, NotADirectoryError, UnicodeDecodeError):
+            pass
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        name = rel_path.rsplit("/", 1)[-1]
+        if self.use_defaults and is_dir and name in DEFAULT_EXCLUDED_DIRS:
+            return True
+        ignored = False
+        for rule in self.rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.base:
+                if not rel_path.startswith(rule.base + "/"):
+                    continue
+                local_path = rel_path[len(rule.base) + 1 :]
+            else:
+                local_path = rel_path
+            target = local_path if rule.anchored else name
+            if rule.regex.match(target):
+                ignored = not rule.negate
+        return ignored
@@ -0,0 +1,486 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import stat
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any
+
+from modules.settings.agent_config import settings
+from modules.utils.read_cache import read_cache
+
+# ioctl FICLONE (Linux): копия, разделяющая блоки с исходным файлом (btrfs, xfs).
+FICLONE = 0x40049409
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    tool TEXT NOT NULL,
+    summary TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    step_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    digest TEXT,
+    mode INTEGER,
+    size INTEGER,
+    target TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_step ON entries (step_id);
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS snapshots (
+    name TEXT PRIMARY KEY,
+    step_id INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+def _reflink(source: str, destination: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            return False
+
+
+def _clone(source: str, destination: str) -> None:
+    """
+    Независимая копия файла (новый inode): reflink, если файловая система
+    умеет, иначе обычное копирование ядром. Появляется атомарно.
+    """
+    tmp_path = f"{destination}.{uuid.uuid4().hex}.tmp"
+    try:
+        if not _reflink(source, tmp_path):
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _remove_path(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+class JournalStep:
+    """
+    Один шаг журнала — прежнее состояние путей, которые меняет один вызов
+    инструмента. Записи, чьи пути к концу шага не изменились (инструмент
+    вернул ошибку или записывать было нечего), отбрасываются.
+    """
+
+    def __init__(self, journal: "Journal", tool: str, summary: str):
+        self.journal = journal
+        self.tool = tool
+        self.summary = summary
+        self.entries: list[dict[str, Any]] = []
+        self._recorded: set[str] = set()
+
+    def _add(self, path: str, kind: str, **fields) -> None:
+        self._recorded.add(path)
+        self.entries.append({"path": path, "kind": kind, **fields})
+
+    def record(self, safe_path: str) -> None:
+        """
+        Запоминает состояние пути до изменения: содержимое файла (блоб),
+        директорию со всем содержимым или отсутствие пути — тогда отсутствующим
+        помечается самый верхний несуществующий родитель, чтобы отмена убрала
+        и созданные вместе с файлом директории.
+        """
+        if safe_path in self._recorded:
+            return
+        if os.path.lexists(safe_path):
+            self._record_existing(safe_path)
+            return
+        path, parent = safe_path, os.path.dirname(safe_path)
+        while parent != path and not os.path.lexists(parent):
+            path, parent = parent, os.path.dirname(parent)
+        if path not in self._recorded:
+            self._add(path, "absent")
+
+    def _record_existing(self, path: str) -> None:
+        info = os.lstat(path)
+        if stat.S_ISLNK(info.st_mode):
+            self._add(path, "link", target=os.readlink(path))
+        elif stat.S_ISDIR(info.st_mode):
+            self._add(path, "dir", mode=stat.S_IMODE(info.st_mode))
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.path not in self._recorded:
+                        self._record_existing(entry.path)
+        elif stat.S_ISREG(info.st_mode):
+            digest, linked = self.journal.store_blob(path, info)
+            self._add(
+                path,
+                "file",
+                digest=digest,
+                mode=stat.S_IMODE(info.st_mode),
+                size=info.st_size,
+                ino=info.st_ino,
+                mtime_ns=info.st_mtime_ns,
+                linked=linked,
+            )
+
+    def record_size(self, safe_path: str) -> None:
+        """Для дописывания в конец: достаточно прежнего размера файла."""
+        if safe_path in self._recorded:
+            return
+        try:
+            size = os.path.getsize(safe_path)
+        except OSError:
+            return
+        self._add(safe_path, "size", size=size)
+
+    def record_move(self, source: str, destination: str) -> None:
+        self._add(source, "move", target=destination)
+
+    @staticmethod
+    def _changed(entry: dict[str, Any]) -> bool:
+        path, kind = entry["path"], entry["kind"]
+        try:
+            if kind == "absent":
+                return os.path.lexists(path)
+            if kind == "dir":
+                return not os.path.isdir(path)
+            if kind == "link":
+                return not os.path.islink(path) or os.readlink(path) != entry["target"]
+            if kind == "size":
+                return os.path.getsize(path) != entry["size"]
+            if kind == "move":
+                return os.path.lexists(entry["target"])
+            info = os.lstat(path)
+            return (info.st_ino, info.st_mtime_ns, info.st_size) != (
+                entry["ino"],
+                entry["mtime_ns"],
+                entry["size"],
+            )
+        except OSError:
+            return True
+
+    def commit(self) -> None:
+        kept = []
+        for entry in self.entries:
+            if self._changed(entry):
+                kept.append(entry)
+            elif entry.get("linked"):
+                # Блоб — жесткая ссылка на файл, который остался на месте:
+                # разрываем ее, иначе правка файла на месте испортит блоб.
+                self.journal.detach_blob(entry["digest"])
+        self.journal.commit_step(self, kept)
+
+
+class Journal:
+    """
+    Журнал отмены для одной рабочей директории. Перед каждым изменяющим
+    вызовом инструмента сохраняется прежнее состояние затронутых путей;
+    содержимое файлов хранится по sha1 (одинаковые версии — один блоб) и,
+    где возможно, жесткой ссылкой на старый inode: инструменты записи
+    подменяют файл новым inode, так что старая версия не копируется.
+    Отмена N шагов трогает только пути из этих шагов. Объем журнала
+    ограничен числом шагов и размером блобов: старые шаги удаляются.
+    Число шагов и объем блобов держатся в памяти, а при удалении шагов
+    проверяются только их блобы, поэтому запись шага не сканирует журнал.
+    """
+
+    def __init__(self, state_dir: str, max_steps: int, max_bytes: int):
+        self.state_dir = state_dir
+        self.objects_dir = os.path.join(state_dir, "objects")
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(state_dir, "journal.sqlite"), check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        # Блобы шагов, которые еще не зафиксированы: сборщик мусора их не трогает.
+        self._pending: Counter[str] = Counter()
+        # Блобы, оставшиеся без ссылок после прерванной работы, убираются при открытии.
+        self._drop_unreferenced_blobs()
+        self._db.commit()
+        (self._steps,) = self._db.execute("SELECT COUNT(*) FROM steps").fetchone()
+        (self._bytes,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def begin(self, tool: str, summary: str) -> JournalStep:
+        return JournalStep(self, tool, summary)
+
+    def store_blob(self, path: str, info: os.stat_result) -> tuple[str, bool]:
+        """Сохраняет содержимое файла; возвращает (sha1, создана ли жесткая ссылка)."""
+        cached = read_cache.peek(path)
+        if cached is not None and cached.digest:
+            digest = cached.digest
+        else:
+            with open(path, "rb") as f:
+                digest = hashlib.file_digest(f, "sha1").hexdigest()
+        blob_path = self._blob_path(digest)
+        with self._lock:
+            self._pending[digest] += 1
+            if os.path.exists(blob_path):
+                return digest, False
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            try:
+                os.link(path, blob_path)
+                linked = True
+            except OSError:
+                # Другая файловая система или ссылки не поддерживаются.
+                _clone(path, blob_path)
+                linked = False
+            # Фиксируется вместе с шагом (commit_step).
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO blobs (digest, size) VALUES (?, ?)",
+                (digest, info.st_size),
+            )
+            self._bytes += info.st_size if cursor.rowcount == 1 else 0
+            return digest, linked
+
+    def detach_blob(self, digest: str) -> None:
+        blob_path = self._blob_path(digest)
+        with self._lock:
+            if os.path.exists(blob_path):
+                _clone(blob_path, blob_path)
+
+    def commit_step(self, step: JournalStep, entries: list[dict[str, Any]]) -> None:
+        with self._lock:
+            for entry in step.entries:
+                if entry.get("digest"):
+                    self._pending[entry["digest"]] -= 1
+            self._pending = +self._pending
+            kept = {entry.get("digest") for entry in entries}
+            self._bytes -= self._drop_unreferenced_blobs(
+                {
+                    entry["digest"]
+                    for entry in step.entries
+                    if entry.get("digest") and entry["digest"] not in kept
+                }
+            )
+            if not entries:
+                self._db.commit()
+                return
+            cursor = self._db.execute(
+                "INSERT INTO steps (created, tool, summary) VALUES (?, ?, ?)",
+                (time.time(), step.tool, step.summary),
+            )
+            self._db.executemany(
+                "INSERT INTO entries (step_id, seq, path, kind, digest, mode, size, target)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        cursor.lastrowid,
+                        seq,
+                        entry["path"],
+                        entry["kind"],
+                        entry.get("digest"),
+                        entry.get("mode"),
+                        entry.get("size"),
+                        entry.get("target"),
+                    )
+                    for seq, entry in enumerate(entries)
+                ],
+            )
+            self._steps += 1
+            self._gc()
+            self._db.commit()
+
+    def _gc(self) -> None:
+        """Удаляет самые старые шаги сверх лимитов и блобы, на которые больше никто не ссылается."""
+        last_removed = None
+        while self._steps > self.max_steps or (
+            self._bytes > self.max_bytes and self._steps > 0
+        ):
+            (oldest,) = self._db.execute("SELECT MIN(id) FROM steps").fetchone()
+            self._delete_step(oldest)
+            last_removed = oldest
+        if last_removed is not None:
+            # До таких снимков уже не откатиться: нужных шагов больше нет.
+            self._db.execute("DELETE FROM snapshots WHERE step_id < ?", (last_removed,))
+
+    def _delete_step(self, step_id: int) -> None:
+        """Удаляет шаг из журнала вместе с блобами, на которые больше никто не ссылается."""
+        digests = {
+            digest
+            for (digest,) in self._db.execute(
+                "SELECT digest FROM entries WHERE step_id = ? AND digest IS NOT NULL",
+                (step_id,),
+            )
+        }
+        self._db.execute("DELETE FROM entries WHERE step_id = ?", (step_id,))
+        self._db.execute("DELETE FROM steps WHERE id = ?", (step_id,))
+        self._steps -= 1
+        self._bytes -= self._drop_unreferenced_blobs(digests)
+
+    def _drop_unreferenced_blobs(self, digests: set[str] | None = None) -> int:
+        """
+        Удаляет блобы из digests (по умолчанию — все), на которые не ссылается
+        ни один шаг; возвращает освобожденный объем.
+        """
+        if digests is None:
+            rows = self._db.execute(
+                "SELECT digest, size FROM blobs WHERE digest NOT IN "
+                "(SELECT digest FROM entries WHERE digest IS NOT NULL)"
+            ).fetchall()
+        else:
+            rows = []
+            for digest in digests:
+                if self._db.execute(
+                    "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+                ).fetchone():
+                    continue
+                rows.extend(
+                    self._db.execute(
+                        "SELECT digest, size FROM blobs WHERE digest = ?", (digest,)
+                    )
+                )
+        freed = 0
+        for digest, size in rows:
+            if self._pending[digest]:
+                continue
+            blob_path = self._blob_path(digest)
+            if os.path.exists(blob_path):
+                os.remove(blob_path)
+            self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            freed += size
+        return freed
+
+    def _revert(self, path: str, kind: str, digest, mode, size, target) -> list[str]:
+        """Возвращает путь к прежнему состоянию; результат — затронутые пути."""
+        if kind == "absent":
+            _remove_path(path)
+        elif kind == "dir":
+            os.makedirs(path, exist_ok=True)
+            os.chmod(path, mode)
+        elif kind == "link":
+            _remove_path(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.symlink(target, path)
+        elif kind == "size":
+            os.truncate(path, size)
+        elif kind == "move":
+            os.rename(target, path)
+            return [target, path]
+        elif kind == "file":
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Копия, а не ссылка: рабочий файл не должен делить inode с блобом.
+            tmp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+            _clone(self._blob_path(digest), tmp_path)
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+        return [path]
+
+    def undo(self, steps: int = 1) -> tuple[list[tuple[str, str]], list[str]]:
+        """
+        Откатывает последние steps шагов. Возвращает отмененные шаги
+        (инструмент, описание) и затронутые пути. Снимки, сделанные после
+        отмененных шагов, удаляются.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, tool, summary FROM steps ORDER BY id DESC LIMIT ?", (steps,)
+            ).fetchall()
+            touched: list[str] = []
+            for step_id, _, _ in rows:
+                entries = self._db.execute(
+                    "SELECT path, kind, digest, mode, size, target FROM entries"
+                    " WHERE step_id = ? ORDER BY seq DESC",
+                    (step_id,),
+                ).fetchall()
+                for entry in entries:
+                    touched.extend(self._revert(*entry))
+                self._delete_step(step_id)
+                self._db.execute("DELETE FROM snapshots WHERE step_id >= ?", (step_id,))
+                self._db.commit()
+            return [(tool, summary) for _, tool, summary in rows], touched
+
+    def snapshot(self, name: str | None = None) -> str:
+        """Именованная точка для Restore: текущий последний шаг журнала."""
+        with self._lock:
+            (last,) = self._db.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM steps"
+            ).fetchone()
+            name = name or f"snapshot-{last}"
+            self._db.execute(
+                "INSERT OR REPLACE INTO snapshots (name, step_id, created) VALUES (?, ?, ?)",
+                (name, last, time.time()),
+            )
+            self._db.commit()
+            return name
+
+    def snapshots(self) -> list[str]:
+        with self._lock:
+            return [
+                name
+                for (name,) in self._db.execute(
+                    "SELECT name FROM snapshots ORDER BY step_id, created"
+                )
+            ]
+
+    def restore(self, name: str) -> tuple[list[tuple[str, str]], list[str]]:
+        """Откатывает все шаги после снимка name; KeyError, если снимка нет."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT step_id FROM snapshots WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(name)
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM steps WHERE id > ?", (row[0],)
+            ).fetchone()
+            return self.undo(count) if count else ([], [])
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            (steps,) = self._db.execute("SELECT COUNT(*) FROM steps").fetchone()
+            blobs, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+            (snapshots,) = self._db.execute("SELECT COUNT(*) FROM snapshots").fetchone()
+            return {
+                "steps": steps,
+                "snapshots": snapshots,
+                "blobs": blobs,
+                "bytes": size,
+            }
+
+
+_journals: dict[tuple[str, str], Journal] = {}
+_journals_lock = threading.Lock()
+
+
+def journal_for(root: str) -> Journal:
+    """Журнал рабочей директории root (у каждой сессии сервера — свой)."""
+    key = (os.path.abspath(settings.JOURNAL_DIR), root)
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            state_dir = os.path.join(
+                key[0], hashlib.sha1(root.encode("utf-8")).hexdigest()[:16]
+            )
+            journal = _journals[key] = Journal(
+                state_dir, settings.JOURNAL_MAX_STEPS, settings.JOURNAL_MAX_BYTES
+            )
+        return journal
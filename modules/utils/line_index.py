@@ -0,0 +1,113 @@
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import NamedTuple
+
+BINARY_SNIFF_SIZE = 8192
+MAX_CACHED_INDEXES = 128
+
+
+class LineIndex(NamedTuple):
+    """Байтовые смещения начала каждой строки файла и его версия (mtime/size)."""
+
+    offsets: array
+    mtime_ns: int
+    size: int
+
+    @property
+    def line_count(self) -> int:
+        return len(self.offsets)
+
+    def byte_range(self, first_line: int, last_line: int) -> tuple[int, int]:
+        """Диапазон байтов [start, end) для строк first_line..last_line (с 1)."""
+        start = self.offsets[first_line - 1]
+        end = self.offsets[last_line] if last_line < self.line_count else self.size
+        return start, end
+
+
+_cache: OrderedDict[str, LineIndex] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _scan_buffer(buffer, size: int) -> array:
+    offsets = array("Q")
+    if size == 0:
+        return offsets
+    offsets.append(0)
+    find = buffer.find
+    position = find(b"\n")
+    while position != -1 and position + 1 < size:
+        offsets.append(position + 1)
+        position = find(b"\n", position + 1)
+    return offsets
+
+
+def _scan_offsets(safe_path: str, size: int) -> array:
+    if size == 0:
+        return array("Q")
+    with (
+        open(safe_path, "rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        return _scan_buffer(mm, size)
+
+
+def get_line_index(
+    safe_path: str,
+    data: bytes | None = None,
+    mtime_ns: int | None = None,
+) -> LineIndex:
+    """
+    Возвращает индекс строк файла. Индекс строится один раз сканированием через mmap
+    и переиспользуется, пока у файла не изменились mtime и размер. Если содержимое
+    уже прочитано (data вместе с его mtime_ns), файл не открывается и не stat-ится.
+    """
+    if data is not None and mtime_ns is not None:
+        version = (mtime_ns, len(data))
+    else:
+        stat = os.stat(safe_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _cache.get(safe_path)
+        if cached is not None and (cached.mtime_ns, cached.size) == version:
+            _cache.move_to_end(safe_path)
+            return cached
+
+    offsets = (
+        _scan_buffer(data, version[1])
+        if data is not None and mtime_ns is not None
+        else _scan_offsets(safe_path, version[1])
+    )
+    index = LineIndex(offsets, *version)
+    with _lock:
+        _cache[safe_path] = index
+        _cache.move_to_end(safe_path)
+        while len(_cache) > MAX_CACHED_INDEXES:
+            _cache.popitem(last=False)
+    return index
+
+
+def invalidate(safe_path: str) -> None:
+    with _lock:
+        _cache.pop(safe_path, None)
+
+
+def is_binary(safe_path: str) -> bool:
+    """Считает файл бинарным, если в его начале есть NUL-байт или невалидный UTF-8."""
+    with open(safe_path, "rb") as f:
+        return looks_binary(f.read(BINARY_SNIFF_SIZE))
+
+
+def looks_binary(data: bytes) -> bool:
+    """То же, что is_binary, для уже прочитанного содержимого."""
+    head = data[:BINARY_SNIFF_SIZE]
+    if b"\0" in head:
+        return True
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Обрезанный на границе буфера многобайтовый символ — не признак бинарника.
+        return e.start < len(head) - 3
+    return False
@@ -1,9 +1,60 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+import functools
+import os
+
 from modules.settings.agent_config import settings
+from modules.utils.llm_cache import CountingLLMCache, make_llm_cache
+
+
+@functools.cache
+def get_llm_cache() -> CountingLLMCache | None:
+    """Кэш ответов модели; подключается глобально при первом обращении."""
+    from langchain_core.globals import set_llm_cache
+
+    llm_cache = make_llm_cache(
+        backend=settings.LLM_CACHE,
+        path=settings.LLM_CACHE_PATH,
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+        replay=settings.LLM_CACHE_REPLAY,
+    )
+    set_llm_cache(llm_cache)
+    return llm_cache
+
+
+def _offline_key() -> dict[str, str]:
+    # В режиме воспроизведения ответы берутся только из кэша, ключ API не нужен.
+    if settings.LLM_CACHE_REPLAY and not os.getenv("GOOGLE_API_KEY"):
+        return {"google_api_key": "offline-replay"}
+    return {}
+
+
+@functools.cache
+def get_llm():
+    """
+    Клиент основной модели. Создается при первом обращении: импорт
+    langchain_google_genai заметно замедляет запуск.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    get_llm_cache()
+    return ChatGoogleGenerativeAI(
+        model=settings.LLM_MODEL_NAME,
+        temperature=settings.TEMPERATURE,
+        max_tokens=settings.MAX_TOKENS,
+        transport="rest",
+        **_offline_key(),
+    )
+
+
+def get_summary_llm():
+    """Дешевая модель для сжатия старой части диалога."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
-llm = ChatGoogleGenerativeAI(
-    model=settings.LLM_MODEL_NAME,
-    temperature=settings.TEMPERATURE,
-    max_tokens=settings.MAX_TOKENS,
-    transport="rest",
-)
+    get_llm_cache()
+    return ChatGoogleGenerativeAI(
+        model=settings.CONTEXT_SUMMARIZER_MODEL,
+        temperature=0,
+        max_tokens=settings.CONTEXT_SUMMARY_MAX_TOKENS,
+        transport="rest",
+        **_offline_key(),
+    )
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+
+# Поля сообщений, которые меняются от запуска к запуску и не влияют на ответ модели.
+VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+
+class LLMCacheMissError(RuntimeError):
+    """Промах кэша в режиме воспроизведения, где обращение к API запрещено."""
+
+
+def _normalize_prompt(prompt: str) -> str:
+    """
+    Приводит сериализованный список сообщений к стабильному виду:
+    убирает id сообщений и метаданные ответа, сортирует ключи.
+    """
+    try:
+        data = json.loads(prompt)
+    except ValueError:
+        return prompt
+
+    def strip(node: Any) -> Any:
+        if isinstance(node, list):
+            return [strip(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if node.get("lc") == 1 and isinstance(node.get("kwargs"), dict):
+            kwargs = {
+                key: strip(value)
+                for key, value in node["kwargs"].items()
+                if key not in VOLATILE_MESSAGE_FIELDS
+            }
+            return {**node, "kwargs": kwargs}
+        return {key: strip(value) for key, value in node.items()}
+
+    return json.dumps(strip(data), sort_keys=True, ensure_ascii=False)
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Ключ кэша: модель, ее параметры (температура, схемы инструментов и т.д.
+    входят в llm_string) и нормализованные сообщения.
+    """
+    digest = hashlib.sha256()
+    digest.update(llm_string.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(_normalize_prompt(prompt).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CountingLLMCache(BaseCache, ABC):
+    """Общая часть: ключи, счетчики попаданий и режим воспроизведения."""
+
+    def __init__(self, ttl_seconds: float | None = None, replay: bool = False):
+        self.ttl_seconds = ttl_seconds
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - created_at > self.ttl_seconds
+
+    @abstractmethod
+    def _get(self, key: str) -> RETURN_VAL_TYPE | None:
+        """Значение по ключу или None, если записи нет или она устарела."""
+
+    @abstractmethod
+    def _put(self, key: str, value: RETURN_VAL_TYPE) -> None:
+        """Сохраняет значение по ключу."""
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        value = self._get(cache_key(prompt, llm_string))
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is None and self.replay:
+            raise LLMCacheMissError(
+                "Ответ модели не найден в кэше, а режим воспроизведения "
+                "(LLM_CACHE_REPLAY) запрещает обращение к API."
+            )
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self._put(cache_key(prompt, llm_string), return_val)
+
+    def stats(self) -> dict[str, float]:
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+class MemoryLLMCache(CountingLLMCache):
+    """LRU-кэш в памяти процесса с ограничением по числу записей и TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float | None = None,
+        replay: bool = False,
+    ):
+        super().__init__(ttl_seconds, replay)
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, RETURN_VAL_TYPE]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> RETURN_VAL_TYPE | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[0]):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key: str, value: RETURN_VAL_TYPE) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteLLMCache(CountingLLMCache):
+    """
+    Постоянный кэш в локальной SQLite-базе. Записи вытесняются по давности
+    последнего обращения при превышении max_entries и по TTL.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10_000,
+        ttl_seconds: float | None = None,
+        replay: bool = False,
+    ):
+        super().__init__(ttl_seconds, replay)
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def _get(self, key: str) -> RETURN_VAL_TYPE | None:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1]):
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return pickle.loads(row[0])
+
+    def _put(self, key: str, value: RETURN_VAL_TYPE) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(list(value)), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+def make_llm_cache(
+    backend: str,
+    path: str,
+    max_entries: int,
+    ttl_seconds: float | None,
+    replay: bool,
+) -> CountingLLMCache | None:
+    """Создает кэш по имени бэкенда из настроек ('none', 'memory' или 'sqlite')."""
+    if backend == "memory":
+        return MemoryLLMCache(max_entries, ttl_seconds, replay)
+    if backend == "sqlite":
+        return SQLiteLLMCache(path, max_entries, ttl_seconds, replay)
+    return None
+
+
+def format_stats(cache: CountingLLMCache | None) -> str:
+    if cache is None:
+        return "Кэш LLM выключен."
+    stats = cache.stats()
+    return (
+        f"Кэш LLM ({type(cache).__name__}): попаданий {stats['hits']}, "
+        f"промахов {stats['misses']}, доля попаданий {stats['hit_ratio']:.0%}."
+    )
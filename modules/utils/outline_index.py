@@ -0,0 +1,249 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.settings.agent_config import settings
+from modules.utils.ignore import DEFAULT_EXCLUDED_DIRS
+from modules.utils.outline_parsers import (
+    MAX_OUTLINE_FILE_SIZE,
+    ParsedFile,
+    parse_batch,
+    parse_bytes,
+    parser_for,
+)
+from modules.utils.read_cache import read_cache
+
+REFRESH_INTERVAL_SECONDS = 30.0
+POOL_BATCH_SIZE = 64
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _workers() -> int:
+    return settings.OUTLINE_WORKERS or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Пул процессов для первичного разбора. Рабочие процессы порождаются через
+    forkserver с заранее импортированными разборщиками: fork многопоточного
+    процесса агента небезопасен, а spawn заново импортирует все зависимости.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn"
+            )
+            if context.get_start_method() == "forkserver":
+                context.set_forkserver_preload(["modules.utils.outline_parsers"])
+            _pool = ProcessPoolExecutor(
+                max_workers=_workers(),
+                mp_context=context,
+            )
+        return _pool
+
+
+class OutlineIndex:
+    """
+    Структура (классы, функции, методы) файлов рабочей директории.
+    Разобранные структуры хранятся по sha1 содержимого, поэтому одинаковые
+    файлы и возврат к прежней версии не требуют повторного разбора.
+    Как и TrigramIndex, строится лениво, обновляется инструментами записи
+    и сверяет mtime/size не чаще раза в REFRESH_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.RLock()
+        self._files: dict[str, tuple[int, int, str]] = {}
+        self._parsed: dict[str, ParsedFile] = {}
+        self._users: Counter[str] = Counter()
+        # В скольких файлах встречается имя: основа ранжирования карты.
+        self._referenced: Counter[str] = Counter()
+        self._ranking: list[tuple[str, int]] | None = None
+        self._built_at: float | None = None
+
+    def _rel(self, abs_path: str) -> str:
+        return os.path.relpath(abs_path, self.root).replace(os.sep, "/")
+
+    def _walk(self, top: str):
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if d not in DEFAULT_EXCLUDED_DIRS]
+            for filename in filenames:
+                if parser_for(filename) is not None:
+                    yield os.path.join(dirpath, filename)
+
+    def _drop(self, rel_path: str) -> None:
+        entry = self._files.pop(rel_path, None)
+        if entry is None:
+            return
+        digest = entry[2]
+        self._referenced.subtract(self._parsed[digest].refs)
+        self._users[digest] -= 1
+        if not self._users[digest]:
+            del self._users[digest]
+            del self._parsed[digest]
+        self._ranking = None
+
+    def _store(
+        self, rel_path: str, mtime_ns: int, size: int, digest: str, parsed: ParsedFile
+    ) -> None:
+        self._drop(rel_path)
+        self._files[rel_path] = (mtime_ns, size, digest)
+        self._parsed.setdefault(digest, parsed)
+        self._users[digest] += 1
+        self._referenced.update(parsed.refs)
+        self._ranking = None
+
+    def _add(self, abs_path: str) -> None:
+        rel_path = self._rel(abs_path)
+        try:
+            stat = os.stat(abs_path)
+        except OSError:
+            self._drop(rel_path)
+            return
+        if stat.st_size > MAX_OUTLINE_FILE_SIZE:
+            self._drop(rel_path)
+            return
+        # Индекс не заполняет кэш чтения, но пользуется уже прочитанным.
+        cached = read_cache.peek(abs_path)
+        if cached is not None:
+            data, digest = cached.data, cached.digest
+        else:
+            with open(abs_path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha1(data).hexdigest()
+        parsed = self._parsed.get(digest) or parse_bytes(abs_path, data)
+        self._store(rel_path, stat.st_mtime_ns, stat.st_size, digest, parsed)
+
+    def _add_many(self, abs_paths: list[str]) -> None:
+        if _workers() < 2 or len(abs_paths) < settings.OUTLINE_POOL_MIN_FILES:
+            for abs_path in abs_paths:
+                self._add(abs_path)
+            return
+        batches = [
+            abs_paths[i : i + POOL_BATCH_SIZE]
+            for i in range(0, len(abs_paths), POOL_BATCH_SIZE)
+        ]
+        for results in _get_pool().map(parse_batch, batches):
+            for result in results:
+                if result is not None:
+                    abs_path, mtime_ns, size, digest, parsed = result
+                    self._store(self._rel(abs_path), mtime_ns, size, digest, parsed)
+
+    def _ensure_fresh(self) -> None:
+        if (
+            self._built_at is not None
+            and time.monotonic() - self._built_at < REFRESH_INTERVAL_SECONDS
+        ):
+            return
+        seen, changed = set(), []
+        for abs_path in self._walk(self.root):
+            try:
+                stat = os.stat(abs_path)
+            except OSError:
+                continue
+            rel_path = self._rel(abs_path)
+            seen.add(rel_path)
+            if self._files.get(rel_path, ())[:2] != (stat.st_mtime_ns, stat.st_size):
+                changed.append(abs_path)
+        for rel_path in set(self._files) - seen:
+            self._drop(rel_path)
+        self._add_many(changed)
+        self._built_at = time.monotonic()
+
+    def update(self, abs_path: str) -> None:
+        """Переразбирает файл или все файлы директории после изменения."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            if os.path.isdir(abs_path):
+                self.remove(abs_path)
+                self._add_many(list(self._walk(abs_path)))
+            elif os.path.isfile(abs_path):
+                parts = self._rel(abs_path).split("/")[:-1]
+                if parser_for(abs_path) and not DEFAULT_EXCLUDED_DIRS.intersection(
+                    parts
+                ):
+                    self._add(abs_path)
+            else:
+                self.remove(abs_path)
+
+    def expire(self) -> None:
+        """Сверяет индекс с диском при следующем запросе (файлы менялись в обход инструментов)."""
+        with self._lock:
+            if self._built_at is not None:
+                self._built_at = float("-inf")
+
+    def remove(self, abs_path: str) -> None:
+        """Удаляет из индекса файл или все файлы под директорией."""
+        with self._lock:
+            rel_path = self._rel(abs_path)
+            prefix = rel_path + "/"
+            for indexed in [
+                p for p in self._files if p == rel_path or p.startswith(prefix)
+            ]:
+                self._drop(indexed)
+
+    def outline(self, abs_path: str) -> ParsedFile | None:
+        """
+        Структура файла; None, если для его расширения нет разборщика.
+        Файлы вне индекса (служебные директории) разбираются без сохранения.
+        """
+        if parser_for(abs_path) is None:
+            return None
+        with self._lock:
+            self._ensure_fresh()
+            entry = self._files.get(self._rel(abs_path))
+            if entry is not None:
+                return self._parsed[entry[2]]
+        with open(abs_path, "rb") as f:
+            return parse_bytes(abs_path, f.read())
+
+    def _rank(self) -> list[tuple[str, int]]:
+        if self._ranking is None:
+            scores = []
+            for rel_path, (_, _, digest) in self._files.items():
+                parsed = self._parsed[digest]
+                if not parsed.symbols:
+                    continue
+                names = {symbol.name for symbol in parsed.symbols if symbol.depth == 0}
+                score = sum(
+                    self._referenced[name] - (name in parsed.refs) for name in names
+                )
+                scores.append((rel_path, score))
+            scores.sort(key=lambda item: (-item[1], item[0]))
+            self._ranking = scores
+        return self._ranking
+
+    def ranked(self, prefix: str = "") -> list[tuple[str, ParsedFile, int]]:
+        """
+        Файлы с объявлениями под prefix, от самых используемых: вес файла —
+        число других файлов, где встречаются имена его объявлений верхнего уровня.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return [
+                (rel_path, self._parsed[self._files[rel_path][2]], score)
+                for rel_path, score in self._rank()
+                if rel_path.startswith(prefix)
+            ]
+
+
+_indexes: dict[str, OutlineIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: str) -> OutlineIndex:
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = OutlineIndex(root)
+        return index
@@ -0,0 +1,209 @@
+import ast
+import hashlib
+import os
+import re
+from typing import NamedTuple, Protocol
+
+# Модуль загружается в рабочих процессах пула, поэтому зависит только от stdlib.
+
+MAX_OUTLINE_FILE_SIZE = 1024 * 1024
+
+_IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]*")
+
+
+class Symbol(NamedTuple):
+    """Объявление в файле: класс, функция или метод."""
+
+    kind: str
+    name: str
+    signature: str
+    line: int
+    end_line: int
+    depth: int
+
+
+class ParsedFile(NamedTuple):
+    """Структура файла: объявления, используемые имена (для ранжирования) и ошибка разбора."""
+
+    symbols: tuple[Symbol, ...]
+    refs: frozenset[str]
+    error: str | None = None
+
+
+class OutlineParser(Protocol):
+    """
+    Разборщик структуры файлов одного языка. Реализация должна быть
+    доступна на уровне модуля, чтобы работать в процессах пула.
+    """
+
+    extensions: tuple[str, ...]
+
+    def parse(self, text: str) -> ParsedFile: ...
+
+
+class PythonParser:
+    """Классы, функции и методы Python через ast; тела функций не обходятся."""
+
+    extensions = (".py", ".pyi")
+
+    @staticmethod
+    def _signature(node: ast.AST) -> tuple[str, str]:
+        if isinstance(node, ast.ClassDef):
+            bases = [ast.unparse(base) for base in node.bases]
+            bases += [ast.unparse(keyword) for keyword in node.keywords]
+            return "class", f"class {node.name}" + (
+                f"({', '.join(bases)})" if bases else ""
+            )
+        prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+        signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+        if node.returns is not None:
+            signature += f" -> {ast.unparse(node.returns)}"
+        return "function", signature
+
+    def _collect(self, body: list[ast.stmt], depth: int, symbols: list[Symbol]) -> None:
+        for node in body:
+            if not isinstance(
+                node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+            ):
+                continue
+            kind, signature = self._signature(node)
+            if kind == "function" and depth:
+                kind = "method"
+            symbols.append(
+                Symbol(
+                    kind,
+                    node.name,
+                    signature,
+                    node.lineno,
+                    node.end_lineno or node.lineno,
+                    depth,
+                )
+            )
+            if isinstance(node, ast.ClassDef):
+                self._collect(node.body, depth + 1, symbols)
+
+    def parse(self, text: str) -> ParsedFile:
+        try:
+            tree = ast.parse(text)
+        except SyntaxError as e:
+            return ParsedFile((), frozenset(), f"{e.msg} (строка {e.lineno})")
+        except ValueError as e:
+            return ParsedFile((), frozenset(), str(e))
+        symbols: list[Symbol] = []
+        self._collect(tree.body, 0, symbols)
+        # Имена для ранжирования собираются регулярным выражением: обход всего
+        # дерева обходится дороже самого разбора, а ранжированию хватает токенов.
+        return ParsedFile(tuple(symbols), frozenset(_IDENTIFIER.findall(text)))
+
+
+class RegexParser:
+    """
+    Разборщик по регулярным выражениям для языков без парсера в stdlib.
+    patterns — (вид, выражение с группой name); объявление — одна строка,
+    вложенность определяется по отступу.
+    """
+
+    def __init__(self, extensions: tuple[str, ...], patterns: list[tuple[str, str]]):
+        self.extensions = extensions
+        self.patterns = [(kind, re.compile(pattern)) for kind, pattern in patterns]
+
+    def parse(self, text: str) -> ParsedFile:
+        symbols = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            for kind, pattern in self.patterns:
+                match = pattern.match(line)
+                if match:
+                    indent = len(line) - len(line.lstrip())
+                    symbols.append(
+                        Symbol(
+                            kind,
+                            match.group("name"),
+                            line.strip().rstrip("{").strip(),
+                            number,
+                            number,
+                            1 if indent else 0,
+                        )
+                    )
+                    break
+        return ParsedFile(tuple(symbols), frozenset(_IDENTIFIER.findall(text)))
+
+
+PARSERS: dict[str, OutlineParser] = {}
+
+
+def register_parser(parser: OutlineParser) -> None:
+    """Подключает разборщик для его расширений файлов."""
+    for extension in parser.extensions:
+        PARSERS[extension] = parser
+
+
+register_parser(PythonParser())
+register_parser(
+    RegexParser(
+        (".js", ".jsx", ".ts", ".tsx", ".mjs"),
+        [
+            (
+                "class",
+                r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(?P<name>[\w$]+)",
+            ),
+            (
+                "function",
+                r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s+(?P<name>[\w$]+)",
+            ),
+            (
+                "function",
+                (
+                    r"^\s*(?:export\s+)?(?:const|let)\s+(?P<name>[\w$]+)\s*=\s*(?:async\s+)?"
+                    r"(?:\([^)]*\)|[\w$]+)\s*=>"
+                ),
+            ),
+            ("interface", r"^\s*(?:export\s+)?interface\s+(?P<name>[\w$]+)"),
+            (
+                "method",
+                (
+                    r"^\s+(?:public\s+|private\s+|protected\s+|static\s+|async\s+)*"
+                    r"(?P<name>(?!if\b|for\b|while\b|switch\b|catch\b|return\b)[\w$]+)"
+                    r"\s*\([^)]*\)\s*(?::\s*[^{]+)?\{"
+                ),
+            ),
+        ],
+    )
+)
+
+
+def parser_for(path: str) -> OutlineParser | None:
+    return PARSERS.get(os.path.splitext(path)[1].lower())
+
+
+def parse_bytes(path: str, data: bytes) -> ParsedFile:
+    parser = parser_for(path)
+    if parser is None:
+        return ParsedFile((), frozenset())
+    return parser.parse(data.decode("utf-8", errors="replace"))
+
+
+def parse_batch(
+    paths: list[str],
+) -> list[tuple[str, int, int, str, ParsedFile] | None]:
+    """
+    Задача для процесса пула: читает, хэширует и разбирает файлы. Для каждого
+    пути — (путь, mtime_ns, размер, sha1, структура) или None, если файл
+    недоступен или слишком велик.
+    """
+    results = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            if stat.st_size > MAX_OUTLINE_FILE_SIZE:
+                results.append(None)
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            results.append(None)
+            continue
+        digest = hashlib.sha1(data).hexdigest()
+        results.append(
+            (path, stat.st_mtime_ns, stat.st_size, digest, parse_bytes(path, data))
+        )
+    return results
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from modules.settings.agent_config import settings
+
+
+class CachedFile(NamedTuple):
+    """Содержимое файла и версия, при которой оно прочитано."""
+
+    data: bytes
+    digest: str
+    mtime_ns: int
+    size: int
+    ino: int
+
+
+class ReadCache:
+    """
+    Кэш содержимого файлов для инструментов чтения и поиска.
+
+    Ключ — разрешенный путь; запись действительна, пока у файла совпадают
+    mtime_ns, размер и inode. Содержимое хранится по хэшу, поэтому одинаковые
+    файлы (копии, сгенерированные заглушки) занимают память один раз. Объем
+    ограничен max_bytes с вытеснением давно не использованных путей; файлы
+    больше max_file_bytes не кэшируются и читаются инструментами напрямую.
+    Инструменты записи кладут новое содержимое сразу в кэш, так что после
+    записи файл не перечитывается.
+    """
+
+    def __init__(self, max_bytes: int, max_file_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._paths: OrderedDict[str, CachedFile] = OrderedDict()
+        # хэш -> [содержимое, число путей с этим содержимым]
+        self._blobs: dict[str, list] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def _matches(entry: CachedFile, stat: os.stat_result) -> bool:
+        return (
+            entry.mtime_ns == stat.st_mtime_ns
+            and entry.size == stat.st_size
+            and entry.ino == stat.st_ino
+        )
+
+    def _release(self, entry: CachedFile) -> None:
+        blob = self._blobs[entry.digest]
+        blob[1] -= 1
+        if blob[1] == 0:
+            del self._blobs[entry.digest]
+            self._bytes -= len(blob[0])
+
+    def _store(self, safe_path: str, data: bytes, stat: os.stat_result) -> CachedFile:
+        digest = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            old = self._paths.pop(safe_path, None)
+            if old is not None:
+                self._release(old)
+            blob = self._blobs.get(digest)
+            if blob is None:
+                blob = self._blobs[digest] = [data, 0]
+                self._bytes += len(data)
+            blob[1] += 1
+            entry = CachedFile(
+                blob[0], digest, stat.st_mtime_ns, stat.st_size, stat.st_ino
+            )
+            self._paths[safe_path] = entry
+            while self._bytes > self.max_bytes and len(self._paths) > 1:
+                _, evicted = self._paths.popitem(last=False)
+                self._release(evicted)
+            return entry
+
+    def get(self, safe_path: str, populate: bool = True) -> CachedFile | None:
+        """
+        Содержимое файла из кэша или с диска. None — файл слишком большой
+        для кэша (читайте его потоково). populate=False не кладет прочитанное
+        в кэш: так массовые проходы (индексация) не вытесняют рабочие файлы.
+        """
+        stat = os.stat(safe_path)
+        if stat.st_size > self.max_file_bytes:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        with self._lock:
+            entry = self._paths.get(safe_path)
+            if entry is not None and self._matches(entry, stat):
+                self._paths.move_to_end(safe_path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        with open(safe_path, "rb") as f:
+            data = f.read()
+        if len(data) != stat.st_size:
+            # Файл меняется прямо сейчас: отдаем прочитанное, но не кэшируем.
+            return CachedFile(data, "", stat.st_mtime_ns, len(data), stat.st_ino)
+        if not populate:
+            return CachedFile(data, "", stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        return self._store(safe_path, data, stat)
+
+    def peek(self, safe_path: str) -> CachedFile | None:
+        """Действительная запись из кэша без чтения с диска и без учета в статистике."""
+        try:
+            stat = os.stat(safe_path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._paths.get(safe_path)
+            if entry is not None and self._matches(entry, stat):
+                return entry
+        return None
+
+    def put(self, safe_path: str, data: bytes) -> None:
+        """Запоминает только что записанное содержимое (проверяется по размеру на диске)."""
+        stat = os.stat(safe_path)
+        if stat.st_size != len(data) or stat.st_size > self.max_file_bytes:
+            # Например, перевод строк в текстовом режиме изменил байты.
+            self.invalidate(safe_path)
+            return
+        self._store(safe_path, data, stat)
+
+    def invalidate(self, safe_path: str) -> None:
+        """Забывает путь и все пути под ним (для директорий)."""
+        prefix = safe_path.rstrip(os.sep) + os.sep
+        with self._lock:
+            for path in [
+                p for p in self._paths if p == safe_path or p.startswith(prefix)
+            ]:
+                self._release(self._paths.pop(path))
+
+    def move(self, source: str, destination: str) -> None:
+        """Переносит записи после переименования: содержимое и inode не меняются."""
+        prefix = source.rstrip(os.sep) + os.sep
+        with self._lock:
+            moved = [
+                (path, entry)
+                for path, entry in self._paths.items()
+                if path == source or path.startswith(prefix)
+            ]
+            for path, _ in moved:
+                del self._paths[path]
+            for path, entry in moved:
+                new_path = destination + path[len(source) :]
+                old = self._paths.pop(new_path, None)
+                if old is not None:
+                    self._release(old)
+                self._paths[new_path] = entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._paths.clear()
+            self._blobs.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "paths": len(self._paths),
+                "blobs": len(self._blobs),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+read_cache = ReadCache(
+    settings.READ_CACHE_MAX_BYTES, settings.READ_CACHE_MAX_FILE_BYTES
+)
+
+
+def format_stats() -> str:
+    stats = read_cache.stats()
+    return (
+        f"Кэш чтения: попаданий {stats['hits']}, промахов {stats['misses']}, "
+        f"доля попаданий {stats['hit_ratio']:.0%}, мимо кэша (большие файлы) "
+        f"{stats['bypassed']}; путей {stats['paths']}, уникальных блоков "
+        f"{stats['blobs']}, {stats['bytes'] / 2**20:.1f} из "
+        f"{stats['max_bytes'] / 2**20:.0f} МБ."
+    )
@@ -0,0 +1,70 @@
+import threading
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+from pydantic import BaseModel
+
+
+class ToolSpec(NamedTuple):
+    func: Callable[..., str]
+    args_schema: type[BaseModel]
+    read_only: bool
+
+
+# Имя инструмента для модели (PascalCase) -> описание. Порядок — порядок регистрации.
+TOOL_REGISTRY: dict[str, ToolSpec] = {}
+
+_structured_tools: list[Any] | None = None
+_structured_tools_lock = threading.Lock()
+
+
+def snake_to_pascal(name: str) -> str:
+    return "".join(word.capitalize() for word in name.split("_"))
+
+
+def register_tool(args_schema: type[BaseModel], *, read_only: bool = False):
+    """
+    Регистрирует функцию как инструмент агента. Имя для модели — имя функции
+    в PascalCase, описание — ее docstring. read_only помечает инструменты,
+    которые только читают рабочую директорию и могут выполняться параллельно
+    без упорядочивания.
+    """
+
+    def register(func: Callable[..., str]) -> Callable[..., str]:
+        name = snake_to_pascal(func.__name__)
+        if name in TOOL_REGISTRY and TOOL_REGISTRY[name].func is not func:
+            raise ValueError(f"Инструмент '{name}' уже зарегистрирован.")
+        TOOL_REGISTRY[name] = ToolSpec(func, args_schema, read_only)
+        return func
+
+    return register
+
+
+def read_only_tool_names() -> list[str]:
+    return [name for name, spec in TOOL_REGISTRY.items() if spec.read_only]
+
+
+def get_structured_tools() -> list[Any]:
+    """
+    Список StructuredTool по реестру. Собирается при первом обращении
+    (импорт langchain и построение схем не нужны, пока агент не запущен)
+    и пересобирается, только если с тех пор зарегистрированы новые инструменты.
+    """
+    global _structured_tools
+    with _structured_tools_lock:
+        if _structured_tools is None or len(_structured_tools) != len(TOOL_REGISTRY):
+            from langchain_core.tools import StructuredTool
+
+            from modules.utils.concurrency import make_coroutine
+
+            _structured_tools = [
+                StructuredTool.from_function(
+                    func=spec.func,
+                    coroutine=make_coroutine(spec.func),
+                    name=name,
+                    args_schema=spec.args_schema,
+                    description=spec.func.__doc__,
+                )
+                for name, spec in TOOL_REGISTRY.items()
+            ]
+        return _structured_tools
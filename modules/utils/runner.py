@@ -0,0 +1,425 @@
+import atexit
+import codecs
+import json
+import os
+import re
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+from modules.settings.agent_config import settings
+from modules.utils import warm_worker
+
+COMMAND_OUTPUT_EVENT = "command_output"
+READ_CHUNK_BYTES = 64 * 1024
+KILL_GRACE_SECONDS = 2.0
+PYTEST_WARM_ADDOPTS = "-W ignore::pytest.PytestAssertRewriteWarning"
+WARM_SUPPORTED = hasattr(os, "fork") and hasattr(socket, "send_fds")
+
+_SECRET_ENV = re.compile(r"KEY|TOKEN|SECRET|PASSWORD|CREDENTIAL", re.IGNORECASE)
+_PYTHON_NAMES = {
+    "python",
+    "python3",
+    f"python{sys.version_info.major}.{sys.version_info.minor}",
+}
+_PYTEST_NAMES = {"pytest", "py.test"}
+# Обычные команды получают лимиты от оболочки перед exec, а не из preexec_fn:
+# тот выполняет Python-код между fork и exec, что небезопасно, пока у процесса
+# агента есть другие потоки. Аргументы: секунды процессора, КБ памяти, команда.
+_LIMITS_WRAPPER = (
+    'ulimit -c 0; ulimit -t "$1"; ulimit -v "$2" 2>/dev/null; shift 2; '
+    'command -v "$1" >/dev/null 2>&1 || { echo "Команда не найдена: $1" >&2; exit 127; }; '
+    'exec "$@"'
+)
+
+
+class CommandResult(NamedTuple):
+    """Итог команды. exit_code < 0 — процесс завершен сигналом, None — код неизвестен."""
+
+    exit_code: int | None
+    output: str
+    duration: float
+    timed_out: bool
+    warm: bool
+
+
+class OutputCapture:
+    """
+    Вывод команды в пределах max_bytes: сохраняются начало и конец,
+    середина отбрасывается с пометкой (ошибки обычно в конце вывода).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.head_limit = max_bytes // 4
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+
+    def feed(self, data: bytes) -> None:
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        self.tail += data
+        # Хвост обрезается с запасом, чтобы не сдвигать буфер на каждом куске.
+        if len(self.tail) > 2 * self.tail_limit:
+            excess = len(self.tail) - self.tail_limit
+            del self.tail[:excess]
+            self.dropped += excess
+
+    def text(self) -> str:
+        excess = max(0, len(self.tail) - self.tail_limit)
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail[excess:].decode("utf-8", errors="replace")
+        dropped = self.dropped + excess
+        if not dropped:
+            return head + tail
+        return f"{head}\n[... пропущено {dropped} байт вывода ...]\n{tail}"
+
+
+def _resolve(command: str, cwd: str) -> str | None:
+    """Путь к исполняемому файлу команды так, как его найдет запуск из cwd."""
+    if os.path.dirname(command):
+        path = os.path.join(cwd, command)
+        return path if os.access(path, os.X_OK) else None
+    return shutil.which(command)
+
+
+def _agent_interpreter(path: str | None) -> bool:
+    """
+    Это интерпретатор агента: тот же файл в той же директории bin (от ее
+    расположения зависит окружение, например virtualenv проекта).
+    """
+    agent_bin = os.path.dirname(os.path.abspath(sys.executable))
+    return (
+        path is not None
+        and os.path.dirname(os.path.abspath(path)) == agent_bin
+        and os.path.samefile(path, sys.executable)
+    )
+
+
+def python_job(argv: list[str], cwd: str = ".") -> tuple[str, str, list[str]] | None:
+    """
+    Запуск Python, который можно выполнить в теплом процессе:
+    (режим, цель, sys.argv). None — команду нужно запускать обычным процессом.
+    Теплые процессы — это интерпретатор агента с его пакетами, поэтому в них
+    идут только команды, которые и так запустили бы его: python, найденный
+    в PATH, должен совпадать с sys.executable, а pytest — лежать рядом с ним.
+    Python и pytest из окружения проекта запускаются как есть.
+    """
+    name = os.path.basename(argv[0])
+    if name in _PYTEST_NAMES:
+        path = _resolve(argv[0], cwd)
+        agent_bin = os.path.dirname(os.path.abspath(sys.executable))
+        if path is None or os.path.dirname(os.path.abspath(path)) != agent_bin:
+            return None
+        return "module", "pytest", ["pytest", *argv[1:]]
+    if name not in _PYTHON_NAMES and argv[0] != sys.executable:
+        return None
+    if not _agent_interpreter(_resolve(argv[0], cwd)):
+        return None
+    rest = argv[1:]
+    if len(rest) >= 2 and rest[0] == "-m":
+        return "module", rest[1], [rest[1], *rest[2:]]
+    if len(rest) >= 2 and rest[0] == "-c":
+        return "code", rest[1], ["-c", *rest[2:]]
+    if rest and not rest[0].startswith("-"):
+        return "path", rest[0], rest
+    return None
+
+
+def child_env() -> dict[str, str]:
+    """Окружение команды без ключей и токенов агента."""
+    env = {k: v for k, v in os.environ.items() if not _SECRET_ENV.search(k)}
+    env["PYTHONUNBUFFERED"] = "1"
+    return env
+
+
+def _limits() -> tuple[int, int]:
+    return settings.RUN_CPU_LIMIT_SECONDS, settings.RUN_MEMORY_LIMIT_MB * 1024 * 1024
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _pump(
+    handlers: dict[int, Callable[[bytes], None]],
+    deadline: float,
+    kill: Callable[[], None],
+) -> bool:
+    """
+    Читает дескрипторы до закрытия всех или до deadline. По истечении
+    времени вызывает kill и дочитывает остаток не дольше KILL_GRACE_SECONDS
+    (потомки, ушедшие из группы процессов, могут держать канал открытым).
+    Возвращает True, если время истекло.
+    """
+    selector = selectors.DefaultSelector()
+    for fd in handlers:
+        selector.register(fd, selectors.EVENT_READ)
+    timed_out = False
+    try:
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if timed_out:
+                    break
+                timed_out = True
+                kill()
+                deadline = time.monotonic() + KILL_GRACE_SECONDS
+                continue
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, READ_CHUNK_BYTES)
+                if data:
+                    handlers[key.fd](data)
+                else:
+                    selector.unregister(key.fd)
+    finally:
+        selector.close()
+    return timed_out
+
+
+class WarmPool:
+    """
+    Клиент сервера теплых процессов (warm_worker.py). Сервер запускается
+    лениво, перезапускается, если завершился, и останавливается при выходе.
+    """
+
+    def __init__(self, preload: list[str], spare: int):
+        self.preload = preload
+        self.spare = spare
+        self._process: subprocess.Popen | None = None
+        self._control: socket.socket | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_running(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            return
+        if self._control is not None:
+            self._control.close()
+        ours, theirs = warm_worker.socketpair()
+        try:
+            self._process = subprocess.Popen(
+                [
+                    sys.executable,
+                    warm_worker.__file__,
+                    str(theirs.fileno()),
+                    str(self.spare),
+                    *self.preload,
+                ],
+                pass_fds=[theirs.fileno()],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        finally:
+            theirs.close()
+        self._control = ours
+
+    def start(self) -> None:
+        """Запускает сервер заранее, чтобы импорт модулей прошел до первой команды."""
+        with self._lock:
+            self._ensure_running()
+
+    def submit(self, job: dict) -> tuple[int, int]:
+        """Передает задание серверу; возвращает дескрипторы чтения вывода и статуса."""
+        out_r, out_w = os.pipe()
+        status_r, status_w = os.pipe()
+        try:
+            with self._lock:
+                self._ensure_running()
+                socket.send_fds(
+                    self._control, [json.dumps(job).encode()], [out_w, status_w]
+                )
+        except BaseException:
+            os.close(out_r)
+            os.close(status_r)
+            raise
+        finally:
+            os.close(out_w)
+            os.close(status_w)
+        return out_r, status_r
+
+    def close(self) -> None:
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.terminate()
+                try:
+                    self._process.wait(timeout=KILL_GRACE_SECONDS)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            if self._control is not None:
+                self._control.close()
+            self._process = self._control = None
+
+
+_pool: WarmPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> WarmPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WarmPool(settings.RUN_WARM_PRELOAD, settings.RUN_WARM_WORKERS)
+            atexit.register(_pool.close)
+        return _pool
+
+
+def warm_up() -> None:
+    """Прогревает пул в фоне сборки агента, если теплые запуски включены."""
+    if WARM_SUPPORTED and settings.RUN_WARM_POOL:
+        try:
+            get_pool().start()
+        except OSError:
+            pass
+
+
+def _run_warm(
+    job: tuple[str, str, list[str]],
+    cwd: str,
+    deadline: float,
+    feed: Callable[[bytes], None],
+) -> tuple[int | None, bool]:
+    mode, target, argv = job
+    cpu_seconds, memory_bytes = _limits()
+    env = child_env()
+    if target == "pytest":
+        # Плагины уже импортированы сервером, и pytest предупреждает, что не может
+        # переписать в них assert; к проекту пользователя это не относится.
+        env["PYTEST_ADDOPTS"] = (
+            env.get("PYTEST_ADDOPTS", "") + " " + PYTEST_WARM_ADDOPTS
+        ).strip()
+    out_r, status_r = get_pool().submit(
+        {
+            "mode": mode,
+            "target": target,
+            "argv": argv,
+            "cwd": cwd,
+            "env": env,
+            "cpu_seconds": cpu_seconds,
+            "memory_bytes": memory_bytes,
+        }
+    )
+    # Первая строка статуса — pid процесса задания, вторая — код выхода.
+    status = bytearray()
+
+    def kill() -> None:
+        pid, newline, _ = status.partition(b"\n")
+        if newline:
+            _kill_group(int(pid))
+
+    try:
+        timed_out = _pump({out_r: feed, status_r: status.extend}, deadline, kill)
+    finally:
+        os.close(out_r)
+        os.close(status_r)
+    lines = status.split()
+    if not lines:
+        raise OSError("сервер теплых процессов не принял задание")
+    return (int(lines[1]) if len(lines) > 1 else None), timed_out
+
+
+def _run_cold(
+    argv: list[str], cwd: str, deadline: float, feed: Callable[[bytes], None]
+) -> tuple[int | None, bool]:
+    if os.name == "posix":
+        cpu_seconds, memory_bytes = _limits()
+        argv = [
+            "/bin/sh",
+            "-c",
+            _LIMITS_WRAPPER,
+            "sh",
+            str(cpu_seconds or "unlimited"),
+            str(memory_bytes // 1024 or "unlimited"),
+            *argv,
+        ]
+    process = subprocess.Popen(
+        argv,
+        cwd=cwd,
+        env=child_env(),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+
+    def kill() -> None:
+        _kill_group(process.pid)
+
+    with process.stdout:
+        timed_out = _pump({process.stdout.fileno(): feed}, deadline, kill)
+    try:
+        exit_code = process.wait(timeout=max(0.0, deadline - time.monotonic()))
+    except subprocess.TimeoutExpired:
+        kill()
+        timed_out = True
+        exit_code = process.wait()
+    return exit_code, timed_out
+
+
+def run(
+    argv: list[str],
+    cwd: str,
+    timeout: float,
+    on_output: Callable[[str], None] | None = None,
+    warm: bool = True,
+) -> CommandResult:
+    """
+    Выполняет команду в cwd с лимитами времени, процессора и памяти.
+    Запуски интерпретатора агента (python, python -m, pytest — см. python_job)
+    идут в теплый процесс с уже импортированными модулями, остальные команды
+    запускаются как есть обычным подпроцессом. on_output получает вывод
+    по мере поступления. Команда не изолирована от остальной файловой
+    системы: cwd задает только рабочую директорию.
+    """
+    capture = OutputCapture(settings.RUN_OUTPUT_MAX_BYTES)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def feed(data: bytes) -> None:
+        capture.feed(data)
+        if on_output is not None:
+            text = decoder.decode(data)
+            if text:
+                on_output(text)
+
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    job = (
+        python_job(argv, cwd)
+        if warm and WARM_SUPPORTED and settings.RUN_WARM_POOL
+        else None
+    )
+    result = None
+    if job is not None:
+        try:
+            result = _run_warm(job, cwd, deadline, feed)
+        except OSError:
+            job = None
+    if result is None:
+        try:
+            result = _run_cold(argv, cwd, deadline, feed)
+        except FileNotFoundError:
+            feed(f"Команда не найдена: {argv[0]}\n".encode())
+            result = 127, False
+    exit_code, timed_out = result
+    return CommandResult(
+        exit_code,
+        capture.text(),
+        time.perf_counter() - started,
+        timed_out,
+        job is not None,
+    )
@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+
+MAX_CACHED_PREFIXES = 1024
+
+
+class Sandbox:
+    """
+    Песочница из одного или нескольких корней рабочей директории.
+
+    Относительные пути разрешаются от основного корня (первого), абсолютные
+    допускаются, только если лежат внутри одного из корней. Проверка
+    вхождения точная (os.path.commonpath), поэтому соседняя директория
+    с тем же префиксом (workspace2 рядом с workspace) не проходит.
+
+    Полный realpath стоит lstat на каждый компонент пути. Здесь разрешенные
+    родительские директории хранятся в LRU-кэше, и для повторных обращений
+    к той же директории проверяется только последний компонент (один lstat).
+    Инструменты, которые удаляют, переименовывают или создают пути,
+    сбрасывают затронутые записи через invalidate.
+    """
+
+    def __init__(self, roots: Iterable[str], max_cached: int = MAX_CACHED_PREFIXES):
+        self.roots = tuple(os.path.realpath(root) for root in roots)
+        if not self.roots:
+            raise ValueError("Нужен хотя бы один корень рабочей директории.")
+        self._roots_ready = False
+        self.max_cached = max_cached
+        # (корень, родитель в виде, как его передали) -> (лексический путь, реальный путь)
+        self._prefixes: OrderedDict[tuple[str, str], tuple[str, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def root(self) -> str:
+        """Основной корень: от него разрешаются относительные пути."""
+        return self.roots[0]
+
+    def root_of(self, real_path: str) -> str | None:
+        """Корень, внутри которого лежит уже разрешенный путь, или None."""
+        for root in self.roots:
+            if real_path == root:
+                return root
+            try:
+                if os.path.commonpath((root, real_path)) == root:
+                    return root
+            except ValueError:
+                # Разные диски в Windows.
+                continue
+        return None
+
+    def _base_for(self, path: str) -> str:
+        if not os.path.isabs(path):
+            return self.root
+        normalized = os.path.normpath(path)
+        return self.root_of(normalized) or self.root
+
+    def _resolve_parent(self, root: str, parent: str) -> str:
+        key = (root, parent)
+        with self._lock:
+            cached = self._prefixes.get(key)
+            if cached is not None:
+                self._prefixes.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        lexical = os.path.normpath(os.path.join(root, parent))
+        real = os.path.realpath(lexical)
+        # Кэшируются только существующие директории: путь, которого еще нет,
+        # может появиться и как ссылка, и как обычная директория.
+        if os.path.isdir(real):
+            with self._lock:
+                self._prefixes[key] = (lexical, real)
+                while len(self._prefixes) > self.max_cached:
+                    self._prefixes.popitem(last=False)
+        return real
+
+    def resolve(self, path: str) -> str:
+        """
+        Разрешает путь в реальный абсолютный путь внутри песочницы.
+        Бросает ValueError, если путь (с учетом символических ссылок) выходит за ее пределы.
+        """
+        if not self._roots_ready:
+            # Корни создаются при первом обращении, а не при импорте модуля инструментов.
+            for root in self.roots:
+                os.makedirs(root, exist_ok=True)
+            self._roots_ready = True
+        root = self._base_for(path)
+        parent, name = os.path.split(path)
+        if name in ("", ".", ".."):
+            real_path = os.path.realpath(os.path.join(root, path))
+        else:
+            real_parent = self._resolve_parent(root, parent)
+            real_path = os.path.join(real_parent, name)
+            if os.path.islink(real_path):
+                real_path = os.path.realpath(real_path)
+        if self.root_of(real_path) is None:
+            raise ValueError(
+                f"Попытка доступа за пределы рабочей директории ('{path}') запрещена."
+            )
+        return real_path
+
+    def invalidate(self, real_path: str) -> None:
+        """Сбрасывает кэш для пути и всего, что под ним (по лексическому и реальному виду)."""
+        prefix = real_path.rstrip(os.sep) + os.sep
+        with self._lock:
+            stale = [
+                key
+                for key, (lexical, real) in self._prefixes.items()
+                if lexical == real_path
+                or real == real_path
+                or lexical.startswith(prefix)
+                or real.startswith(prefix)
+            ]
+            for key in stale:
+                del self._prefixes[key]
+
+    def clear(self) -> None:
+        """Полный сброс кэша (например, после изменений рабочей директории извне)."""
+        with self._lock:
+            self._prefixes.clear()
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "cached": len(self._prefixes),
+            }
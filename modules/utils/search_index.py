@@ -0,0 +1,206 @@
+import fnmatch
+import os
+import re
+import threading
+from collections import defaultdict
+
+from modules.utils import line_index
+from modules.utils.ignore import DEFAULT_EXCLUDED_DIRS
+from modules.utils.read_cache import read_cache
+
+try:
+    # Парсер регулярных выражений — внутренний модуль re; если его нет,
+    # подстроки не извлекаются и поиск просматривает все файлы.
+    from re import _parser as sre_parse
+except ImportError:
+    sre_parse = None
+
+MAX_INDEXED_FILE_SIZE = 1024 * 1024
+
+
+def _trigrams(text: str) -> set[str]:
+    text = text.lower()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def required_literals(pattern: str) -> list[str]:
+    """
+    Достает из регулярного выражения подстроки, которые обязаны встретиться
+    в любом совпадении. Разбираются только элементы верхнего уровня, поэтому
+    для выражений с альтернативами и группами результат может быть пустым.
+    """
+    if sre_parse is None:
+        return []
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    literals, run = [], []
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(value))
+            continue
+        if run:
+            literals.append("".join(run))
+            run = []
+    if run:
+        literals.append("".join(run))
+    return literals
+
+
+def match_glob(rel_path: str, pattern: str | None) -> bool:
+    """Сопоставляет относительный путь с glob-шаблоном по полному пути или имени файла."""
+    if not pattern:
+        return True
+    pattern = pattern.removeprefix("**/")
+    return fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(
+        os.path.basename(rel_path), pattern
+    )
+
+
+class TrigramIndex:
+    """
+    Инвертированный триграммный индекс по текстовым файлам рабочей директории.
+    Строится лениво при первом поиске, после чего обновляется только по
+    конкретным путям: инструменты, изменяющие файлы, вызывают update/remove.
+    Изменения в обход инструментов (RunCommand) отмечаются через expire:
+    следующий запрос сверяет mtime/size и перечитывает только изменившиеся файлы. Текстовые файлы больше
+    MAX_INDEXED_FILE_SIZE не индексируются и попадают в кандидаты всегда.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.RLock()
+        self._files: dict[str, tuple[int, int]] = {}
+        self._file_trigrams: dict[str, frozenset[str]] = {}
+        self._postings: defaultdict[str, set[str]] = defaultdict(set)
+        self._unindexed: set[str] = set()
+        self._built = False
+        self._fresh = False
+
+    def _rel(self, abs_path: str) -> str:
+        return os.path.relpath(abs_path, self.root).replace(os.sep, "/")
+
+    def _excluded(self, abs_path: str) -> bool:
+        """Путь лежит в служебной директории (node_modules, .git и т.п.) или сам ей является."""
+        return bool(DEFAULT_EXCLUDED_DIRS.intersection(self._rel(abs_path).split("/")))
+
+    def _walk(self, top: str | None = None):
+        for dirpath, dirnames, filenames in os.walk(top or self.root):
+            dirnames[:] = [d for d in dirnames if d not in DEFAULT_EXCLUDED_DIRS]
+            for filename in filenames:
+                yield os.path.join(dirpath, filename)
+
+    def _drop(self, rel_path: str) -> None:
+        self._files.pop(rel_path, None)
+        self._unindexed.discard(rel_path)
+        for trigram in self._file_trigrams.pop(rel_path, ()):
+            postings = self._postings.get(trigram)
+            if postings is not None:
+                postings.discard(rel_path)
+                if not postings:
+                    del self._postings[trigram]
+
+    def _add(self, abs_path: str, stat: os.stat_result) -> None:
+        rel_path = self._rel(abs_path)
+        self._drop(rel_path)
+        self._files[rel_path] = (stat.st_mtime_ns, stat.st_size)
+        if line_index.is_binary(abs_path):
+            return
+        if stat.st_size > MAX_INDEXED_FILE_SIZE:
+            self._unindexed.add(rel_path)
+            return
+        # Индексация не заполняет кэш чтения, но пользуется уже прочитанным.
+        cached = read_cache.get(abs_path, populate=False)
+        if cached is not None:
+            text = cached.data.decode("utf-8", errors="replace")
+        else:
+            with open(abs_path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        trigrams = frozenset(_trigrams(text))
+        self._file_trigrams[rel_path] = trigrams
+        for trigram in trigrams:
+            self._postings[trigram].add(rel_path)
+
+    def _ensure_fresh(self) -> None:
+        if self._fresh:
+            return
+        seen = set()
+        for abs_path in self._walk():
+            try:
+                stat = os.stat(abs_path)
+            except OSError:
+                continue
+            rel_path = self._rel(abs_path)
+            seen.add(rel_path)
+            if self._files.get(rel_path) != (stat.st_mtime_ns, stat.st_size):
+                self._add(abs_path, stat)
+        for rel_path in set(self._files) - seen:
+            self._drop(rel_path)
+        self._built = self._fresh = True
+
+    def update(self, abs_path: str) -> None:
+        """Переиндексирует файл или все файлы директории после изменения."""
+        with self._lock:
+            if not self._built:
+                return
+            if os.path.isdir(abs_path):
+                self.remove(abs_path)
+                if not self._excluded(abs_path):
+                    for file_path in self._walk(abs_path):
+                        self._add(file_path, os.stat(file_path))
+            elif os.path.isfile(abs_path):
+                if not self._excluded(abs_path):
+                    self._add(abs_path, os.stat(abs_path))
+            else:
+                self.remove(abs_path)
+
+    def expire(self) -> None:
+        """Сверяет индекс с диском при следующем запросе (файлы менялись в обход инструментов)."""
+        with self._lock:
+            self._fresh = False
+
+    def remove(self, abs_path: str) -> None:
+        """Удаляет из индекса файл или все файлы под директорией."""
+        with self._lock:
+            rel_path = self._rel(abs_path)
+            prefix = rel_path + "/"
+            for indexed in [
+                p for p in self._files if p == rel_path or p.startswith(prefix)
+            ]:
+                self._drop(indexed)
+
+    def files(self) -> list[str]:
+        with self._lock:
+            self._ensure_fresh()
+            return sorted(self._files)
+
+    def candidates(self, literals: list[str]) -> list[str]:
+        """
+        Файлы, содержащие все триграммы обязательных подстрок запроса,
+        и неиндексированные большие файлы, которые нужно просмотреть целиком.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            trigrams = set().union(*(_trigrams(literal) for literal in literals))
+            if not trigrams:
+                return sorted(self._file_trigrams.keys() | self._unindexed)
+            postings = sorted((self._postings.get(t, set()) for t in trigrams), key=len)
+            result = set(postings[0])
+            for posting in postings[1:]:
+                result &= posting
+                if not result:
+                    break
+            return sorted(result | self._unindexed)
+
+
+_indexes: dict[str, TrigramIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: str) -> TrigramIndex:
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = TrigramIndex(root)
+        return index
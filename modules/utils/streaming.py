@@ -0,0 +1,139 @@
+import sys
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from modules.utils.runner import COMMAND_OUTPUT_EVENT
+
+TOOL_ARGS_PREVIEW_CHARS = 120
+
+
+def _chunk_text(chunk: AIMessageChunk) -> str:
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        part.get("text", "")
+        for part in chunk.content
+        if isinstance(part, dict) and part.get("type") == "text"
+    )
+
+
+class ToolEventPrinter(BaseCallbackHandler):
+    """Печатает вызовы инструментов и их длительность в момент выполнения."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._started: dict[UUID, tuple[str, float]] = {}
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        name = serialized.get("name", "?")
+        self._started[run_id] = (name, time.perf_counter())
+        preview = input_str[:TOOL_ARGS_PREVIEW_CHARS]
+        if len(input_str) > TOOL_ARGS_PREVIEW_CHARS:
+            preview += "..."
+        print(f"\n  → {name} {preview}", file=self.stream, flush=True)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        name, started = self._started.pop(run_id, ("?", time.perf_counter()))
+        content = output.content if isinstance(output, ToolMessage) else output
+        print(
+            f"  ← {name}: {time.perf_counter() - started:.2f} с, "
+            f"{len(str(content))} симв.",
+            file=self.stream,
+            flush=True,
+        )
+
+    def on_custom_event(self, name: str, data: Any, **kwargs: Any) -> None:
+        # Вывод RunCommand/RunTests печатается по мере выполнения команды.
+        if name == COMMAND_OUTPUT_EVENT:
+            self.stream.write(data["text"])
+            self.stream.flush()
+
+    def on_tool_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        name, started = self._started.pop(run_id, ("?", time.perf_counter()))
+        print(
+            f"  ✗ {name}: {time.perf_counter() - started:.2f} с, ошибка: {error}",
+            file=self.stream,
+            flush=True,
+        )
+
+
+def stream_turn(agent_executor, messages: list, config: dict, stream=None) -> None:
+    """
+    Выполняет один ход агента, печатая токены ответа по мере генерации
+    и вызовы инструментов по мере выполнения.
+    """
+    stream = stream or sys.stdout
+    config = {
+        **config,
+        "callbacks": [*config.get("callbacks", []), ToolEventPrinter(stream)],
+    }
+    printing = False
+    for mode, payload in agent_executor.stream(
+        {"messages": messages}, config, stream_mode=["messages", "updates"]
+    ):
+        if mode == "messages":
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") != "agent" or not isinstance(
+                chunk, AIMessageChunk
+            ):
+                continue
+            text = _chunk_text(chunk)
+            if text:
+                if not printing:
+                    print("\nАгент: ", end="", file=stream)
+                    printing = True
+                print(text, end="", file=stream, flush=True)
+        elif mode == "updates" and "agent" in (payload or {}):
+            # Шаг модели завершен: закрываем строку с потоковым текстом.
+            if printing:
+                print(file=stream, flush=True)
+                printing = False
+    if printing:
+        print(file=stream, flush=True)
+
+
+def _cancelled_tool_calls(state) -> list[ToolMessage]:
+    messages = state.values.get("messages", [])
+    if not messages or not isinstance(messages[-1], AIMessage):
+        return []
+    return [
+        ToolMessage(
+            content="Вызов отменен пользователем.",
+            tool_call_id=tool_call["id"],
+            name=tool_call["name"],
+        )
+        for tool_call in messages[-1].tool_calls
+    ]
+
+
+def close_dangling_tool_calls(agent_executor, config: dict) -> None:
+    """
+    После прерывания хода в состоянии может остаться AIMessage с вызовами
+    инструментов без результатов. Модель не примет такую историю, поэтому
+    для каждого такого вызова добавляется ToolMessage об отмене.
+    """
+    cancelled = _cancelled_tool_calls(agent_executor.get_state(config))
+    if cancelled:
+        agent_executor.update_state(config, {"messages": cancelled}, as_node="tools")
+
+
+async def aclose_dangling_tool_calls(agent_executor, config: dict) -> None:
+    """Асинхронный вариант close_dangling_tool_calls (для сервера)."""
+    cancelled = _cancelled_tool_calls(await agent_executor.aget_state(config))
+    if cancelled:
+        await agent_executor.aupdate_state(
+            config, {"messages": cancelled}, as_node="tools"
+        )
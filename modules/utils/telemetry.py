@@ -0,0 +1,230 @@
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import ToolMessage
+from langchain_core.outputs import LLMResult
+
+CONTEXT_TRIMMED_EVENT = "context_trimmed"
+
+
+def _now_ns() -> int:
+    return time.time_ns()
+
+
+class TelemetryHandler(BaseCallbackHandler):
+    """
+    Собирает телеметрию хода агента: задержку и токены каждого вызова модели,
+    время до первого токена, длительность и размер вывода каждого инструмента,
+    число сообщений, свернутых менеджером контекста. Записи пишутся в JSONL
+    в виде спанов в стиле OpenTelemetry: один корневой спан на ход и дочерние
+    спаны для вызовов модели и инструментов.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open: dict[UUID, dict[str, Any]] = {}
+        self._turn: dict[str, Any] | None = None
+        self._spans: list[dict[str, Any]] = []
+
+    # --- ход целиком ---
+
+    def start_turn(self, thread_id: str) -> None:
+        with self._lock:
+            self._spans = []
+            self._turn = {
+                "trace_id": uuid.uuid4().hex,
+                "span_id": uuid.uuid4().hex[:16],
+                "name": "agent.turn",
+                "kind": "turn",
+                "start_time_unix_nano": _now_ns(),
+                "attributes": {
+                    "thread_id": thread_id,
+                    "llm.calls": 0,
+                    "llm.prompt_tokens": 0,
+                    "llm.completion_tokens": 0,
+                    "tool.calls": 0,
+                    "context.trimmed_messages": 0,
+                },
+            }
+
+    def end_turn(self, status: str = "ok") -> dict[str, Any] | None:
+        with self._lock:
+            turn, self._turn = self._turn, None
+            if turn is None:
+                return None
+            turn["end_time_unix_nano"] = _now_ns()
+            turn["status"] = status
+            spans = [turn, *self._spans]
+            self._spans = []
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(span, ensure_ascii=False) + "\n" for span in spans)
+        return turn
+
+    def _start_span(self, run_id: UUID, name: str, kind: str, **attributes) -> None:
+        with self._lock:
+            if self._turn is None:
+                return
+            self._open[run_id] = {
+                "trace_id": self._turn["trace_id"],
+                "span_id": uuid.uuid4().hex[:16],
+                "parent_span_id": self._turn["span_id"],
+                "name": name,
+                "kind": kind,
+                "start_time_unix_nano": _now_ns(),
+                "attributes": attributes,
+            }
+
+    def _end_span(self, run_id: UUID, status: str = "ok", **attributes) -> None:
+        with self._lock:
+            span = self._open.pop(run_id, None)
+            if span is None or self._turn is None:
+                return
+            span["end_time_unix_nano"] = _now_ns()
+            span["status"] = status
+            span["attributes"].update(attributes)
+            span["attributes"]["duration_ms"] = (
+                span["end_time_unix_nano"] - span["start_time_unix_nano"]
+            ) / 1e6
+            self._spans.append(span)
+            totals = self._turn["attributes"]
+            if span["kind"] == "llm":
+                totals["llm.calls"] += 1
+                totals["llm.prompt_tokens"] += attributes.get("prompt_tokens", 0)
+                totals["llm.completion_tokens"] += attributes.get(
+                    "completion_tokens", 0
+                )
+            elif span["kind"] == "tool":
+                totals["tool.calls"] += 1
+
+    # --- модель ---
+
+    def on_chat_model_start(
+        self, serialized: dict[str, Any], messages: list, *, run_id: UUID, **kwargs
+    ) -> None:
+        model = (kwargs.get("invocation_params") or {}).get("model", "")
+        self._start_span(
+            run_id,
+            "llm.call",
+            "llm",
+            model=model,
+            input_messages=sum(len(batch) for batch in messages),
+        )
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs) -> None:
+        with self._lock:
+            span = self._open.get(run_id)
+            if span is not None and "ttft_ms" not in span["attributes"]:
+                span["attributes"]["ttft_ms"] = (
+                    _now_ns() - span["start_time_unix_nano"]
+                ) / 1e6
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs) -> None:
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+        self._end_span(
+            run_id,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end_span(run_id, status="error", error=str(error))
+
+    # --- инструменты ---
+
+    def on_tool_start(
+        self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, **kwargs
+    ) -> None:
+        self._start_span(
+            run_id,
+            f"tool.{serialized.get('name', '?')}",
+            "tool",
+            tool=serialized.get("name", "?"),
+            input_chars=len(input_str),
+        )
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs) -> None:
+        content = output.content if isinstance(output, ToolMessage) else output
+        self._end_span(run_id, output_chars=len(str(content)))
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end_span(run_id, status="error", error=str(error))
+
+    # --- события менеджера контекста ---
+
+    def on_custom_event(self, name: str, data: Any, **kwargs) -> None:
+        if name != CONTEXT_TRIMMED_EVENT:
+            return
+        with self._lock:
+            if self._turn is not None:
+                self._turn["attributes"]["context.trimmed_messages"] += data.get(
+                    "trimmed", 0
+                )
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Процентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def read_spans(path: str) -> Iterable[dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except FileNotFoundError:
+        return
+
+
+def format_stats(spans: Iterable[dict[str, Any]]) -> str:
+    """Сводка p50/p95 по ходам, вызовам модели и инструментам."""
+    series: defaultdict[str, list[float]] = defaultdict(list)
+    for span in spans:
+        attributes = span.get("attributes", {})
+        duration_ms = (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e6
+        if span["kind"] == "turn":
+            series["Ход, мс"].append(duration_ms)
+            series["Токенов в промпте за ход"].append(attributes["llm.prompt_tokens"])
+            series["Свернуто сообщений за ход"].append(
+                attributes["context.trimmed_messages"]
+            )
+        elif span["kind"] == "llm":
+            series["Вызов модели, мс"].append(duration_ms)
+            if "ttft_ms" in attributes:
+                series["Время до первого токена, мс"].append(attributes["ttft_ms"])
+        elif span["kind"] == "tool":
+            series[f"{attributes['tool']}, мс"].append(duration_ms)
+            series[f"{attributes['tool']}, символов вывода"].append(
+                attributes.get("output_chars", 0)
+            )
+    if not series:
+        return "Телеметрия пока пуста."
+    width = max(len(name) for name in series)
+    lines = [f"{'Метрика':<{width}}  {'n':>5}  {'p50':>10}  {'p95':>10}"]
+    for name, values in series.items():
+        lines.append(
+            f"{name:<{width}}  {len(values):>5}  "
+            f"{percentile(values, 50):>10.1f}  {percentile(values, 95):>10.1f}"
+        )
+    return "\n".join(lines)
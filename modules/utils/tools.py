@@ -1,42 +1,387 @@
+import functools
+import hashlib
+import inspect
+import io
+import itertools
+import mimetypes
 import os
+import re
+import shlex
 import shutil
+import signal
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
+from contextvars import ContextVar
+from typing import TextIO
 
+from modules.schemas import tools_schemas
 from modules.settings.agent_config import settings
+from modules.utils import ignore, line_index, outline_index, runner, search_index
+from modules.utils.compaction import CHARS_PER_TOKEN
+from modules.utils.journal import JournalStep, journal_for
+from modules.utils.read_cache import read_cache
+from modules.utils.registry import register_tool, snake_to_pascal
+from modules.utils.sandbox import Sandbox
 
-REAL_WORKSPACE_PATH = os.path.realpath(settings.WORKSPACE_DIR)
-os.makedirs(REAL_WORKSPACE_PATH, exist_ok=True)
+sandbox = Sandbox([settings.WORKSPACE_DIR, *settings.EXTRA_WORKSPACE_DIRS])
+
+# Песочница сессии сервера; в консольном режиме не задана, и действует общая sandbox.
+session_sandbox: ContextVar[Sandbox | None] = ContextVar(
+    "session_sandbox", default=None
+)
+
+
+def current_sandbox() -> Sandbox:
+    return session_sandbox.get() or sandbox
 
 
 def _get_safe_path(path: str) -> str:
     """
-    "Страж": преобразует относительный путь в безопасный абсолютный путь внутри settings.WORKSPACE_DIR.
+    "Страж": преобразует путь в безопасный абсолютный путь внутри песочницы
+    (settings.WORKSPACE_DIR и дополнительных корней).
     Предотвращает выход за пределы песочницы (атаки типа Path Traversal).
     """
-    absolute_path = os.path.join(REAL_WORKSPACE_PATH, path)
+    return current_sandbox().resolve(path)
+
+
+def _index_for(safe_path: str) -> search_index.TrigramIndex:
+    box = current_sandbox()
+    return search_index.get_index(box.root_of(safe_path) or box.root)
+
+
+def _outline_for(safe_path: str) -> outline_index.OutlineIndex:
+    box = current_sandbox()
+    return outline_index.get_index(box.root_of(safe_path) or box.root)
+
+
+def _on_path_changed(
+    safe_path: str, data: bytes | None = None, cache_updated: bool = False
+) -> None:
+    """
+    Обновляет производные индексы после создания или изменения пути.
+    data — записанное содержимое файла: оно сразу кладется в кэш чтения.
+    """
+    current_sandbox().invalidate(safe_path)
+    if data is not None:
+        read_cache.put(safe_path, data)
+    elif not cache_updated:
+        read_cache.invalidate(safe_path)
+    _index_for(safe_path).update(safe_path)
+    _outline_for(safe_path).update(safe_path)
+
+
+def _on_path_removed(safe_path: str) -> None:
+    """Убирает удаленный путь (и все, что под ним) из производных индексов."""
+    current_sandbox().invalidate(safe_path)
+    read_cache.invalidate(safe_path)
+    _index_for(safe_path).remove(safe_path)
+    _outline_for(safe_path).remove(safe_path)
+
+
+WRITE_CHUNK_CHARS = 256 * 1024
+
+# umask процесса: временные файлы создаются с правами 0600, новым файлам
+# выставляются обычные права, как при open(..., "w").
+_UMASK = os.umask(0)
+os.umask(_UMASK)
 
-    real_path = os.path.realpath(absolute_path)
 
-    if not real_path.startswith(REAL_WORKSPACE_PATH):
-        raise ValueError(
-            f"Попытка доступа за пределы рабочей директории ('{settings.WORKSPACE_DIR}') запрещена."
+# Шаг журнала отмены для текущего вызова изменяющего инструмента.
+_journal_step: ContextVar[JournalStep | None] = ContextVar("journal_step", default=None)
+
+
+def journaled(func: Callable[..., str]) -> Callable[..., str]:
+    """
+    Делает вызов изменяющего инструмента одним шагом журнала отмены (Undo).
+    Сам инструмент перед изменением пути вызывает _journal_record и похожие.
+    """
+    name = snake_to_pascal(func.__name__)
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not settings.JOURNAL_ENABLED or _journal_step.get() is not None:
+            return func(*args, **kwargs)
+        arguments = signature.bind(*args, **kwargs).arguments
+        paths = [str(value) for key, value in arguments.items() if key.endswith("path")]
+        for entry in arguments.get("files") or []:
+            entry_path = (
+                entry.get("path")
+                if isinstance(entry, dict)
+                else getattr(entry, "path", None)
+            )
+            if entry_path is not None:
+                paths.append(entry_path)
+        step = journal_for(current_sandbox().root).begin(
+            name, ", ".join(f"'{path}'" for path in paths)
         )
+        token = _journal_step.set(step)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _journal_step.reset(token)
+            step.commit()
+
+    return wrapper
+
+
+def _journal_record(safe_path: str) -> None:
+    step = _journal_step.get()
+    if step is not None:
+        step.record(safe_path)
+
+
+def _encode_chunks(content: str) -> Iterator[bytes]:
+    """Кодирует строку кусками, чтобы не держать в памяти вторую полную копию в байтах."""
+    for start in range(0, len(content), WRITE_CHUNK_CHARS):
+        yield content[start : start + WRITE_CHUNK_CHARS].encode("utf-8")
+
+
+def _content_chunks(content: str, data: bytes | None) -> Iterable[bytes]:
+    return [data] if data is not None else _encode_chunks(content)
+
+
+def _same_content(safe_path: str, content: str, data: bytes | None) -> bool:
+    """
+    Совпадает ли файл с новым содержимым: сначала по размеру, затем по sha1
+    (для файла из кэша чтения хэш уже известен). Совпадающий файл не переписывается.
+    """
+    try:
+        stat = os.stat(safe_path)
+    except FileNotFoundError:
+        return False
+    if not os.path.isfile(safe_path):
+        return False
+    if content.isascii() and len(content) != stat.st_size:
+        return False
+    digest, size = hashlib.sha1(), 0
+    for chunk in _content_chunks(content, data):
+        digest.update(chunk)
+        size += len(chunk)
+    if size != stat.st_size:
+        return False
+    cached = read_cache.peek(safe_path)
+    if cached is not None and cached.digest:
+        return cached.digest == digest.hexdigest()
+    with open(safe_path, "rb") as f:
+        return hashlib.file_digest(f, "sha1").hexdigest() == digest.hexdigest()
+
+
+def _fsync_dir(dir_path: str) -> None:
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except OSError:
+        # Windows не открывает директории на чтение; там fsync директории не нужен.
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _stage(safe_path: str, chunks: Iterable[bytes]) -> str:
+    """
+    Пишет chunks во временный файл в директории safe_path и возвращает его путь.
+    Права берутся у существующего файла, для нового — по umask. При
+    settings.WRITE_FSYNC = file/dir данные сбрасываются на диск до подмены.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(safe_path), prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            if settings.WRITE_FSYNC != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            shutil.copymode(safe_path, tmp_path)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o666 & ~_UMASK)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+    return tmp_path
 
-    return real_path
 
+def _commit(tmp_path: str, safe_path: str) -> None:
+    """Атомарно ставит временный файл на место целевого (и сбрасывает директорию при WRITE_FSYNC = dir)."""
+    os.replace(tmp_path, safe_path)
+    if settings.WRITE_FSYNC == "dir":
+        _fsync_dir(os.path.dirname(safe_path))
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
+
+def _atomic_write(safe_path: str, chunks: Iterable[bytes]) -> None:
+    """
+    Записывает файл целиком через временный файл и os.replace: при сбое
+    посреди записи на месте остается прежняя версия, а не обрезанный файл.
+    """
+    tmp_path = _stage(safe_path, chunks)
+    try:
+        _commit(tmp_path, safe_path)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+
+def _detect_newline(safe_path: str) -> str:
+    with open(safe_path, "r", encoding="utf-8", newline="") as f:
+        first_line = f.readline()
+    for ending in ("\r\n", "\r"):
+        if first_line.endswith(ending):
+            return ending
+    return "\n"
+
+
+def _atomic_rewrite(
+    safe_path: str, transform: Callable[[TextIO], Iterator[str]]
+) -> None:
+    """
+    Переписывает файл за один потоковый проход: transform получает исходный файл
+    и отдает куски нового содержимого, которые пишутся во временный файл в той же
+    директории. Затем временный файл атомарно подменяет исходный через os.replace.
+    При любой ошибке исходный файл остается нетронутым.
+
+    transform работает с переводами строк '\n'; при записи они возвращаются
+    к стилю файла (CRLF остается CRLF), который определяется по первой строке.
+    """
+    _journal_record(safe_path)
+    newline = _detect_newline(safe_path)
+    with open(safe_path, "r", encoding="utf-8") as src:
+        chunks = transform(src)
+        if newline != "\n":
+            chunks = (chunk.replace("\n", newline) for chunk in chunks)
+        tmp_path = _stage(safe_path, (chunk.encode("utf-8") for chunk in chunks))
+    try:
+        _commit(tmp_path, safe_path)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+    _on_path_changed(safe_path)
+
+
+@register_tool(tools_schemas.WriteFileSpec)
+@journaled
 def write_file(path: str, content: str) -> str:
     """Создает или полностью перезаписывает файл по пути path."""
 
     try:
         safe_path = _get_safe_path(path)
+        # Небольшое содержимое кодируется один раз и сразу попадает в кэш чтения.
+        data = (
+            content.encode("utf-8")
+            if len(content) <= read_cache.max_file_bytes
+            else None
+        )
+        if _same_content(safe_path, content, data):
+            return f"Файл '{path}' не изменен: содержимое совпадает с текущим."
+        _journal_record(safe_path)
         os.makedirs(os.path.dirname(safe_path), exist_ok=True)
-        with open(safe_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        _atomic_write(safe_path, _content_chunks(content, data))
+        _on_path_changed(safe_path, data)
         return f"Файл '{path}' успешно создан/перезаписан."
     except Exception as e:
         return f"Ошибка при записи файла: {e}"
 
 
+def _field(entry, name: str) -> str:
+    return entry[name] if isinstance(entry, dict) else getattr(entry, name)
+
+
+def _make_parents(dir_path: str) -> list[str]:
+    """Создает недостающие родительские директории и возвращает созданные (сверху вниз)."""
+    missing = []
+    while not os.path.isdir(dir_path):
+        missing.append(dir_path)
+        dir_path = os.path.dirname(dir_path)
+    for path in reversed(missing):
+        os.mkdir(path)
+    return list(reversed(missing))
+
+
+@register_tool(tools_schemas.WriteFilesSpec)
+@journaled
+def write_files(files: list) -> str:
+    """
+    Создает или перезаписывает несколько файлов за один вызов (files — список
+    объектов с полями path и content). Запись транзакционная: если хотя бы один
+    файл записать не удалось, все файлы и созданные директории возвращаются
+    в исходное состояние.
+    """
+    if not files:
+        return "Ошибка: Список файлов пуст."
+    created_dirs: list[str] = []
+    staged: list[tuple[str, str, str]] = []
+    committed: list[tuple[str, str | None, str]] = []
+    unchanged = 0
+    try:
+        targets = [(_field(entry, "path"), _field(entry, "content")) for entry in files]
+        safe_paths = [_get_safe_path(path) for path, _ in targets]
+        if len(set(safe_paths)) != len(safe_paths):
+            return "Ошибка: Один и тот же файл указан несколько раз."
+        for path, safe_path in zip((path for path, _ in targets), safe_paths):
+            if os.path.isdir(safe_path):
+                return f"Ошибка: '{path}' - это директория."
+
+        # Фаза 1: измененное содержимое пишется во временные файлы рядом с целевыми.
+        for (_, content), safe_path in zip(targets, safe_paths):
+            if _same_content(safe_path, content, None):
+                unchanged += 1
+                continue
+            _journal_record(safe_path)
+            created_dirs.extend(_make_parents(os.path.dirname(safe_path)))
+            staged.append(
+                (safe_path, _stage(safe_path, _encode_chunks(content)), content)
+            )
+
+        # Фаза 2: подмена; старые версии откладываются до успешного завершения.
+        for safe_path, tmp_path, content in staged:
+            backup_path = None
+            if os.path.exists(safe_path):
+                backup_path = tmp_path + ".bak"
+                os.replace(safe_path, backup_path)
+            committed.append((safe_path, backup_path, content))
+            _commit(tmp_path, safe_path)
+    except Exception as e:  # noqa: BLE001
+        for safe_path, backup_path, _ in reversed(committed):
+            if backup_path is not None:
+                os.replace(backup_path, safe_path)
+            elif os.path.exists(safe_path):
+                os.remove(safe_path)
+        for _, tmp_path, _ in staged:
+            _remove_quietly(tmp_path)
+        for dir_path in reversed(created_dirs):
+            if os.path.isdir(dir_path) and not os.listdir(dir_path):
+                os.rmdir(dir_path)
+        return f"Ошибка при записи файлов, изменения отменены: {e}"
+
+    for safe_path, backup_path, content in committed:
+        if backup_path is not None:
+            os.remove(backup_path)
+        _on_path_changed(
+            safe_path,
+            content.encode("utf-8")
+            if len(content) <= read_cache.max_file_bytes
+            else None,
+        )
+    result = f"Записано файлов: {len(committed)}: " + ", ".join(
+        f"'{path}'" for path, _ in targets
+    )
+    if unchanged:
+        result += f" (без изменений: {unchanged})"
+    return result
+
+
+@register_tool(tools_schemas.CreateDirectorySpec)
+@journaled
 def create_directory(path: str) -> str:
     """
     Создает новую директорию (папку) по указанному пути path.
@@ -46,12 +391,16 @@ def create_directory(path: str) -> str:
         safe_path = _get_safe_path(path)
         if os.path.exists(safe_path):
             return f"Информация: Директория '{path}' уже существует."
+        _journal_record(safe_path)
         os.makedirs(safe_path)
+        _on_path_changed(safe_path)
         return f"Директория '{path}' успешно создана."
     except Exception as e:
         return f"Ошибка при создании директории: {e}"
 
 
+@register_tool(tools_schemas.AppendToFileSpec)
+@journaled
 def append_to_file(path: str, content: str) -> str:
     """
     Добавляет содержимое в КОНЕЦ существующего файла по пути path.
@@ -59,22 +408,40 @@ def append_to_file(path: str, content: str) -> str:
     """
     try:
         safe_path = _get_safe_path(path)
-        if not os.path.exists(safe_path):
-            return f"Ошибка: Файл '{path}' не найден."
-        with open(safe_path, "a", encoding="utf-8") as f:
-            f.write(content)
+        previous = read_cache.peek(safe_path)
+        step = _journal_step.get()
+        if step is not None:
+            step.record_size(safe_path)
+        # Без O_CREAT: существование проверяется самим открытием, без гонки с exists().
+        fd = os.open(safe_path, os.O_WRONLY | os.O_APPEND)
+        with os.fdopen(fd, "wb") as f:
+            for chunk in _encode_chunks(content):
+                f.write(chunk)
+            if settings.WRITE_FSYNC != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        _on_path_changed(
+            safe_path,
+            previous.data + content.encode("utf-8") if previous is not None else None,
+        )
         return f"Файл '{path}' успешно отредактирован."
+    except FileNotFoundError:
+        return f"Ошибка: Файл '{path}' не найден."
     except Exception as e:
         return f"Ошибка при редактировании файла: {e}"
 
 
+@register_tool(tools_schemas.DeletePathSpec)
+@journaled
 def delete_file(path: str) -> str:
     """Удаляет один файл по пути path."""
     try:
         safe_path = _get_safe_path(path)
         if os.path.isdir(safe_path):
             return f"Ошибка: '{path}' - это директория. Используйте DeleteDirectory."
+        _journal_record(safe_path)
         os.remove(safe_path)
+        _on_path_removed(safe_path)
         return f"Файл '{path}' успешно удален."
     except FileNotFoundError:
         return f"Ошибка: Файл '{path}' не найден."
@@ -82,13 +449,17 @@ def delete_file(path: str) -> str:
         return f"Ошибка при удалении файла: {e}"
 
 
+@register_tool(tools_schemas.DeletePathSpec)
+@journaled
 def delete_directory(path: str) -> str:
     """Удаляет директорию по пути path и все ее содержимое."""
     try:
         safe_path = _get_safe_path(path)
         if not os.path.isdir(safe_path):
             return f"Ошибка: '{path}' - это файл. Используйте DeleteFile."
+        _journal_record(safe_path)
         shutil.rmtree(safe_path)
+        _on_path_removed(safe_path)
         return f"Директория '{path}' и ее содержимое удалены."
     except FileNotFoundError:
         return f"Ошибка: Директория '{path}' не найдена."
@@ -96,19 +467,118 @@ def delete_directory(path: str) -> str:
         return f"Ошибка при удалении директории: {e}"
 
 
-def read_file(path: str) -> str:
-    """Читает содержимое файла по пути path."""
+def _describe_binary(path: str, safe_path: str) -> str:
+    size = os.path.getsize(safe_path)
+    mime_type, _ = mimetypes.guess_type(safe_path)
+    with open(safe_path, "rb") as f:
+        head = f.read(16)
+    return (
+        f"Файл '{path}' бинарный и не может быть показан как текст.\n"
+        f"Размер: {size} байт. Тип: {mime_type or 'неизвестен'}. "
+        f"Первые байты: {head.hex(' ')}"
+    )
+
+
+@register_tool(tools_schemas.ReadFileSpec, read_only=True)
+def read_file(
+    path: str,
+    offset: int = 1,
+    limit: int | None = None,
+    max_bytes: int | None = None,
+    line_numbers: bool = False,
+) -> str:
+    """
+    Читает содержимое файла по пути path.
+    Для больших файлов возвращает окно: limit строк начиная со строки offset (с 1),
+    не больше max_bytes байт. Если показан не весь файл, в конце добавляется пометка
+    с номером строки, с которой нужно продолжить чтение.
+    """
     try:
         safe_path = _get_safe_path(path)
-        with open(safe_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        return f"Содержимое файла '{path}':\n\n{content}"
+        # Небольшие файлы берутся из кэша чтения, большие читаются окном с диска.
+        cached = read_cache.get(safe_path)
+        if (
+            line_index.looks_binary(cached.data)
+            if cached is not None
+            else line_index.is_binary(safe_path)
+        ):
+            return _describe_binary(path, safe_path)
+
+        limit = limit or settings.READ_FILE_MAX_LINES
+        max_bytes = max_bytes or settings.READ_FILE_MAX_BYTES
+        index = (
+            line_index.get_line_index(safe_path, cached.data, cached.mtime_ns)
+            if cached is not None
+            else line_index.get_line_index(safe_path)
+        )
+        total = index.line_count
+        if total == 0:
+            return f"Файл '{path}' пуст."
+        if offset < 1 or offset > total:
+            return f"Ошибка: В файле '{path}' {total} строк, строки {offset} нет."
+
+        last_line = min(total, offset + limit - 1)
+        start, end = index.byte_range(offset, last_line)
+        if cached is not None:
+            data = cached.data[start : start + min(end - start, max_bytes)]
+        else:
+            with open(safe_path, "rb") as f:
+                f.seek(start)
+                data = f.read(min(end - start, max_bytes))
+
+        line_cut = False
+        if end - start > max_bytes:
+            # Обрезаем по последней целой строке; одну огромную строку режем по лимиту.
+            cut = data.rfind(b"\n")
+            if cut != -1:
+                data = data[: cut + 1]
+                last_line = offset + data.count(b"\n") - 1
+            else:
+                last_line = offset
+                line_cut = True
+        content = data.decode("utf-8", errors="replace")
+
+        if line_numbers:
+            content = "".join(
+                f"{number:>6}\t{line}"
+                for number, line in enumerate(
+                    content.splitlines(keepends=True), start=offset
+                )
+            )
+
+        if offset == 1 and last_line == total and not line_cut:
+            return f"Содержимое файла '{path}':\n\n{content}"
+
+        header = f"Содержимое файла '{path}' (строки {offset}-{last_line} из {total}):"
+        marker = ""
+        if line_cut:
+            marker = f"\n[... строка {offset} обрезана до {max_bytes} байт.]"
+        if last_line < total:
+            marker += (
+                f"\n[... вывод обрезан: показаны строки {offset}-{last_line} из {total}. "
+                f"Чтобы продолжить, вызовите ReadFile с offset={last_line + 1}.]"
+            )
+        return f"{header}\n\n{content}{marker}"
     except FileNotFoundError:
         return f"Ошибка: Файл '{path}' не найден."
     except Exception as e:
         return f"Ошибка при чтении файла: {e}"
 
 
+@register_tool(tools_schemas.ReadFilesSpec, read_only=True)
+def read_files(paths: list[str], max_bytes_per_file: int | None = None) -> str:
+    """
+    Читает несколько файлов за один вызов. Для каждого файла действуют те же
+    правила, что и в ReadFile; max_bytes_per_file ограничивает размер каждого файла.
+    """
+    if not paths:
+        return "Ошибка: Список файлов пуст."
+    return "\n\n".join(
+        read_file(path, max_bytes=max_bytes_per_file) for path in dict.fromkeys(paths)
+    )
+
+
+@register_tool(tools_schemas.ListDirectorySpec, read_only=True)
 def list_directory(path: str = ".") -> str:
     """
     Показывает содержимое директории по пути path.
@@ -118,41 +588,131 @@ def list_directory(path: str = ".") -> str:
         safe_path = _get_safe_path(path)
         if not os.path.isdir(safe_path):
             return f"Ошибка: '{path}' не является директорией."
-        entries = os.listdir(safe_path)
+        with os.scandir(safe_path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
         if not entries:
             return f"Директория '{path}' пуста."
         output = f"Содержимое директории '{path}':\n" + "\n".join(
-            f"- {'[D]' if os.path.isdir(os.path.join(safe_path, entry)) else '[F]'} {entry}"
-            for entry in entries
+            f"- {'[D]' if entry.is_dir() else '[F]'} {entry.name}" for entry in entries
         )
         return output
     except Exception as e:
         return f"Ошибка при просмотре директории: {e}"
 
 
-def list_directory_tree(path: str = ".", prefix: str = "") -> str:
+TREE_COLLAPSE_THRESHOLD = 200
+
+
+def _format_count(count: int, forms: tuple[str, str, str]) -> str:
+    """Число с разделителем разрядов и согласованным словом: (1 файл, 2 файла, 5 файлов)."""
+    if count % 10 == 1 and count % 100 != 11:
+        word = forms[0]
+    elif 2 <= count % 10 <= 4 and not 12 <= count % 100 <= 14:
+        word = forms[1]
+    else:
+        word = forms[2]
+    return f"{count:,} {word}".replace(",", " ")
+
+
+def _scan_sorted(dir_path: str) -> list[os.DirEntry]:
+    with os.scandir(dir_path) as it:
+        return sorted(it, key=lambda entry: entry.name)
+
+
+def _summarize_entries(entries: list[os.DirEntry]) -> str:
+    dirs = sum(1 for entry in entries if entry.is_dir(follow_symlinks=False))
+    files = len(entries) - dirs
+    parts = [_format_count(files, ("файл", "файла", "файлов"))]
+    if dirs:
+        parts.insert(0, _format_count(dirs, ("папка", "папки", "папок")))
+    return f"({', '.join(parts)})"
+
+
+@register_tool(tools_schemas.ListDirectoryTreeSpec, read_only=True)
+def list_directory_tree(
+    path: str = ".",
+    max_depth: int | None = None,
+    max_entries: int | None = None,
+    exclude: list[str] | None = None,
+) -> str:
     """
     Показывает дерево директорий и файлов по пути path.
+    Служебные директории (.git, node_modules, .venv и т.п.) и пути из .gitignore
+    пропускаются; директории глубже max_depth и слишком большие директории
+    показываются одной строкой со сводкой.
     """
     try:
-        safe_path = _get_safe_path(path)  # ваша функция для безопасного пути
+        safe_path = _get_safe_path(path)
         if not os.path.isdir(safe_path):
             return f"Ошибка: '{path}' не является директорией."
 
-        entries = sorted(os.listdir(safe_path))
-        if not entries:
-            return f"{prefix}[Пусто] {path}"
-
-        lines = [f"{prefix}{os.path.basename(safe_path) or path}/"]
-        for index, entry in enumerate(entries):
-            full_path = os.path.join(safe_path, entry)
-            connector = "└── " if index == len(entries) - 1 else "├── "
-            if os.path.isdir(full_path):
-                lines.append(f"{prefix}{connector}{entry}/")
-                extension = "    " if index == len(entries) - 1 else "│   "
-                lines.append(list_directory_tree(full_path, prefix + extension))
+        max_depth = max_depth or settings.LIST_TREE_MAX_DEPTH
+        max_entries = max_entries or settings.LIST_TREE_MAX_ENTRIES
+        matcher = ignore.IgnoreMatcher(ignore.parse_gitignore("\n".join(exclude or [])))
+        root = current_sandbox().root_of(safe_path)
+        rel_root = os.path.relpath(safe_path, root).replace(os.sep, "/")
+        # Правила из .gitignore в корне рабочей директории действуют и на поддеревья.
+        if rel_root != ".":
+            matcher.load(root, "")
+
+        def visible(dir_path: str, rel_dir: str) -> list[tuple[os.DirEntry, str]]:
+            matcher.load(dir_path, rel_dir)
+            result = []
+            for entry in _scan_sorted(dir_path):
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if not matcher.is_ignored(
+                    rel_path, entry.is_dir(follow_symlinks=False)
+                ):
+                    result.append((entry, rel_path))
+            return result
+
+        root_entries = visible(safe_path, "" if rel_root == "." else rel_root)
+        if not root_entries:
+            return f"[Пусто] {path}"
+
+        lines = [f"{os.path.basename(safe_path) or path}/"]
+        shown = 0
+        # Стек итераторов по уровням вместо рекурсии: (итератор, размер, отступ, глубина).
+        stack = [(iter(enumerate(root_entries)), len(root_entries), "", 1)]
+        while stack:
+            entries, count, prefix, depth = stack[-1]
+            item = next(entries, None)
+            if item is None:
+                stack.pop()
+                continue
+            if shown >= max_entries:
+                lines.append(
+                    f"[... вывод обрезан: показано {max_entries} элементов. "
+                    "Уточните path или уменьшите max_depth.]"
+                )
+                break
+            shown += 1
+
+            index, (entry, rel_path) = item
+            is_last = index == count - 1
+            connector = "└── " if is_last else "├── "
+            if entry.is_symlink():
+                lines.append(f"{prefix}{connector}{entry.name}@")
+            elif entry.is_dir(follow_symlinks=False):
+                children = visible(entry.path, rel_path)
+                if not children:
+                    lines.append(f"{prefix}{connector}{entry.name}/")
+                elif depth >= max_depth or len(children) > TREE_COLLAPSE_THRESHOLD:
+                    summary = _summarize_entries([child for child, _ in children])
+                    lines.append(f"{prefix}{connector}{entry.name}/ {summary}")
+                else:
+                    lines.append(f"{prefix}{connector}{entry.name}/")
+                    extension = "    " if is_last else "│   "
+                    stack.append(
+                        (
+                            iter(enumerate(children)),
+                            len(children),
+                            prefix + extension,
+                            depth + 1,
+                        )
+                    )
             else:
-                lines.append(f"{prefix}{connector}{entry}")
+                lines.append(f"{prefix}{connector}{entry.name}")
 
         return "\n".join(lines)
 
@@ -160,6 +720,184 @@ def list_directory_tree(path: str = ".", prefix: str = "") -> str:
         return f"Ошибка при просмотре директории: {e}"
 
 
+def _format_symbols(symbols, with_end: bool = False) -> list[str]:
+    lines = []
+    for symbol in symbols:
+        span = str(symbol.line)
+        if with_end and symbol.end_line != symbol.line:
+            span += f"-{symbol.end_line}"
+        lines.append(f"  {'  ' * symbol.depth}{span}: {symbol.signature}")
+    return lines
+
+
+@register_tool(tools_schemas.RepoMapSpec, read_only=True)
+def repo_map(path: str = ".", max_tokens: int | None = None) -> str:
+    """
+    Карта кода: сигнатуры классов, функций и методов с номерами строк
+    по файлам директории path. Первыми идут файлы, чьи объявления чаще
+    используются в других файлах; не поместившиеся в max_tokens отбрасываются.
+    """
+    try:
+        safe_path = _get_safe_path(path)
+        if not os.path.isdir(safe_path):
+            return f"Ошибка: '{path}' не является директорией."
+
+        index = _outline_for(safe_path)
+        prefix = os.path.relpath(safe_path, index.root).replace(os.sep, "/")
+        prefix = "" if prefix == "." else prefix + "/"
+        ranked = index.ranked(prefix)
+        if not ranked:
+            return f"В '{path}' нет файлов с классами или функциями."
+
+        budget = (max_tokens or settings.REPO_MAP_MAX_TOKENS) * CHARS_PER_TOKEN
+        blocks, used = [], 0
+        for rel_path, parsed, _ in ranked:
+            block = "\n".join([rel_path, *_format_symbols(parsed.symbols)])
+            if blocks and used + len(block) > budget:
+                break
+            blocks.append(block)
+            used += len(block) + 1
+        output = "\n".join(blocks)
+        if len(blocks) < len(ranked):
+            output += (
+                f"\n[... показано файлов: {len(blocks)} из {len(ranked)}. "
+                "Уточните path или используйте FileOutline для отдельного файла.]"
+            )
+        return output
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при построении карты кода: {e}"
+
+
+@register_tool(tools_schemas.FileOutlineSpec, read_only=True)
+def file_outline(path: str) -> str:
+    """
+    Структура файла: классы, функции и методы с сигнатурами и диапазонами
+    строк. Дешевле чтения файла целиком; нужные фрагменты затем читаются
+    через ReadFile с offset/limit.
+    """
+    try:
+        safe_path = _get_safe_path(path)
+        if not os.path.isfile(safe_path):
+            return f"Ошибка: Файл '{path}' не найден."
+        parsed = _outline_for(safe_path).outline(safe_path)
+        if parsed is None:
+            return f"Структура файлов типа '{os.path.splitext(path)[1] or path}' не поддерживается."
+        if parsed.error:
+            return f"Не удалось разобрать '{path}': {parsed.error}"
+        if not parsed.symbols:
+            return f"В файле '{path}' нет классов и функций."
+        return "\n".join(
+            [
+                f"{path} (объявлений: {len(parsed.symbols)})",
+                *_format_symbols(parsed.symbols, True),
+            ]
+        )
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при разборе файла: {e}"
+
+
+@register_tool(tools_schemas.FindFilesSpec, read_only=True)
+def find_files(pattern: str, path: str = ".", max_results: int = 200) -> str:
+    """
+    Ищет файлы по glob-шаблону pattern (например, '*.py' или 'src/*/test_*.py')
+    внутри директории path. Служебные директории (.git, node_modules, .venv и т.п.)
+    пропускаются.
+    """
+    try:
+        safe_path = _get_safe_path(path)
+        if not os.path.isdir(safe_path):
+            return f"Ошибка: '{path}' не является директорией."
+        root = current_sandbox().root_of(safe_path)
+        index = search_index.get_index(root)
+        prefix = os.path.relpath(safe_path, root).replace(os.sep, "/")
+        prefix = "" if prefix == "." else prefix + "/"
+
+        matches = [
+            rel_path
+            for rel_path in index.files()
+            if rel_path.startswith(prefix)
+            and search_index.match_glob(rel_path[len(prefix) :], pattern)
+        ]
+        if not matches:
+            return f"Файлы по шаблону '{pattern}' в '{path}' не найдены."
+        output = f"Найдено файлов по шаблону '{pattern}': {len(matches)}\n" + "\n".join(
+            matches[:max_results]
+        )
+        if len(matches) > max_results:
+            output += f"\n[... показаны первые {max_results} из {len(matches)}]"
+        return output
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при поиске файлов: {e}"
+
+
+SEARCH_LINE_MAX_CHARS = 200
+
+
+@register_tool(tools_schemas.SearchWorkspaceSpec, read_only=True)
+def search_workspace(
+    query: str,
+    regex: bool = False,
+    case_sensitive: bool = True,
+    glob: str | None = None,
+    path: str = ".",
+    max_results: int = 100,
+) -> str:
+    """
+    Ищет текст query в файлах рабочей директории и возвращает совпадения
+    в формате 'путь:номер_строки: строка'. query — обычная строка или, если regex,
+    регулярное выражение Python. glob ограничивает поиск файлами по шаблону
+    (например, '*.py'), путь сопоставляется относительно path, как в FindFiles.
+    """
+    try:
+        safe_path = _get_safe_path(path)
+        flags = 0 if case_sensitive else re.IGNORECASE
+        matcher = re.compile(query if regex else re.escape(query), flags)
+        literals = search_index.required_literals(query) if regex else [query]
+
+        root = current_sandbox().root_of(safe_path)
+        index = search_index.get_index(root)
+        prefix = os.path.relpath(safe_path, root).replace(os.sep, "/")
+        prefix = "" if prefix == "." else prefix + "/"
+
+        results, total = [], 0
+        for rel_path in index.candidates(literals):
+            if not rel_path.startswith(prefix) or not search_index.match_glob(
+                rel_path[len(prefix) :], glob
+            ):
+                continue
+            file_path = os.path.join(root, rel_path)
+            try:
+                cached = read_cache.get(file_path)
+                with (
+                    io.StringIO(
+                        cached.data.decode("utf-8", errors="replace"), newline=None
+                    )
+                    if cached is not None
+                    else open(file_path, "r", encoding="utf-8", errors="replace")
+                ) as f:
+                    for line_number, line in enumerate(f, start=1):
+                        if matcher.search(line):
+                            total += 1
+                            if len(results) < max_results:
+                                text = line.rstrip("\r\n")[:SEARCH_LINE_MAX_CHARS]
+                                results.append(f"{rel_path}:{line_number}: {text}")
+            except FileNotFoundError:
+                continue
+
+        if not results:
+            return f"Совпадений для '{query}' не найдено."
+        output = f"Найдено совпадений: {total}\n" + "\n".join(results)
+        if total > max_results:
+            output += f"\n[... показаны первые {max_results} из {total}]"
+        return output
+    except re.error as e:
+        return f"Ошибка: Некорректное регулярное выражение: {e}"
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при поиске: {e}"
+
+
+@register_tool(tools_schemas.RenameOrMoveSpec)
+@journaled
 def rename_or_move(source_path: str, destination_path: str) -> str:
     """
     Переименовывает (или перемещает) файл или директорию
@@ -172,7 +910,416 @@ def rename_or_move(source_path: str, destination_path: str) -> str:
             return f"Ошибка: Исходный путь '{source_path}' не найден."
         if os.path.exists(safe_dest):
             return f"Ошибка: Путь назначения '{destination_path}' уже существует."
+        step = _journal_step.get()
+        if step is not None:
+            step.record_move(safe_source, safe_dest)
         os.rename(safe_source, safe_dest)
+        read_cache.move(safe_source, safe_dest)
+        _on_path_removed(safe_source)
+        _on_path_changed(safe_dest, cache_updated=True)
         return f"Путь '{source_path}' успешно переименован в '{destination_path}'."
     except Exception as e:
         return f"Ошибка при переименовании: {e}"
+
+
+REPLACE_CHUNK_SIZE = 64 * 1024
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _stream_replace(
+    src: TextIO, old: str, new: str, counter: list[int]
+) -> Iterator[str]:
+    """Заменяет вхождения old на new, читая файл кусками с перекрытием len(old) - 1."""
+    carry = ""
+    while chunk := src.read(REPLACE_CHUNK_SIZE):
+        buffer = carry + chunk
+        pos = 0
+        while (index := buffer.find(old, pos)) != -1:
+            yield buffer[pos:index]
+            yield new
+            counter[0] += 1
+            pos = index + len(old)
+        # Хвост короче old может быть началом вхождения на границе кусков.
+        keep = max(pos, len(buffer) - len(old) + 1)
+        yield buffer[pos:keep]
+        carry = buffer[keep:]
+    yield carry
+
+
+@register_tool(tools_schemas.ReplaceInFileSpec)
+@journaled
+def replace_in_file(
+    path: str, old_string: str, new_string: str, replace_all: bool = False
+) -> str:
+    """
+    Заменяет точный фрагмент old_string на new_string в файле по пути path.
+    По умолчанию фрагмент должен встречаться в файле ровно один раз;
+    чтобы заменить все вхождения, передайте replace_all.
+    """
+    try:
+        if not old_string:
+            return "Ошибка: Заменяемый фрагмент не может быть пустым."
+        safe_path = _get_safe_path(path)
+        if not os.path.isfile(safe_path):
+            return f"Ошибка: Файл '{path}' не найден."
+
+        counter = [0]
+
+        def transform(src: TextIO) -> Iterator[str]:
+            yield from _stream_replace(src, old_string, new_string, counter)
+            if counter[0] == 0:
+                raise ValueError(f"фрагмент не найден в файле '{path}'.")
+            if counter[0] > 1 and not replace_all:
+                raise ValueError(
+                    f"фрагмент встречается в файле '{path}' {counter[0]} раз(а). "
+                    "Уточните фрагмент или передайте replace_all."
+                )
+
+        _atomic_rewrite(safe_path, transform)
+        return f"Файл '{path}' успешно отредактирован. Замен: {counter[0]}."
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при редактировании файла: {e}"
+
+
+def _ensure_newline(content: str) -> str:
+    return content if not content or content.endswith("\n") else content + "\n"
+
+
+@register_tool(tools_schemas.InsertLinesSpec)
+@journaled
+def insert_lines(path: str, after_line: int, content: str) -> str:
+    """
+    Вставляет content в файл по пути path после строки с номером after_line
+    (нумерация с 1; 0 — вставка в начало файла).
+    """
+    try:
+        safe_path = _get_safe_path(path)
+        if not os.path.isfile(safe_path):
+            return f"Ошибка: Файл '{path}' не найден."
+        if after_line < 0:
+            return "Ошибка: Номер строки не может быть отрицательным."
+
+        def transform(src: TextIO) -> Iterator[str]:
+            line_number = 0
+            if after_line == 0:
+                yield _ensure_newline(content)
+            for line in src:
+                line_number += 1
+                if line_number == after_line:
+                    yield _ensure_newline(line)
+                    yield _ensure_newline(content)
+                else:
+                    yield line
+            if line_number < after_line:
+                raise ValueError(
+                    f"в файле '{path}' всего {line_number} строк, "
+                    f"вставка после строки {after_line} невозможна."
+                )
+
+        _atomic_rewrite(safe_path, transform)
+        return f"В файл '{path}' вставлены строки после строки {after_line}."
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при редактировании файла: {e}"
+
+
+@register_tool(tools_schemas.DeleteLinesSpec)
+@journaled
+def delete_lines(path: str, start_line: int, end_line: int) -> str:
+    """
+    Удаляет строки с start_line по end_line включительно (нумерация с 1)
+    из файла по пути path.
+    """
+    try:
+        safe_path = _get_safe_path(path)
+        if not os.path.isfile(safe_path):
+            return f"Ошибка: Файл '{path}' не найден."
+        if start_line < 1 or end_line < start_line:
+            return f"Ошибка: Некорректный диапазон строк {start_line}-{end_line}."
+
+        def transform(src: TextIO) -> Iterator[str]:
+            line_number = 0
+            for line in src:
+                line_number += 1
+                if not start_line <= line_number <= end_line:
+                    yield line
+            if line_number < end_line:
+                raise ValueError(
+                    f"в файле '{path}' всего {line_number} строк, "
+                    f"диапазон {start_line}-{end_line} выходит за его пределы."
+                )
+
+        _atomic_rewrite(safe_path, transform)
+        return f"Строки {start_line}-{end_line} удалены из файла '{path}'."
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при редактировании файла: {e}"
+
+
+def _parse_unified_diff(patch: str) -> list[tuple[int, list[str], list[str]]]:
+    """
+    Разбирает unified diff для одного файла в список ханков
+    (старт в исходном файле, старые строки, новые строки).
+    """
+    hunks = []
+    current = None
+    file_headers = 0
+    for raw_line in patch.splitlines():
+        if raw_line.startswith("--- "):
+            file_headers += 1
+            if file_headers > 1:
+                raise ValueError("патч должен изменять только один файл.")
+            continue
+        if raw_line.startswith("+++ ") and current is None:
+            continue
+        header = _HUNK_HEADER.match(raw_line)
+        if header:
+            current = (int(header.group(1)), [], [])
+            hunks.append(current)
+            continue
+        if current is None or raw_line.startswith("\\"):
+            continue
+        marker, text = raw_line[:1], raw_line[1:]
+        if marker in (" ", ""):
+            current[1].append(text)
+            current[2].append(text)
+        elif marker == "-":
+            current[1].append(text)
+        elif marker == "+":
+            current[2].append(text)
+        else:
+            raise ValueError(f"некорректная строка патча: {raw_line!r}")
+    if not hunks:
+        raise ValueError("в патче не найдено ни одного ханка (@@ ... @@).")
+    return hunks
+
+
+def _stream_patch(
+    src: TextIO, hunks: list[tuple[int, list[str], list[str]]]
+) -> Iterator[str]:
+    """
+    Применяет ханки за один проход. Ханк ищется по контексту; если контекст
+    встречается несколько раз, берется вхождение, ближайшее к строке из заголовка
+    с учетом смещения предыдущих ханков (как при поиске со смещением в patch).
+    """
+    line_number = 0
+    offset = 0
+    lines: Iterator[str] = iter(src)
+    for index, (start, old_lines, new_lines) in enumerate(hunks, start=1):
+        replacement = [line + "\n" for line in new_lines]
+        expected = start + offset
+        if not old_lines:
+            # Чистая вставка без контекста: позиция берется из заголовка.
+            while line_number < expected and (line := next(lines, None)) is not None:
+                line_number += 1
+                yield _ensure_newline(line)
+            yield from replacement
+            continue
+
+        # Прочитанные, но еще не отданные строки; pending[0] — строка pending_from.
+        pending: list[str] = []
+        pending_from = line_number + 1
+        best = None
+        for line in lines:
+            line_number += 1
+            pending.append(line)
+            window_start = line_number - len(old_lines) + 1
+            if window_start < pending_from:
+                continue
+            window = pending[window_start - pending_from :]
+            if all(
+                have.rstrip("\r\n") == want for have, want in zip(window, old_lines)
+            ) and (best is None or abs(window_start - expected) < abs(best - expected)):
+                best = window_start
+            # Следующие вхождения не ближе найденного.
+            if best is not None and window_start - expected >= abs(best - expected):
+                break
+            # Строки до лучшего вхождения (или до будущих окон) уже не изменятся.
+            keep_from = best if best is not None else window_start + 1
+            if keep_from > pending_from:
+                yield from pending[: keep_from - pending_from]
+                del pending[: keep_from - pending_from]
+                pending_from = keep_from
+        if best is None:
+            raise ValueError(
+                f"ханк #{index} (строка {start}) не совпадает с содержимым файла."
+            )
+
+        yield from pending[: best - pending_from]
+        matched_end = best - pending_from + len(old_lines)
+        if replacement and not pending[matched_end - 1].endswith("\n"):
+            replacement[-1] = replacement[-1][:-1]
+        yield from replacement
+        # Строки после вхождения возвращаются во входной поток для следующих ханков.
+        lines = itertools.chain(pending[matched_end:], lines)
+        line_number = best + len(old_lines) - 1
+        offset = best - start
+    yield from lines
+
+
+@register_tool(tools_schemas.ApplyPatchSpec)
+@journaled
+def apply_patch(path: str, patch: str) -> str:
+    """
+    Применяет к файлу по пути path патч в формате unified diff
+    (ханки вида '@@ -a,b +c,d @@' со строками ' ', '-' и '+').
+    Ханки находятся по строкам контекста, поэтому номера строк могут быть неточными.
+    """
+    try:
+        safe_path = _get_safe_path(path)
+        if not os.path.isfile(safe_path):
+            return f"Ошибка: Файл '{path}' не найден."
+        hunks = _parse_unified_diff(patch)
+        _atomic_rewrite(safe_path, lambda src: _stream_patch(src, hunks))
+        return f"Патч применен к файлу '{path}'. Ханков: {len(hunks)}."
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при применении патча: {e}"
+
+
+def _refresh_after_revert(paths: list[str]) -> None:
+    for path in dict.fromkeys(paths):
+        if os.path.lexists(path):
+            _on_path_changed(path)
+        else:
+            _on_path_removed(path)
+
+
+def _describe_steps(steps: list[tuple[str, str]]) -> str:
+    return "; ".join(f"{tool} {summary}".strip() for tool, summary in steps)
+
+
+@register_tool(tools_schemas.UndoSpec)
+def undo(steps: int = 1) -> str:
+    """
+    Отменяет последние steps изменений рабочей директории. Шаг — один вызов
+    изменяющего инструмента (WriteFile, ReplaceInFile, DeleteDirectory и т.д.).
+    """
+    try:
+        if steps < 1:
+            return "Ошибка: Число шагов должно быть положительным."
+        undone, touched = journal_for(current_sandbox().root).undo(steps)
+        if not undone:
+            return "Журнал изменений пуст: отменять нечего."
+        _refresh_after_revert(touched)
+        return f"Отменено шагов: {len(undone)}: {_describe_steps(undone)}."
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при отмене изменений: {e}"
+
+
+@register_tool(tools_schemas.SnapshotSpec)
+def snapshot(name: str | None = None) -> str:
+    """
+    Запоминает текущее состояние рабочей директории под именем name,
+    чтобы позже вернуться к нему через Restore. Файлы не копируются.
+    """
+    try:
+        name = journal_for(current_sandbox().root).snapshot(name)
+        return f"Снимок '{name}' создан. Вернуться к нему: Restore(name='{name}')."
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при создании снимка: {e}"
+
+
+@register_tool(tools_schemas.RestoreSpec)
+def restore(name: str) -> str:
+    """Возвращает рабочую директорию к снимку name, отменяя все изменения после него."""
+    journal = journal_for(current_sandbox().root)
+    try:
+        undone, touched = journal.restore(name)
+    except KeyError:
+        available = ", ".join(f"'{n}'" for n in journal.snapshots()) or "нет"
+        return f"Ошибка: Снимок '{name}' не найден. Доступные снимки: {available}."
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при восстановлении снимка: {e}"
+    _refresh_after_revert(touched)
+    if not undone:
+        return f"После снимка '{name}' изменений не было."
+    return f"Восстановлен снимок '{name}'. Отменено шагов: {len(undone)}: {_describe_steps(undone)}."
+
+
+def _stream_command_output(text: str) -> None:
+    from langchain_core.callbacks import dispatch_custom_event
+
+    try:
+        dispatch_custom_event(runner.COMMAND_OUTPUT_EVENT, {"text": text})
+    except RuntimeError:
+        # Вызов вне графа агента (тесты, команды чата): выводить некуда.
+        pass
+
+
+def _after_command() -> None:
+    """Команда могла изменить любые файлы в обход инструментов: кэши и индексы сверяются с диском."""
+    box = current_sandbox()
+    box.clear()
+    for root in box.roots:
+        read_cache.invalidate(root)
+        search_index.get_index(root).expire()
+        outline_index.get_index(root).expire()
+
+
+def _format_command_result(result: runner.CommandResult, timeout: float) -> str:
+    if result.timed_out:
+        status = f"Прервано по таймауту ({timeout:g} с)"
+    elif result.exit_code is None:
+        status = "Код выхода неизвестен"
+    elif result.exit_code < 0:
+        status = (
+            f"Завершено сигналом {signal.Signals(-result.exit_code).name} "
+            "(вероятно, превышен лимит процессорного времени или памяти)"
+        )
+    else:
+        status = f"Код выхода: {result.exit_code}"
+    header = f"{status}. Время: {result.duration:.2f} с"
+    if result.warm:
+        header += ", теплый процесс"
+    output = result.output if result.output.strip() else "[Нет вывода]"
+    return f"{header}.\n{output}"
+
+
+def _run_in_workspace(argv: list[str], cwd: str, timeout: float | None) -> str:
+    if session_sandbox.get() is not None and not settings.SERVER_ALLOW_COMMANDS:
+        return "Ошибка: Запуск команд на этом сервере выключен (SERVER_ALLOW_COMMANDS)."
+    try:
+        safe_cwd = _get_safe_path(cwd)
+        if not os.path.isdir(safe_cwd):
+            return f"Ошибка: '{cwd}' не является директорией."
+        timeout = min(
+            timeout or settings.RUN_TIMEOUT_SECONDS, settings.RUN_TIMEOUT_SECONDS
+        )
+        result = runner.run(argv, safe_cwd, timeout, on_output=_stream_command_output)
+    except Exception as e:  # noqa: BLE001
+        return f"Ошибка при выполнении команды: {e}"
+    _after_command()
+    return _format_command_result(result, timeout)
+
+
+@register_tool(tools_schemas.RunCommandSpec)
+def run_command(command: str, cwd: str = ".", timeout: float | None = None) -> str:
+    """
+    Выполняет команду в директории cwd и возвращает код выхода и вывод
+    (stdout и stderr вместе). Аргументы разбираются как в оболочке, но сама
+    оболочка не используется: конвейеры, перенаправления и && не работают.
+    Время, процессор и память ограничены, но доступ к файлам — нет: команда
+    выполняется с правами агента и может читать и менять файлы вне рабочей
+    директории. Изменения файлов, сделанные командой, не попадают в журнал
+    и не отменяются через Undo.
+    """
+    try:
+        argv = shlex.split(command)
+    except ValueError as e:
+        return f"Ошибка: Не удалось разобрать команду: {e}"
+    if not argv:
+        return "Ошибка: Пустая команда."
+    return _run_in_workspace(argv, cwd, timeout)
+
+
+@register_tool(tools_schemas.RunTestsSpec)
+def run_tests(
+    path: str = ".", args: list[str] | None = None, timeout: float | None = None
+) -> str:
+    """
+    Запускает pytest в директории проекта path. args — дополнительные
+    аргументы pytest (например, ['-k', 'login'] или путь к файлу тестов).
+    Используется pytest, найденный в PATH; если это pytest самого агента,
+    запуск идет в заранее прогретом процессе Python. Как и RunCommand,
+    тесты не изолированы от файлов вне рабочей директории.
+    """
+    return _run_in_workspace(["pytest", "-q", *(args or [])], path, timeout)
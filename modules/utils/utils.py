@@ -1,77 +1,229 @@
-from typing import List
-from langchain_core.tools import StructuredTool
-from langchain_core.messages import HumanMessage, BaseMessage
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
 
 from modules.settings.agent_config import settings
+from modules.utils.checkpoint import current_thread_id, has_history, new_thread_id
+from modules.utils.context import (
+    ContextManager,
+    extractive_summary,
+    make_llm_summarizer,
+)
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_core.runnables import RunnableConfig
+
+
+def _make_context_manager() -> ContextManager:
+    summarizer = extractive_summary
+    if settings.CONTEXT_SUMMARIZER == "llm":
+        from modules.utils.llm import get_summary_llm
+
+        summarizer = make_llm_summarizer(get_summary_llm())
+    return ContextManager(
+        token_budget=settings.CONTEXT_TOKEN_BUDGET,
+        summary_max_tokens=settings.CONTEXT_SUMMARY_MAX_TOKENS,
+        summarizer=summarizer,
+    )
 
 
-def snake_to_pascal(name: str) -> str:
-    return "".join(word.capitalize() for word in name.split("_"))
+MAX_CONTEXT_MANAGERS = 256
 
+_context_managers: OrderedDict[str, ContextManager] = OrderedDict()
+_context_managers_lock = threading.Lock()
 
-def get_structured_tools(
-    tools, names, args_schemas, descriptions
-) -> List[StructuredTool]:
-    """Возвращает список инструментов StructuredTool."""
 
-    if not (len(tools) == len(names) == len(args_schemas) == len(descriptions)):
-        raise ValueError(
-            "Длины списков tools, names, args_schemas и descriptions должны быть одинаковыми."
-        )
+def get_context_manager(thread_id: str) -> ContextManager:
+    """
+    Свой менеджер контекста (и свой конспект) для каждой сессии.
+    Хранятся последние MAX_CONTEXT_MANAGERS сессий; вытесненная сессия
+    при следующем обращении начнет конспект заново.
+    """
+    with _context_managers_lock:
+        manager = _context_managers.get(thread_id)
+        if manager is None:
+            manager = _context_managers[thread_id] = _make_context_manager()
+            while len(_context_managers) > MAX_CONTEXT_MANAGERS:
+                _context_managers.popitem(last=False)
+        else:
+            _context_managers.move_to_end(thread_id)
+        return manager
 
-    structured_tools = []
-    for func, name, schema, descr in zip(tools, names, args_schemas, descriptions):
-        structured_tool = StructuredTool.from_function(
-            func=func, name=name, args_schema=schema, description=descr
-        )
-        structured_tools.append(structured_tool)
 
-    return structured_tools
+def drop_context_manager(thread_id: str) -> None:
+    """Забывает конспект сессии (при ее закрытии)."""
+    with _context_managers_lock:
+        _context_managers.pop(thread_id, None)
 
 
 def manage_context(
-    messages: List[BaseMessage], content_window_size: int
-) -> List[BaseMessage]:
-    """Управляет размером контекста, сохраняя системное сообщение и последние K сообщений."""
-    if len(messages) <= content_window_size:
-        return messages
-
-    system_message = messages[0]
-    recent_messages = messages[-content_window_size:]
+    messages: list["BaseMessage"],
+    token_budget: int | None = None,
+    thread_id: str = "default",
+) -> list["BaseMessage"]:
+    """
+    Управляет размером контекста по бюджету токенов: сохраняет первое сообщение,
+    последние сообщения в пределах бюджета и сворачивает остальное в конспект.
+    """
+    context_manager = get_context_manager(thread_id)
+    if token_budget is not None:
+        context_manager.token_budget = token_budget
+    return context_manager.manage(messages)
+
+
+def trim_context_hook(state: dict, config: "RunnableConfig") -> dict:
+    """
+    pre_model_hook для create_react_agent: полная история остается в состоянии графа,
+    а в модель уходит только сжатое окно.
+    """
+    thread_id = config.get("configurable", {}).get("thread_id", "default")
+    llm_input_messages = manage_context(state["messages"], thread_id=thread_id)
+    trimmed = get_context_manager(thread_id).last_trimmed
+    if trimmed:
+        from langchain_core.callbacks import dispatch_custom_event
+
+        from modules.utils import telemetry
+
+        # Сжатие контекста попадает в телеметрию хода, а не в консоль.
+        dispatch_custom_event(
+            telemetry.CONTEXT_TRIMMED_EVENT,
+            {
+                "trimmed": trimmed,
+                "sent": len(llm_input_messages),
+                "total": len(state["messages"]),
+            },
+            config=config,
+        )
+    return {"llm_input_messages": llm_input_messages}
 
-    trimmed_messages = [system_message] + recent_messages
-    print(
-        f"\n[DEBUG: Контекст был урезан. Сохранено {len(trimmed_messages)} из {len(messages)} сообщений.]\n"
-    )
-    return trimmed_messages
 
+class _BackgroundAgent:
+    """
+    Собирает агента в фоновом потоке, пока пользователь набирает первое
+    сообщение: импорт langgraph и клиента модели не задерживает приглашение.
+    """
 
-def run_chat(agent_executor):
-    messages_history: List[BaseMessage] = []
+    def __init__(self, factory: Callable[[], Any]):
+        self._agent = None
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(
+            target=self._build, args=(factory,), name="agent-build", daemon=True
+        )
+        self._thread.start()
+
+    def _build(self, factory: Callable[[], Any]) -> None:
+        try:
+            self._agent = factory()
+        except BaseException as e:  # noqa: BLE001
+            self._error = e
+
+    def get(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._agent
+
+
+def run_chat(agent_factory: Callable[[], Any]):
+    """
+    Консольный чат. agent_factory собирает граф агента; он вызывается в фоне
+    сразу после запуска, чтобы приглашение появилось без ожидания импорта.
+    """
+    agent = _BackgroundAgent(agent_factory)
+    thread_id = current_thread_id()
+    telemetry_handler = None
     print(
         f"Агент-программист готов к работе. Все проекты будут созданы в директории '{settings.WORKSPACE_DIR}'. Введите 'выход', чтобы завершить."
     )
+    if has_history(thread_id):
+        print(
+            f"Продолжается сессия {thread_id}. Введите 'restart', чтобы начать новую."
+        )
 
     while True:
         user_input = input("Вы: ")
 
         if user_input.lower() == "restart":
-            messages_history = []
+            _context_managers.pop(thread_id, None)
+            thread_id = new_thread_id()
             print("Контекст чата был сброшен.")
             continue
 
-        if user_input.lower() in ["выход", "exit"]:
-            print("Агент завершает работу. До свидания!")
-            break
+        if user_input.strip() == "/cache":
+            from modules.utils.llm import get_llm_cache
+            from modules.utils.llm_cache import format_stats
 
-        messages_history.append(HumanMessage(content=user_input))
+            print(format_stats(get_llm_cache()))
+            continue
 
-        messages_to_send = manage_context(
-            messages_history, settings.CONTEXT_WINDOW_SIZE
-        )
+        if user_input.strip() == "/stats":
+            if not settings.TELEMETRY_ENABLED:
+                print("Телеметрия выключена (TELEMETRY_ENABLED).")
+            else:
+                from modules.utils import telemetry
+
+                spans = telemetry.read_spans(settings.TELEMETRY_PATH)
+                print(telemetry.format_stats(spans))
+            continue
+
+        command, _, argument = user_input.strip().partition(" ")
+        argument = argument.strip()
+        if command in ("/undo", "/snapshot", "/restore"):
+            from modules.utils import tools
+
+            if command == "/undo":
+                print(tools.undo(int(argument) if argument.isdigit() else 1))
+            elif command == "/snapshot":
+                print(tools.snapshot(argument or None))
+            elif argument:
+                print(tools.restore(argument))
+            else:
+                print("Укажите имя снимка: /restore <имя>.")
+            continue
 
-        response = agent_executor.invoke({"messages": messages_to_send})
-        agent_response = response["messages"][-1]
-        messages_history.append(agent_response)
+        if user_input.strip() == "/debug":
+            from modules.utils import read_cache, tools
+
+            sandbox = tools.sandbox.stats()
+            print(read_cache.format_stats())
+            print(
+                f"Кэш путей песочницы: попаданий {sandbox['hits']}, промахов "
+                f"{sandbox['misses']}, доля попаданий {sandbox['hit_ratio']:.0%}, "
+                f"записей {sandbox['cached']}."
+            )
+            continue
+
+        if user_input.lower() in ["выход", "exit"]:
+            print("Агент завершает работу. До свидания!")
+            break
 
-        agent_response.pretty_print()
+        from langchain_core.messages import HumanMessage
+
+        from modules.utils.streaming import close_dangling_tool_calls, stream_turn
+
+        agent_executor = agent.get()
+        if settings.TELEMETRY_ENABLED and telemetry_handler is None:
+            from modules.utils import telemetry
+
+            telemetry_handler = telemetry.TelemetryHandler(settings.TELEMETRY_PATH)
+
+        config = {"configurable": {"thread_id": thread_id}}
+        if telemetry_handler is not None:
+            config["callbacks"] = [telemetry_handler]
+            telemetry_handler.start_turn(thread_id)
+        status = "ok"
+        try:
+            # История хранится в чекпоинтере графа, поэтому отправляется только новое сообщение.
+            stream_turn(agent_executor, [HumanMessage(content=user_input)], config)
+        except KeyboardInterrupt:
+            status = "cancelled"
+            print("\n[Ход прерван. Сессия продолжается.]")
+            close_dangling_tool_calls(agent_executor, config)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            if telemetry_handler is not None:
+                telemetry_handler.end_turn(status)
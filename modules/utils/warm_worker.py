@@ -0,0 +1,275 @@
+"""
+Сервер теплых процессов Python для RunCommand/RunTests (запускается как
+отдельный скрипт, зависит только от stdlib).
+
+Процесс один раз импортирует модули из аргументов (pytest и т.п.) и держит
+несколько заранее порожденных через fork рабочих процессов. Задание приходит
+датаграммой JSON вместе с двумя дескрипторами (вывод и статус); его получает
+свободный рабочий процесс, а сервер сразу порождает ему замену. Рабочий
+процесс одноразовый: выполняет задание и завершается, поэтому состояние
+одного запуска не попадает в следующий.
+
+Протокол канала статуса: рабочий процесс пишет свой pid, сервер после
+завершения процесса — код выхода (отрицательный — номер сигнала).
+
+    python warm_worker.py <fd сокета> <число запасных процессов> [модули...]
+"""
+
+import atexit
+import importlib
+import json
+import os
+import runpy
+import select
+import signal
+import socket
+import sys
+import traceback
+
+MAX_MESSAGE_BYTES = 1024 * 1024
+PARENT_CHECK_SECONDS = 1.0
+
+
+def socketpair() -> tuple[socket.socket, socket.socket]:
+    """
+    Пара сокетов для сообщений с дескрипторами. SOCK_SEQPACKET сообщает
+    о закрытии второй стороны; где его нет, остается SOCK_DGRAM, и уход
+    родителя обнаруживается проверкой getppid.
+    """
+    try:
+        return socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    except (AttributeError, OSError):
+        return socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+
+def apply_limits(cpu_seconds: int | None, memory_bytes: int | None) -> None:
+    """Лимиты процессорного времени и адресного пространства для текущего процесса."""
+    import resource
+
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    if cpu_seconds:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if memory_bytes:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        except (ValueError, OSError):
+            # macOS не позволяет ограничить RLIMIT_AS.
+            pass
+
+
+def _run_job(job: dict, out_fd: int, status_fd: int) -> None:
+    os.setsid()
+    os.write(status_fd, f"{os.getpid()}\n".encode())
+    os.close(status_fd)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(out_fd, 1)
+    os.dup2(out_fd, 2)
+    os.close(devnull)
+    os.close(out_fd)
+    sys.stdout.reconfigure(line_buffering=True)
+
+    code = 0
+    try:
+        apply_limits(job.get("cpu_seconds"), job.get("memory_bytes"))
+        os.chdir(job["cwd"])
+        os.environ.clear()
+        os.environ.update(job["env"])
+        sys.argv = job["argv"]
+        mode, target = job["mode"], job["target"]
+        if mode == "module":
+            sys.path[0] = os.getcwd()
+            runpy.run_module(target, run_name="__main__", alter_sys=True)
+        elif mode == "path":
+            sys.path[0] = os.path.dirname(os.path.abspath(target))
+            runpy.run_path(target, run_name="__main__")
+        else:
+            sys.path[0] = ""
+            # Это и есть запуск python -c: код пользователя выполняется так же,
+            # как в обычном интерпретаторе, в отдельном одноразовом процессе.
+            exec(compile(target, "<string>", "exec"), {"__name__": "__main__"})  # noqa: S102
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:  # noqa: BLE001
+        # Как в интерпретаторе: трассировка необработанного исключения и код 1.
+        traceback.print_exc()
+        code = 1
+    try:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code & 0xFF)
+
+
+def _worker_main(channel: socket.socket) -> None:
+    zygote = os.getppid()
+    channel.settimeout(PARENT_CHECK_SECONDS)
+    while True:
+        try:
+            message, fds, _, _ = socket.recv_fds(channel, MAX_MESSAGE_BYTES, 2)
+            break
+        except TimeoutError:
+            if os.getppid() != zygote:
+                os._exit(0)
+    channel.close()
+    if not message or len(fds) != 2:
+        os._exit(0)
+    _run_job(json.loads(message), *fds)
+
+
+class Zygote:
+    def __init__(self, control: socket.socket, spare: int):
+        self.control = control
+        self.spare = spare
+        self.parent = os.getppid()
+        self.idle: dict[int, socket.socket] = {}
+        # pid занятого процесса -> дескриптор статуса для кода выхода
+        self.busy: dict[int, int] = {}
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        os.set_blocking(self.wakeup_w, False)
+        signal.set_wakeup_fd(self.wakeup_w)
+        signal.signal(signal.SIGCHLD, lambda *_: None)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    def _fork(self) -> tuple[int, socket.socket]:
+        ours, theirs = socketpair()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                os.close(self.wakeup_w)
+                ours.close()
+                self.control.close()
+                for channel in self.idle.values():
+                    channel.close()
+                for fd in self.busy.values():
+                    os.close(fd)
+                os.close(self.wakeup_r)
+                _worker_main(theirs)
+            finally:
+                os._exit(1)
+        theirs.close()
+        return pid, ours
+
+    def _top_up(self) -> None:
+        while len(self.idle) < self.spare:
+            pid, channel = self._fork()
+            self.idle[pid] = channel
+
+    def _dispatch(self, message: bytes, fds: list[int]) -> None:
+        out_fd, status_fd = fds
+        try:
+            while True:
+                fresh = not self.idle
+                pid, channel = self._fork() if fresh else self.idle.popitem()
+                try:
+                    socket.send_fds(channel, [message], [out_fd, status_fd])
+                except OSError:
+                    # Запасной процесс мог завершиться, но еще не быть собран
+                    # _reap; если не принял и новый — задание отклоняется.
+                    if fresh:
+                        os.close(status_fd)
+                        break
+                    continue
+                finally:
+                    channel.close()
+                self.busy[pid] = status_fd
+                break
+        finally:
+            os.close(out_fd)
+        self._top_up()
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            status_fd = self.busy.pop(pid, None)
+            if status_fd is not None:
+                code = os.waitstatus_to_exitcode(status)
+                try:
+                    os.write(status_fd, f"{code}\n".encode())
+                except OSError:
+                    pass
+                os.close(status_fd)
+            elif pid in self.idle:
+                self.idle.pop(pid).close()
+
+    def serve(self) -> None:
+        self._top_up()
+        while True:
+            ready, _, _ = select.select(
+                [self.control, self.wakeup_r], [], [], PARENT_CHECK_SECONDS
+            )
+            if self.wakeup_r in ready:
+                os.read(self.wakeup_r, 4096)
+            self._reap()
+            self._top_up()
+            if os.getppid() != self.parent:
+                return
+            if self.control in ready:
+                message, fds, _, _ = socket.recv_fds(self.control, MAX_MESSAGE_BYTES, 2)
+                if not message:
+                    return
+                if len(fds) == 2:
+                    self._dispatch(message, fds)
+                else:
+                    for fd in fds:
+                        os.close(fd)
+
+
+def _preload_pytest() -> None:
+    """
+    Встроенные плагины pytest и плагины из entry points (pytest11): pytest
+    импортирует их при каждом запуске, и обычно они дороже самого pytest.
+    """
+    from importlib.metadata import entry_points
+
+    from _pytest.config import default_plugins
+
+    names = [f"_pytest.{name}" for name in default_plugins]
+    names += [entry_point.module for entry_point in entry_points(group="pytest11")]
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+PRELOAD_HOOKS = {"pytest": _preload_pytest}
+
+
+def main(argv: list[str]) -> None:
+    control = socket.socket(fileno=int(argv[1]))
+    for name in argv[3:]:
+        try:
+            importlib.import_module(name)
+            if name in PRELOAD_HOOKS:
+                PRELOAD_HOOKS[name]()
+        except ImportError:
+            pass
+    zygote = Zygote(control, int(argv[2]))
+    try:
+        zygote.serve()
+    finally:
+        for pid in list(zygote.idle) + list(zygote.busy):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    main(sys.argv)
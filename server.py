@@ -0,0 +1,12 @@
+from modules.server.app import create_app
+
+# ASGI-приложение: uvicorn server:app (или любой другой ASGI-сервер).
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    from modules.settings.agent_config import settings
+
+    uvicorn.run(app, host=settings.SERVER_HOST, port=settings.SERVER_PORT)
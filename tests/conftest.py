@@ -4,3 +4,26 @@
 # path_name = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 # print(f"Adding {path_name} to sys.path")
 # sys.path.insert(0, path_name)
+
+
+import pytest
+
+import modules.utils.tools
+from modules.settings.agent_config import settings
+from modules.utils.sandbox import Sandbox
+
+
+@pytest.fixture(autouse=True)
+def journal_dir(tmp_path, monkeypatch):
+    """Журнал отмены каждого теста — во временной директории, а не в .agent_state."""
+    monkeypatch.setattr(settings, "JOURNAL_DIR", str(tmp_path / "journal"))
+    return tmp_path / "journal"
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """Временная рабочая директория, подставленная в модуль инструментов."""
+    test_workspace = tmp_path / "workspace"
+    test_workspace.mkdir()
+    monkeypatch.setattr(modules.utils.tools, "sandbox", Sandbox([test_workspace]))
+    return test_workspace
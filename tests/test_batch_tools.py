@@ -0,0 +1,61 @@
+import os
+
+from modules.schemas.tools_schemas import FileContentSpec
+from modules.utils import tools
+
+
+def test_read_files_reads_each_file_once(workspace):
+    (workspace / "a.txt").write_text("A", encoding="utf-8")
+    (workspace / "b.txt").write_text("B" * 100, encoding="utf-8")
+
+    result = tools.read_files(["a.txt", "b.txt", "a.txt", "missing.txt"], 10)
+
+    assert result.count("Содержимое файла 'a.txt'") == 1
+    assert "B" * 10 in result and "B" * 11 not in result
+    assert "Ошибка: Файл 'missing.txt' не найден." in result
+
+
+def test_write_files_creates_all_files(workspace):
+    result = tools.write_files(
+        [
+            FileContentSpec(path="app/__init__.py", content=""),
+            {"path": "app/core/main.py", "content": "print(1)\n"},
+        ]
+    )
+
+    assert "Записано файлов: 2" in result
+    assert (workspace / "app" / "core" / "main.py").read_text() == "print(1)\n"
+
+
+def test_write_files_rolls_back_on_failure(workspace, monkeypatch):
+    (workspace / "keep.txt").write_text("old", encoding="utf-8")
+    real_replace = os.replace
+    calls = []
+
+    def failing_replace(src, dst):
+        calls.append(dst)
+        if str(dst).endswith("fail.txt"):
+            raise OSError("disk full")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(tools.os, "replace", failing_replace)
+
+    result = tools.write_files(
+        [
+            {"path": "keep.txt", "content": "new"},
+            {"path": "new_dir/fail.txt", "content": "x"},
+        ]
+    )
+
+    assert "изменения отменены: disk full" in result
+    assert (workspace / "keep.txt").read_text(encoding="utf-8") == "old"
+    assert sorted(p.name for p in workspace.iterdir()) == ["keep.txt"]
+
+
+def test_write_files_rejects_traversal_without_writing(workspace):
+    result = tools.write_files(
+        [{"path": "ok.txt", "content": ""}, {"path": "../evil.txt", "content": ""}]
+    )
+
+    assert "Попытка доступа за пределы рабочей директории" in result
+    assert not (workspace / "ok.txt").exists()
@@ -0,0 +1,38 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.prebuilt import create_react_agent
+
+from modules.settings.agent_config import settings
+from modules.utils import checkpoint
+from modules.utils.fake_llm import ScriptedChatModel
+from modules.utils.utils import trim_context_hook
+
+
+def build_agent(replies):
+    model = ScriptedChatModel(messages=iter(AIMessage(content=r) for r in replies))
+    return create_react_agent(
+        model=model,
+        tools=[],
+        pre_model_hook=trim_context_hook,
+        checkpointer=checkpoint.make_checkpointer(),
+    )
+
+
+def test_sqlite_history_survives_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CHECKPOINTER", "sqlite")
+    monkeypatch.setattr(settings, "THREAD_ID", None)
+    monkeypatch.setattr(
+        settings, "CHECKPOINT_DB_PATH", str(tmp_path / "state" / "db.sqlite")
+    )
+    thread_id = checkpoint.new_thread_id()
+    config = {"configurable": {"thread_id": thread_id}}
+
+    build_agent(["first"]).invoke({"messages": [HumanMessage("hi")]}, config)
+
+    # "Перезапуск процесса": новое соединение с той же базой.
+    assert checkpoint.current_thread_id() == thread_id
+    result = build_agent(["second"]).invoke(
+        {"messages": [HumanMessage("again")]}, config
+    )
+
+    assert [m.content for m in result["messages"]] == ["hi", "first", "again", "second"]
+    assert checkpoint.new_thread_id() != thread_id
@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from main import build_agent
+from modules.utils import compaction
+from modules.utils.compaction import OutputCompactor, ToolOutputStore, compact
+from modules.utils.fake_llm import replay_trajectory, tool_call_turn
+
+
+def test_repeated_lines_are_collapsed():
+    content = "start\n" + "same\n" * 10 + "end\n"
+
+    result = compact(content, max_tokens=1000, output_id="a-1", min_repeats=3)
+
+    assert result == "start\nsame\n[... строка повторяется еще 9 раз]\nend\n"
+
+
+def test_long_output_keeps_head_and_tail(monkeypatch):
+    store = ToolOutputStore(max_entries=10, max_bytes=10**6)
+    monkeypatch.setattr(compaction, "tool_outputs", store)
+    content = "".join(f"line {i:04d}\n" for i in range(1, 1001))
+    output_id = store.put(content)
+
+    result = compact(content, max_tokens=100, output_id=output_id, min_repeats=3)
+
+    assert result.startswith("line 0001\n")
+    assert result.endswith("line 1000\n")
+    assert len(result) < 600
+    marker = next(line for line in result.splitlines() if "пропущены" in line)
+    first, last = marker.split("строки ")[1].split(" из")[0].split("-")
+    fetched = compaction.read_tool_output(output_id, int(first), int(first) + 1)
+    assert f"line {int(first):04d}" in fetched
+    assert f"end_line={last}" in marker
+
+
+def make_request(name, args, thread_id="t"):
+    return SimpleNamespace(
+        tool_call={"name": name, "args": args, "id": "1"},
+        runtime=SimpleNamespace(config={"configurable": {"thread_id": thread_id}}),
+    )
+
+
+def test_unchanged_reads_are_deduplicated():
+    store = ToolOutputStore(10, 10**6)
+    compactor = OutputCompactor(store, 1000, {}, 3, dedup_tools=["ReadFile"])
+    request = make_request("ReadFile", {"path": "a.py"})
+
+    first = compactor.process(request, ToolMessage("print(1)\n", tool_call_id="1"))
+    second = compactor.process(request, ToolMessage("print(1)\n", tool_call_id="1"))
+    changed = compactor.process(request, ToolMessage("print(2)\n", tool_call_id="1"))
+    other_thread = compactor.process(
+        make_request("ReadFile", {"path": "a.py"}, thread_id="other"),
+        ToolMessage("print(2)\n", tool_call_id="1"),
+    )
+
+    assert first.content == "print(1)\n"
+    assert "не изменилось" in second.content
+    assert f"#{store.prefix}-1" in second.content
+    assert changed.content == "print(2)\n"
+    assert other_thread.content == "print(2)\n"
+
+
+def test_agent_loop_compacts_tool_outputs(workspace, monkeypatch):
+    monkeypatch.setattr(compaction, "tool_outputs", ToolOutputStore(10, 10**6))
+    (workspace / "big.txt").write_text(
+        "".join(f"row {i} {'x' * 40}\n" for i in range(5000)), encoding="utf-8"
+    )
+    model = replay_trajectory(
+        [
+            tool_call_turn([("ReadFile", {"path": "big.txt"})], prefix="a"),
+            tool_call_turn([("ReadFile", {"path": "big.txt"})], prefix="b"),
+            AIMessage(content="Готово."),
+        ]
+    )
+    agent = build_agent(model, InMemorySaver())
+
+    result = agent.invoke(
+        {"messages": [HumanMessage("прочитай big.txt")]},
+        {"configurable": {"thread_id": "compaction"}},
+    )
+
+    first, second = [m for m in result["messages"] if isinstance(m, ToolMessage)]
+    assert "ReadToolOutput(output_id=" in first.content
+    assert "row 0 " in first.content and "ReadFile с offset=" in first.content
+    assert "не изменилось" in second.content
+
+
+def test_tool_outputs_are_scoped_per_session(monkeypatch):
+    monkeypatch.setattr(compaction, "tool_outputs", ToolOutputStore(10, 10**6))
+    compactor = OutputCompactor(
+        ToolOutputStore(10, 10**6), 10, {}, 3, dedup_tools=["ReadFile"]
+    )
+    content = "".join(f"secret line {i}\n" for i in range(100))
+
+    alice = ToolOutputStore(10, 10**6)
+    token = compaction.session_tool_outputs.set(alice)
+    try:
+        compactor.process(
+            make_request("ReadFile", {"path": "a.py"}, thread_id="alice"),
+            ToolMessage(content, tool_call_id="1"),
+        )
+        output_id = f"{alice.prefix}-1"
+        assert "secret line 50" in compaction.read_tool_output(output_id, 50, 52)
+    finally:
+        compaction.session_tool_outputs.reset(token)
+
+    token = compaction.session_tool_outputs.set(ToolOutputStore(10, 10**6))
+    try:
+        assert "не найден" in compaction.read_tool_output(output_id)
+    finally:
+        compaction.session_tool_outputs.reset(token)
+    assert "не найден" in compaction.read_tool_output(output_id)
+
+
+def test_stale_and_evicted_output_ids_are_reported(monkeypatch):
+    store = ToolOutputStore(max_entries=1, max_bytes=10**6)
+    monkeypatch.setattr(compaction, "tool_outputs", store)
+    evicted = store.put("old\n")
+    store.put("new\n")
+
+    # Номер из истории, сохраненной до перезапуска, не совпадает с новыми.
+    restarted = ToolOutputStore(max_entries=1, max_bytes=10**6)
+    assert restarted.put("other\n") != evicted
+
+    assert "вытеснен" in compaction.read_tool_output(evicted)
+    assert "предыдущем запуске" in compaction.read_tool_output("0000-1")
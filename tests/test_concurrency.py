@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage
+
+from modules.utils.concurrency import ToolCallScheduler, tool_call_paths
+
+CALLS = [
+    {"name": "WriteFile", "args": {"path": "pkg/a.py", "content": "x"}, "id": "w"},
+    {"name": "ReadFile", "args": {"path": "./pkg/a.py"}, "id": "r1"},
+    {"name": "ReadFile", "args": {"path": "other.py"}, "id": "r2"},
+]
+
+
+def make_requests():
+    state = {"messages": [AIMessage(content="", tool_calls=CALLS)]}
+    return [SimpleNamespace(state=state, tool_call=call) for call in CALLS]
+
+
+def test_tool_call_paths():
+    assert tool_call_paths(CALLS[1]) == ["pkg/a.py"]
+    assert tool_call_paths({"name": "ListDirectory", "args": {}, "id": "1"}) == ["."]
+    assert tool_call_paths(
+        {"name": "WriteFiles", "args": {"files": [{"path": "a"}, {"path": "b/"}]}}
+    ) == ["a", "b"]
+
+
+def test_scheduler_orders_conflicting_calls_and_parallelizes_the_rest():
+    scheduler = ToolCallScheduler(["ReadFile"], max_workers=4, mode="parallel")
+    events = []
+    lock = threading.Lock()
+
+    def execute(request):
+        call_id = request.tool_call["id"]
+        with lock:
+            events.append(f"start {call_id}")
+        time.sleep(0.05 if call_id == "w" else 0)
+        with lock:
+            events.append(f"end {call_id}")
+
+    # Потоки запускаются в обратном порядке, чтобы порядок не был случайно верным.
+    threads = [
+        threading.Thread(target=scheduler.wrap_tool_call, args=(request, execute))
+        for request in reversed(make_requests())
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert events.index("end w") < events.index("start r1")
+    assert events.index("end r2") < events.index("end w")
+    assert scheduler._steps == {}
+
+
+def test_sequential_mode_runs_calls_in_order():
+    scheduler = ToolCallScheduler(["ReadFile"], max_workers=4, mode="sequential")
+    order = []
+
+    async def execute(request):
+        await asyncio.sleep(0.01 if request.tool_call["id"] == "w" else 0)
+        order.append(request.tool_call["id"])
+
+    async def run():
+        await asyncio.gather(
+            *(
+                scheduler.awrap_tool_call(request, execute)
+                for request in reversed(make_requests())
+            )
+        )
+
+    asyncio.run(run())
+
+    assert order == ["w", "r1", "r2"]
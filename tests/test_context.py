@@ -0,0 +1,117 @@
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from modules.utils.context import SUMMARY_HEADER, ContextManager
+
+
+def count_words(message):
+    return len(message.content.split())
+
+
+def make_manager(budget):
+    return ContextManager(
+        token_budget=budget, summary_max_tokens=100, token_counter=count_words
+    )
+
+
+BIG_RESULT = " ".join(["x" * 30] * 60)
+
+
+def tool_turn(call_id, result):
+    return [
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "ReadFile", "args": {"path": "a"}, "id": call_id}],
+        ),
+        ToolMessage(content=result, tool_call_id=call_id, name="ReadFile"),
+    ]
+
+
+def test_messages_within_budget_are_untouched():
+    messages = [HumanMessage(content="one two"), AIMessage(content="three")]
+
+    assert make_manager(10).manage(messages) == messages
+
+
+def test_old_turns_are_summarized_and_tool_pairs_kept_atomic():
+    manager = make_manager(40)
+    messages = [
+        HumanMessage(content="создай проект"),
+        *tool_turn("1", BIG_RESULT),
+        *tool_turn("2", "small result"),
+        AIMessage(content="готово"),
+    ]
+
+    result = manager.manage(messages)
+
+    assert result[0] is messages[0]
+    assert result[1].content.startswith(SUMMARY_HEADER)
+    assert "Агент вызвал ReadFile" in result[1].content
+    assert result[2:] == messages[3:]
+    assert manager.last_trimmed == 2
+
+
+def test_summary_is_rolling_and_monotonic():
+    manager = make_manager(50)
+    messages = [
+        HumanMessage(content="task"),
+        *tool_turn("1", "a b c d e f g " + BIG_RESULT),
+        HumanMessage(content="next"),
+        AIMessage(content="ok"),
+    ]
+    manager.manage(messages)
+    first_summary = manager.summary
+    assert "a b c d e f g" in first_summary
+
+    # Свернутый ход не возвращается в окно, даже если теперь в него помещается.
+    messages += [HumanMessage(content="more"), AIMessage(content="ok")]
+    result = manager.manage(messages)
+
+    assert manager.summary == first_summary
+    assert [m.content for m in result[2:]] == ["next", "ok", "more", "ok"]
+
+
+def test_token_counts_are_cached():
+    calls = []
+
+    def counter(message):
+        calls.append(message)
+        return 1
+
+    manager = ContextManager(
+        token_budget=100, summary_max_tokens=0, token_counter=counter
+    )
+    messages = [HumanMessage(content="a"), AIMessage(content="b")]
+    manager.manage(messages)
+    manager.manage(messages)
+
+    assert len(calls) == 2
+
+
+def test_summary_counts_against_budget():
+    manager = make_manager(80)
+    messages = [HumanMessage(content="task")]
+    for i in range(6):
+        messages += [*tool_turn(str(i), BIG_RESULT), AIMessage(content="ok")]
+
+    result = manager.manage(messages)
+
+    assert result[1].content.startswith(SUMMARY_HEADER)
+    assert sum(count_words(message) for message in result) <= 80
+
+
+def test_context_managers_are_bounded(monkeypatch):
+    from modules.utils import utils
+
+    monkeypatch.setattr(utils, "MAX_CONTEXT_MANAGERS", 2)
+    monkeypatch.setattr(utils, "_context_managers", OrderedDict())
+    first = utils.get_context_manager("a")
+    utils.get_context_manager("b")
+    assert utils.get_context_manager("a") is first
+
+    utils.get_context_manager("c")
+
+    assert list(utils._context_managers) == ["a", "c"]
+    utils.drop_context_manager("a")
+    assert list(utils._context_managers) == ["c"]
@@ -0,0 +1,125 @@
+import pytest
+
+from modules.utils import tools
+
+SOURCE = "def foo():\n    return 1\n\n\ndef bar():\n    return 2\n"
+
+
+@pytest.fixture
+def source_file(workspace):
+    path = workspace / "module.py"
+    path.write_text(SOURCE, encoding="utf-8")
+    return path
+
+
+def test_replace_in_file_replaces_unique_fragment(source_file):
+    result = tools.replace_in_file("module.py", "return 2", "return 3")
+
+    assert "успешно отредактирован" in result
+    assert source_file.read_text(encoding="utf-8") == SOURCE.replace(
+        "return 2", "return 3"
+    )
+
+
+def test_replace_in_file_rejects_ambiguous_fragment(source_file):
+    result = tools.replace_in_file("module.py", "    return", "    yield")
+
+    assert "2 раз(а)" in result
+    assert source_file.read_text(encoding="utf-8") == SOURCE
+    assert [p.name for p in source_file.parent.iterdir()] == ["module.py"]
+
+
+def test_replace_in_file_handles_chunk_boundaries(workspace, monkeypatch):
+    monkeypatch.setattr(tools, "REPLACE_CHUNK_SIZE", 3)
+    path = workspace / "small.txt"
+    path.write_text("abcXYZabcXYZ", encoding="utf-8")
+
+    result = tools.replace_in_file("small.txt", "cXYZa", "-", replace_all=True)
+
+    assert "Замен: 1" in result
+    assert path.read_text(encoding="utf-8") == "ab-bcXYZ"
+
+
+def test_insert_and_delete_lines(source_file):
+    tools.insert_lines("module.py", 0, "import os")
+    tools.delete_lines("module.py", 4, 7)
+
+    assert (
+        source_file.read_text(encoding="utf-8")
+        == "import os\ndef foo():\n    return 1\n"
+    )
+
+
+def test_delete_lines_out_of_range_keeps_file(source_file):
+    result = tools.delete_lines("module.py", 5, 100)
+
+    assert "Ошибка" in result
+    assert source_file.read_text(encoding="utf-8") == SOURCE
+
+
+def test_apply_patch_with_inexact_line_numbers(source_file):
+    patch = (
+        "--- a/module.py\n"
+        "+++ b/module.py\n"
+        "@@ -1,3 +1,3 @@\n"
+        " def bar():\n"
+        "-    return 2\n"
+        "+    return 42\n"
+    )
+
+    result = tools.apply_patch("module.py", patch)
+
+    assert "Ханков: 1" in result
+    assert source_file.read_text(encoding="utf-8") == SOURCE.replace(
+        "return 2", "return 42"
+    )
+
+
+def test_apply_patch_mismatch_keeps_file(source_file):
+    patch = "@@ -1,2 +1,2 @@\n def baz():\n-    pass\n+    return None\n"
+
+    result = tools.apply_patch("module.py", patch)
+
+    assert "не совпадает" in result
+    assert source_file.read_text(encoding="utf-8") == SOURCE
+
+
+def test_append_to_file_appends_and_does_not_create(source_file, workspace):
+    assert "успешно отредактирован" in tools.append_to_file("module.py", "# end\n")
+    assert source_file.read_text(encoding="utf-8") == SOURCE + "# end\n"
+
+    result = tools.append_to_file("missing.py", "x = 1\n")
+
+    assert "не найден" in result
+    assert not (workspace / "missing.py").exists()
+
+
+def test_edits_keep_crlf_line_endings(workspace):
+    path = workspace / "win.txt"
+    path.write_bytes(SOURCE.replace("\n", "\r\n").encode("utf-8"))
+    patch = "@@ -5,2 +5,2 @@\n def bar():\n-    return 2\n+    return 42\n"
+
+    tools.replace_in_file("win.txt", "return 1\n", "return 10\n")
+    tools.insert_lines("win.txt", 0, "import os")
+    tools.apply_patch("win.txt", patch)
+
+    expected = "import os\n" + SOURCE.replace("return 1", "return 10").replace(
+        "return 2", "return 42"
+    )
+    assert path.read_bytes() == expected.replace("\n", "\r\n").encode("utf-8")
+
+
+def test_apply_patch_prefers_match_nearest_to_header(workspace):
+    path = workspace / "dup.py"
+    path.write_text("x = 1\ny = 2\n\nx = 1\ny = 2\n", encoding="utf-8")
+    patch = "@@ -4,2 +4,2 @@\n x = 1\n-y = 2\n+y = 3\n"
+
+    assert "Ханков: 1" in tools.apply_patch("dup.py", patch)
+    assert path.read_text(encoding="utf-8") == "x = 1\ny = 2\n\nx = 1\ny = 3\n"
+
+    two_hunks = (
+        "@@ -1,2 +1,2 @@\n x = 1\n-y = 2\n+y = 0\n"
+        "@@ -4,2 +4,2 @@\n x = 1\n-y = 3\n+y = 4\n"
+    )
+    tools.apply_patch("dup.py", two_hunks)
+    assert path.read_text(encoding="utf-8") == "x = 1\ny = 0\n\nx = 1\ny = 4\n"
@@ -0,0 +1,103 @@
+import os
+
+from modules.settings.agent_config import settings
+from modules.utils import tools
+from modules.utils.journal import journal_for
+
+
+def journal():
+    return journal_for(tools.current_sandbox().root)
+
+
+def test_undo_write_restores_previous_content(workspace):
+    (workspace / "a.txt").write_text("old\n", encoding="utf-8")
+    tools.write_file("a.txt", "new\n")
+    tools.write_file("nested/dir/b.txt", "b\n")
+
+    result = tools.undo(2)
+
+    assert "Отменено шагов: 2" in result
+    assert (workspace / "a.txt").read_text(encoding="utf-8") == "old\n"
+    assert not (workspace / "nested").exists()
+    assert "пуст" in tools.undo()
+    assert journal().stats()["blobs"] == 0
+
+
+def test_undo_delete_directory_restores_tree(workspace):
+    (workspace / "src" / "pkg").mkdir(parents=True)
+    (workspace / "src" / "pkg" / "mod.py").write_text("x = 1\n", encoding="utf-8")
+    (workspace / "src" / "main.py").write_text("print()\n", encoding="utf-8")
+
+    tools.delete_directory("src")
+    tools.undo()
+
+    assert (workspace / "src" / "pkg" / "mod.py").read_text(
+        encoding="utf-8"
+    ) == "x = 1\n"
+    assert (workspace / "src" / "main.py").read_text(encoding="utf-8") == "print()\n"
+    assert "x = 1" in tools.read_file("src/pkg/mod.py")
+
+
+def test_undo_append_and_rename(workspace):
+    (workspace / "log.txt").write_text("one\n", encoding="utf-8")
+    tools.append_to_file("log.txt", "two\n")
+    tools.rename_or_move("log.txt", "journal.txt")
+
+    tools.undo()
+    assert (workspace / "log.txt").read_text(encoding="utf-8") == "one\ntwo\n"
+    tools.undo()
+    assert (workspace / "log.txt").read_text(encoding="utf-8") == "one\n"
+
+
+def test_restore_snapshot(workspace):
+    (workspace / "a.txt").write_text("v1\n", encoding="utf-8")
+    assert "создан" in tools.snapshot("base")
+    tools.write_file("a.txt", "v2\n")
+    tools.replace_in_file("a.txt", "v2", "v3")
+    tools.write_file("b.txt", "b\n")
+
+    result = tools.restore("base")
+
+    assert "Отменено шагов: 3" in result
+    assert (workspace / "a.txt").read_text(encoding="utf-8") == "v1\n"
+    assert not (workspace / "b.txt").exists()
+    assert "'base'" in tools.restore("missing")
+
+
+def test_noop_calls_do_not_create_steps(workspace):
+    (workspace / "a.txt").write_text("same\n", encoding="utf-8")
+
+    tools.write_file("a.txt", "same\n")
+    tools.delete_file("missing.txt")
+    tools.replace_in_file("a.txt", "absent", "x")
+
+    assert journal().stats() == {"steps": 0, "snapshots": 0, "blobs": 0, "bytes": 0}
+    # Блоб от неудавшейся правки не должен остаться жесткой ссылкой на рабочий файл.
+    assert os.stat(workspace / "a.txt").st_nlink == 1
+
+
+def test_identical_contents_share_one_blob(workspace):
+    for name in ("a.txt", "b.txt"):
+        (workspace / name).write_text("same content\n", encoding="utf-8")
+
+    tools.delete_file("a.txt")
+    tools.delete_file("b.txt")
+
+    stats = journal().stats()
+    assert stats["steps"] == 2
+    assert stats["blobs"] == 1
+
+
+def test_gc_bounds_steps_and_drops_stale_snapshots(workspace, monkeypatch):
+    monkeypatch.setattr(settings, "JOURNAL_MAX_STEPS", 3)
+    tools.write_file("a.txt", "v0\n")
+    tools.snapshot("early")
+    for version in range(1, 6):
+        tools.write_file("a.txt", f"v{version}\n")
+
+    stats = journal().stats()
+    assert stats["steps"] == 3
+    assert stats["snapshots"] == 0
+    assert stats["blobs"] == 3
+    blobs = [f for _, _, files in os.walk(journal().objects_dir) for f in files]
+    assert len(blobs) == 3
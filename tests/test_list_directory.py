@@ -0,0 +1,85 @@
+from modules.utils import tools
+from modules.utils.ignore import IgnoreMatcher, parse_gitignore
+
+
+def test_gitignore_rules():
+    matcher = IgnoreMatcher(
+        parse_gitignore("*.log\n!keep.log\n/build_out/\ndocs/*.tmp")
+    )
+
+    assert matcher.is_ignored("a/b/debug.log", is_dir=False)
+    assert not matcher.is_ignored("keep.log", is_dir=False)
+    assert matcher.is_ignored("build_out", is_dir=True)
+    assert not matcher.is_ignored("src/build_out", is_dir=True)
+    assert matcher.is_ignored("docs/x.tmp", is_dir=False)
+    assert not matcher.is_ignored("docs/a/b.tmp", is_dir=False)
+    assert matcher.is_ignored("node_modules", is_dir=True)
+
+
+def test_tree_renders_nested_structure(workspace):
+    (workspace / "app" / "core").mkdir(parents=True)
+    (workspace / "app" / "core" / "models.py").write_text("")
+    (workspace / "app" / "main.py").write_text("")
+    (workspace / "README.md").write_text("")
+
+    result = tools.list_directory_tree()
+
+    assert result.splitlines()[1:] == [
+        "├── README.md",
+        "└── app/",
+        "    ├── core/",
+        "    │   └── models.py",
+        "    └── main.py",
+    ]
+
+
+def test_tree_skips_ignored_and_collapses(workspace, monkeypatch):
+    monkeypatch.setattr(tools, "TREE_COLLAPSE_THRESHOLD", 3)
+    (workspace / ".gitignore").write_text("*.log\n")
+    (workspace / "debug.log").write_text("")
+    (workspace / "node_modules" / "dep").mkdir(parents=True)
+    (workspace / "data").mkdir()
+    for i in range(1500):
+        (workspace / "data" / f"{i}.csv").write_text("")
+    (workspace / "deep" / "a" / "b").mkdir(parents=True)
+
+    result = tools.list_directory_tree(max_depth=2)
+
+    assert "debug.log" not in result
+    assert "node_modules" not in result
+    assert "data/ (1 500 файлов)" in result
+    assert "a/ (1 папка, 0 файлов)" in result
+
+
+def test_tree_respects_max_entries(workspace):
+    for i in range(10):
+        (workspace / f"f{i}.txt").write_text("")
+
+    result = tools.list_directory_tree(max_entries=3)
+
+    assert "f2.txt" in result
+    assert "f3.txt" not in result
+    assert "вывод обрезан" in result
+
+
+def test_list_directory_marks_dirs(workspace):
+    (workspace / "sub").mkdir()
+    (workspace / "file.txt").write_text("")
+
+    assert tools.list_directory().splitlines()[1:] == ["- [F] file.txt", "- [D] sub"]
+
+
+def test_gitignore_double_star_and_plural_summary():
+    matcher = IgnoreMatcher(
+        parse_gitignore("logs/**/*.gz\n*.py[co]"), use_defaults=False
+    )
+
+    assert matcher.is_ignored("logs/a.gz", is_dir=False)
+    assert matcher.is_ignored("logs/2024/01/a.gz", is_dir=False)
+    assert not matcher.is_ignored("other/logs/a.gz", is_dir=False)
+    assert matcher.is_ignored("pkg/mod.pyc", is_dir=False)
+
+    assert tools._format_count(1, ("файл", "файла", "файлов")) == "1 файл"
+    assert tools._format_count(3, ("файл", "файла", "файлов")) == "3 файла"
+    assert tools._format_count(12, ("файл", "файла", "файлов")) == "12 файлов"
+    assert tools._format_count(1521, ("файл", "файла", "файлов")) == "1 521 файл"
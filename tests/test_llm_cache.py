@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration
+
+from modules.utils.llm_cache import (
+    LLMCacheMissError,
+    MemoryLLMCache,
+    SQLiteLLMCache,
+    cache_key,
+)
+
+
+def generation(text):
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def test_cache_key_ignores_message_ids():
+    first = dumps([HumanMessage(content="hi", id="1"), AIMessage(content="a", id="x")])
+    second = dumps([HumanMessage(content="hi", id="2"), AIMessage(content="a")])
+    other = dumps([HumanMessage(content="hello", id="1")])
+
+    assert cache_key(first, "model") == cache_key(second, "model")
+    assert cache_key(first, "model") != cache_key(first, "other-model")
+    assert cache_key(first, "model") != cache_key(other, "model")
+
+
+def test_memory_cache_lru_and_ttl(monkeypatch):
+    cache = MemoryLLMCache(max_entries=2, ttl_seconds=10)
+    cache.update("a", "m", generation("A"))
+    cache.update("b", "m", generation("B"))
+    cache.lookup("a", "m")
+    cache.update("c", "m", generation("C"))
+
+    assert cache.lookup("b", "m") is None
+    assert cache.lookup("a", "m")[0].text == "A"
+
+    now = time.time()
+    monkeypatch.setattr("modules.utils.llm_cache.time.time", lambda: now + 60)
+    assert cache.lookup("a", "m") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_sqlite_cache_persists_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    SQLiteLLMCache(path).update("p", "m", generation("saved"))
+
+    assert SQLiteLLMCache(path).lookup("p", "m")[0].text == "saved"
+
+
+def test_replay_mode_serves_recorded_answers_offline(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    recorder = GenericFakeChatModel(
+        messages=iter([AIMessage(content="recorded")]), cache=SQLiteLLMCache(path)
+    )
+    recorder.invoke([HumanMessage(content="question")])
+
+    replay_cache = SQLiteLLMCache(path, replay=True)
+    offline = GenericFakeChatModel(messages=iter([]), cache=replay_cache)
+
+    assert offline.invoke([HumanMessage(content="question")]).content == "recorded"
+    with pytest.raises(LLMCacheMissError):
+        offline.invoke([HumanMessage(content="new question")])
+    assert replay_cache.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
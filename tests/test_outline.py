@@ -0,0 +1,119 @@
+from modules.settings.agent_config import settings
+from modules.utils import outline_parsers, tools
+
+MODELS = '''class User(Base):
+    """Пользователь."""
+
+    def full_name(self, sep: str = " ") -> str:
+        return sep.join([self.first, self.last])
+
+    class Meta:
+        table = "users"
+
+
+async def load_user(user_id: int) -> "User":
+    def nested():
+        pass
+'''
+
+
+def test_file_outline_python(workspace):
+    (workspace / "models.py").write_text(MODELS, encoding="utf-8")
+
+    result = tools.file_outline("models.py")
+
+    assert "models.py (объявлений: 4)" in result
+    assert "  1-8: class User(Base)" in result
+    assert "    4-5: def full_name(self, sep: str=' ') -> str" in result
+    assert "    7-8: class Meta" in result
+    assert "  11-13: async def load_user(user_id: int) -> 'User'" in result
+    assert "nested" not in result
+
+    (workspace / "broken.py").write_text("def broken(:\n", encoding="utf-8")
+    assert "строка 1" in tools.file_outline("broken.py")
+    (workspace / "notes.txt").write_text("text\n", encoding="utf-8")
+    assert "не поддерживается" in tools.file_outline("notes.txt")
+
+
+def test_repo_map_ranks_used_files_first(workspace):
+    (workspace / "app").mkdir()
+    (workspace / "app" / "models.py").write_text(MODELS, encoding="utf-8")
+    (workspace / "app" / "api.py").write_text(
+        "from app.models import User, load_user\n\ndef handler():\n    return User()\n",
+        encoding="utf-8",
+    )
+    (workspace / "app" / "cli.py").write_text(
+        "from app.models import load_user\n\ndef main():\n    load_user(1)\n",
+        encoding="utf-8",
+    )
+    (workspace / "node_modules").mkdir()
+    (workspace / "node_modules" / "dep.js").write_text("function dep() {}\n")
+
+    result = tools.repo_map()
+
+    assert result.splitlines()[0] == "app/models.py"
+    assert result.index("app/models.py") < result.index("app/api.py")
+    assert "  3: def handler()" in result
+    assert "dep.js" not in result
+
+    truncated = tools.repo_map(max_tokens=10)
+    assert "показано файлов: 1 из 3" in truncated
+    assert "app/api.py" not in truncated
+
+
+def test_outline_follows_mutating_tools(workspace):
+    tools.write_file("a.py", "def first():\n    pass\n")
+    assert "def first()" in tools.repo_map()
+
+    tools.replace_in_file("a.py", "first", "second")
+    assert "def second()" in tools.repo_map()
+
+    tools.write_file("copy.py", "def second():\n    pass\n")
+    index = tools._outline_for(str(workspace))
+    # Одинаковое содержимое разбирается и хранится один раз.
+    assert len(index._parsed) == 1
+
+    tools.rename_or_move("a.py", "b.py")
+    tools.delete_file("copy.py")
+    result = tools.repo_map()
+    assert result.splitlines()[0] == "b.py"
+    assert "copy.py" not in result
+
+    tools.undo()
+    assert "copy.py" in tools.repo_map()
+
+
+def test_pool_build_matches_inline(workspace, monkeypatch):
+    for i in range(12):
+        (workspace / f"m{i}.py").write_text(
+            f"class C{i}:\n    def run(self, x):\n        return C{(i + 1) % 12}\n",
+            encoding="utf-8",
+        )
+    inline = tools.repo_map()
+
+    tools._outline_for(str(workspace))._built_at = None
+    tools._outline_for(str(workspace))._files.clear()
+    monkeypatch.setattr(settings, "OUTLINE_WORKERS", 2)
+    monkeypatch.setattr(settings, "OUTLINE_POOL_MIN_FILES", 1)
+
+    assert tools.repo_map() == inline
+
+
+def test_register_custom_parser(workspace, monkeypatch):
+    class SqlParser:
+        extensions = (".sql",)
+
+        def parse(self, text):
+            symbols = [
+                outline_parsers.Symbol("table", line.split()[2], line.strip(), n, n, 0)
+                for n, line in enumerate(text.splitlines(), start=1)
+                if line.upper().startswith("CREATE TABLE")
+            ]
+            return outline_parsers.ParsedFile(tuple(symbols), frozenset())
+
+    monkeypatch.setitem(outline_parsers.PARSERS, ".sql", SqlParser())
+    (workspace / "schema.sql").write_text(
+        "-- схема\nCREATE TABLE users (id int);\n", encoding="utf-8"
+    )
+
+    assert "  2: CREATE TABLE users (id int);" in tools.file_outline("schema.sql")
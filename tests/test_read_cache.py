@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from modules.utils import read_cache as read_cache_module
+from modules.utils import search_index, tools
+from modules.utils.read_cache import ReadCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """Свежий кэш чтения, подставленный в инструменты и поисковый индекс."""
+    fresh = ReadCache(max_bytes=10**6, max_file_bytes=10**5)
+    monkeypatch.setattr(read_cache_module, "read_cache", fresh)
+    monkeypatch.setattr(tools, "read_cache", fresh)
+    monkeypatch.setattr(search_index, "read_cache", fresh)
+    return fresh
+
+
+def test_repeated_read_is_a_hit(workspace, cache):
+    (workspace / "a.txt").write_text("one\ntwo\n", encoding="utf-8")
+
+    first = tools.read_file("a.txt")
+    second = tools.read_file("a.txt")
+
+    assert first == second and "two" in second
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_external_change_invalidates_entry(workspace, cache):
+    path = workspace / "a.txt"
+    path.write_text("old\n", encoding="utf-8")
+    tools.read_file("a.txt")
+    stat = path.stat()
+
+    path.write_text("new!\n", encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert "new!" in tools.read_file("a.txt")
+    assert cache.stats()["misses"] == 2
+
+
+def test_writes_update_cache(workspace, cache):
+    tools.write_file("a.txt", "hello\n")
+    assert "hello" in tools.read_file("a.txt")
+
+    tools.append_to_file("a.txt", "world\n")
+    assert "world" in tools.read_file("a.txt")
+
+    tools.rename_or_move("a.txt", "b.txt")
+    content = tools.read_file("b.txt")
+
+    assert "hello" in content and "world" in content
+    assert cache.stats()["misses"] == 0
+
+
+def test_lru_eviction_is_bounded_by_bytes(workspace):
+    cache = ReadCache(max_bytes=250, max_file_bytes=1000)
+    for name in "abc":
+        (workspace / name).write_bytes(name.encode() * 100)
+        cache.get(str(workspace / name))
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 250
+    assert stats["paths"] == 2
+    assert cache.peek(str(workspace / "a")) is None
+
+
+def test_identical_files_share_blob(workspace):
+    cache = ReadCache(max_bytes=10**6, max_file_bytes=10**5)
+    for name in ("a.txt", "b.txt"):
+        (workspace / name).write_text("same content\n", encoding="utf-8")
+        cache.get(str(workspace / name))
+
+    stats = cache.stats()
+    assert stats["paths"] == 2
+    assert stats["blobs"] == 1
+    assert stats["bytes"] == len("same content\n")
+
+
+def test_large_files_bypass_cache(workspace):
+    cache = ReadCache(max_bytes=10**6, max_file_bytes=10)
+    (workspace / "big.txt").write_text("x" * 100, encoding="utf-8")
+
+    assert cache.get(str(workspace / "big.txt")) is None
+    assert cache.stats()["bypassed"] == 1
@@ -0,0 +1,59 @@
+from modules.utils import line_index, tools
+
+
+def test_read_file_small_file_returned_whole(workspace):
+    (workspace / "a.txt").write_text("one\ntwo\n", encoding="utf-8")
+
+    assert tools.read_file("a.txt") == "Содержимое файла 'a.txt':\n\none\ntwo\n"
+
+
+def test_read_file_window_and_continuation_marker(workspace):
+    lines = [f"line {i}\n" for i in range(1, 101)]
+    (workspace / "big.txt").write_text("".join(lines), encoding="utf-8")
+
+    result = tools.read_file("big.txt", offset=10, limit=5)
+
+    assert "(строки 10-14 из 100)" in result
+    assert "".join(lines[9:14]) in result
+    assert "line 15\n" not in result
+    assert "offset=15" in result
+
+
+def test_read_file_byte_cap_cuts_at_line_boundary(workspace):
+    (workspace / "big.txt").write_text("aaaa\nbbbb\ncccc\n", encoding="utf-8")
+
+    result = tools.read_file("big.txt", max_bytes=12)
+
+    assert "aaaa\nbbbb\n" in result
+    assert "cccc" not in result
+    assert "offset=3" in result
+
+
+def test_read_file_line_numbers(workspace):
+    (workspace / "a.txt").write_text("x\ny", encoding="utf-8")
+
+    result = tools.read_file("a.txt", offset=2, line_numbers=True)
+
+    assert result.endswith("     2\ty")
+
+
+def test_read_file_summarizes_binary(workspace):
+    (workspace / "blob.bin").write_bytes(b"\x89PNG\x00\x01\x02")
+
+    result = tools.read_file("blob.bin")
+
+    assert "бинарный" in result
+    assert "89 50 4e 47" in result
+
+
+def test_line_index_is_cached_and_invalidated(workspace):
+    path = workspace / "a.txt"
+    path.write_text("1\n2\n", encoding="utf-8")
+    safe_path = tools._get_safe_path("a.txt")
+
+    first = line_index.get_line_index(safe_path)
+    assert line_index.get_line_index(safe_path) is first
+    assert list(first.offsets) == [0, 2]
+
+    path.write_text("1\n2\n3\n", encoding="utf-8")
+    assert line_index.get_line_index(safe_path).line_count == 3
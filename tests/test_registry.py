@@ -0,0 +1,29 @@
+import modules.utils.tools  # noqa: F401 — регистрирует инструменты
+from modules.schemas import tools_schemas
+from modules.utils.registry import (
+    TOOL_REGISTRY,
+    get_structured_tools,
+    read_only_tool_names,
+    snake_to_pascal,
+)
+
+
+def test_tools_are_registered_with_schemas():
+    assert TOOL_REGISTRY["ReadFile"].args_schema is tools_schemas.ReadFileSpec
+    assert TOOL_REGISTRY["WriteFiles"].args_schema is tools_schemas.WriteFilesSpec
+    assert "WriteFile" not in read_only_tool_names()
+    assert {"ReadFile", "ListDirectoryTree", "SearchWorkspace"} <= set(
+        read_only_tool_names()
+    )
+
+
+def test_structured_tools_are_built_once():
+    structured_tools = get_structured_tools()
+
+    assert structured_tools is get_structured_tools()
+    assert [tool.name for tool in structured_tools] == list(TOOL_REGISTRY)
+    assert all(tool.coroutine is not None for tool in structured_tools)
+
+
+def test_snake_to_pascal():
+    assert snake_to_pascal("list_directory_tree") == "ListDirectoryTree"
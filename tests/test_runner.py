@@ -0,0 +1,136 @@
+import os
+import sys
+
+import pytest
+
+from modules.settings.agent_config import settings
+from modules.utils import runner, tools
+
+TESTS = """
+def test_ok():
+    assert 1 + 1 == 2
+
+
+def test_fails():
+    assert "ab" == "ac"
+"""
+
+
+@pytest.fixture
+def agent_path(monkeypatch):
+    """PATH, в котором python и pytest — интерпретатор агента (как в его virtualenv)."""
+    agent_bin = os.path.dirname(sys.executable)
+    monkeypatch.setenv("PATH", agent_bin + os.pathsep + os.environ["PATH"])
+    return agent_bin
+
+
+@pytest.mark.parametrize("warm", [True, False], ids=["warm", "cold"])
+def test_run_tests(workspace, monkeypatch, agent_path, warm):
+    monkeypatch.setattr(settings, "RUN_WARM_POOL", warm)
+    (workspace / "proj").mkdir()
+    (workspace / "proj" / "test_math.py").write_text(TESTS, encoding="utf-8")
+
+    result = tools.run_tests("proj")
+
+    assert result.startswith("Код выхода: 1.")
+    assert ("теплый процесс" in result.splitlines()[0]) is warm
+    assert "1 failed, 1 passed" in result
+    assert "test_fails" in result
+
+    assert "1 passed" in tools.run_tests("proj", args=["-k", "test_ok"])
+
+
+def test_run_command_script(workspace, monkeypatch):
+    monkeypatch.setenv("SERVICE_API_KEY", "secret-value")
+    (workspace / "app").mkdir()
+    (workspace / "app" / "main.py").write_text(
+        "import os, sys\n"
+        "print('cwd', os.path.basename(os.getcwd()), sys.argv[1:])\n"
+        "print('key', os.environ.get('SERVICE_API_KEY'))\n"
+        "sys.exit(3)\n",
+        encoding="utf-8",
+    )
+
+    result = tools.run_command("python main.py 'a b' c", cwd="app")
+
+    assert result.startswith("Код выхода: 3.")
+    assert "cwd app ['a b', 'c']" in result
+    assert "key None" in result
+    assert "Команда не найдена" in tools.run_command("no-such-binary-here")
+    assert "пределы рабочей директории" in tools.run_command("ls", cwd="..")
+
+
+def test_run_command_timeout_kills_process(workspace):
+    result = tools.run_command(
+        f"{sys.executable} -c \"print('start', flush=True); import time; time.sleep(30)\"",
+        timeout=1,
+    )
+
+    assert result.startswith("Прервано по таймауту (1 с)")
+    assert "start" in result
+
+
+def test_command_changes_are_visible_to_tools(workspace):
+    tools.write_file("data.txt", "old value\n")
+    assert "data.txt:1" in tools.search_workspace("old value")
+    assert "def first" not in tools.repo_map()
+
+    tools.run_command(
+        "python -c \"open('data.txt', 'w').write('new value\\n'); "
+        "open('mod.py', 'w').write('def first():\\n    pass\\n')\""
+    )
+
+    assert "data.txt:1: new value" in tools.search_workspace("new value")
+    assert "new value" in tools.read_file("data.txt")
+    assert "def first()" in tools.repo_map()
+
+
+def test_output_capture_keeps_head_and_tail():
+    capture = runner.OutputCapture(400)
+    for i in range(1000):
+        capture.feed(f"line {i}\n".encode())
+
+    text = capture.text()
+
+    assert text.startswith("line 0\n")
+    assert text.endswith("line 999\n")
+    assert "пропущено" in text
+    assert len(text) < 500
+
+
+def test_python_job(agent_path, tmp_path):
+    python = os.path.basename(sys.executable)
+    assert runner.python_job(["pytest", "-x"]) == ("module", "pytest", ["pytest", "-x"])
+    assert runner.python_job([python, "-m", "app", "1"]) == (
+        "module",
+        "app",
+        ["app", "1"],
+    )
+    assert runner.python_job([sys.executable, "run.py", "1"]) == (
+        "path",
+        "run.py",
+        ["run.py", "1"],
+    )
+    assert runner.python_job([python, "-u", "run.py"]) is None
+    assert runner.python_job(["ls", "-la"]) is None
+
+    # Интерпретатор другого окружения (например, virtualenv проекта)
+    # запускается как есть, а не подменяется интерпретатором агента.
+    venv_bin = tmp_path / "venv" / "bin"
+    venv_bin.mkdir(parents=True)
+    (venv_bin / "python").symlink_to(sys.executable)
+    (venv_bin / "pytest").write_text("#!/bin/sh\n", encoding="utf-8")
+    (venv_bin / "pytest").chmod(0o755)
+    assert runner.python_job(["venv/bin/python", "-m", "app"], str(tmp_path)) is None
+    assert runner.python_job(["venv/bin/pytest"], str(tmp_path)) is None
+
+
+def test_commands_are_disabled_for_server_sessions(workspace, monkeypatch):
+    token = tools.session_sandbox.set(tools.sandbox)
+    try:
+        assert "выключен" in tools.run_command("ls")
+        assert "выключен" in tools.run_tests()
+        monkeypatch.setattr(settings, "SERVER_ALLOW_COMMANDS", True)
+        assert tools.run_command("ls").startswith("Код выхода: 0.")
+    finally:
+        tools.session_sandbox.reset(token)
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from modules.utils import tools
+from modules.utils.sandbox import Sandbox
+
+
+def test_sibling_directory_with_same_prefix_is_rejected(tmp_path):
+    (tmp_path / "workspace2").mkdir()
+    sandbox = Sandbox([tmp_path / "workspace"])
+
+    with pytest.raises(ValueError):
+        sandbox.resolve("../workspace2/secret.txt")
+    with pytest.raises(ValueError):
+        sandbox.resolve(str(tmp_path / "workspace2" / "secret.txt"))
+
+
+def test_symlink_escape_is_rejected(tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (tmp_path / "workspace").mkdir()
+    sandbox = Sandbox([tmp_path / "workspace"])
+    os.symlink(outside, tmp_path / "workspace" / "link")
+
+    with pytest.raises(ValueError):
+        sandbox.resolve("link/file.txt")
+    with pytest.raises(ValueError):
+        sandbox.resolve("link")
+
+
+def test_parent_directories_are_cached(tmp_path):
+    sandbox = Sandbox([tmp_path / "workspace"])
+    (tmp_path / "workspace" / "a" / "b").mkdir(parents=True)
+
+    first = sandbox.resolve("a/b/one.txt")
+    second = sandbox.resolve("a/b/two.txt")
+
+    assert os.path.dirname(first) == os.path.dirname(second)
+    assert sandbox.stats()["hits"] == 1
+    assert sandbox.stats()["misses"] == 1
+
+
+def test_invalidate_drops_replaced_directory(tmp_path):
+    root = tmp_path / "workspace"
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    sandbox = Sandbox([root])
+    (root / "a").mkdir(parents=True)
+    sandbox.resolve("a/file.txt")
+
+    # Директорию подменили ссылкой наружу: без сброса кэша это прошло бы.
+    (root / "a").rmdir()
+    os.symlink(outside, root / "a")
+    sandbox.invalidate(str(root / "a"))
+
+    with pytest.raises(ValueError):
+        sandbox.resolve("a/file.txt")
+
+
+def test_multiple_roots(tmp_path):
+    sandbox = Sandbox([tmp_path / "main", tmp_path / "docs"])
+
+    assert sandbox.resolve("x.txt") == str(tmp_path / "main" / "x.txt")
+    docs_file = str(tmp_path / "docs" / "guide.md")
+    assert sandbox.resolve(docs_file) == docs_file
+    assert sandbox.root_of(docs_file) == str(tmp_path / "docs")
+
+
+def test_tools_invalidate_on_delete(workspace):
+    (workspace / "pkg").mkdir()
+    tools.sandbox.resolve("pkg/module.py")
+
+    assert "удалены" in tools.delete_directory("pkg")
+    misses = tools.sandbox.stats()["misses"]
+    tools.sandbox.resolve("pkg/module.py")
+
+    assert tools.sandbox.stats()["misses"] == misses + 1
+
+
+def test_roots_are_created_on_first_use(tmp_path):
+    sandbox = Sandbox([tmp_path / "workspace"])
+    assert not (tmp_path / "workspace").exists()
+
+    sandbox.resolve("file.txt")
+
+    assert (tmp_path / "workspace").is_dir()
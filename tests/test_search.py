@@ -0,0 +1,85 @@
+from modules.utils import search_index, tools
+
+
+def test_required_literals():
+    assert search_index.required_literals(r"def \w+_tool\(") == ["def ", "_tool("]
+    assert search_index.required_literals("foo|bar") == []
+
+
+def test_search_workspace_literal_and_regex(workspace):
+    (workspace / "pkg").mkdir()
+    (workspace / "pkg" / "a.py").write_text("def alpha():\n    pass\n")
+    (workspace / "pkg" / "b.txt").write_text("alpha beta\n")
+
+    result = tools.search_workspace("alpha", glob="*.py")
+    assert "pkg/a.py:1: def alpha():" in result
+    assert "b.txt" not in result
+
+    result = tools.search_workspace(r"^\s+pass$", regex=True)
+    assert "pkg/a.py:2:     pass" in result
+
+
+def test_search_index_follows_mutating_tools(workspace):
+    tools.write_file("a.py", "needle = 1\n")
+    assert "a.py:1" in tools.search_workspace("needle")
+
+    tools.replace_in_file("a.py", "needle", "haystack")
+    assert "не найдено" in tools.search_workspace("needle")
+
+    tools.rename_or_move("a.py", "b.py")
+    assert "b.py:1: haystack = 1" in tools.search_workspace("haystack")
+
+    tools.delete_file("b.py")
+    assert "не найдено" in tools.search_workspace("haystack")
+
+
+def test_find_files_skips_excluded_dirs(workspace):
+    (workspace / "src").mkdir()
+    (workspace / "src" / "main.py").write_text("")
+    (workspace / "node_modules").mkdir()
+    (workspace / "node_modules" / "dep.py").write_text("")
+
+    result = tools.find_files("*.py")
+
+    assert "src/main.py" in result
+    assert "dep.py" not in result
+
+
+def test_search_scans_files_too_large_to_index(workspace, monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_INDEXED_FILE_SIZE", 16)
+    (workspace / "small.txt").write_text("short\n")
+    (workspace / "big.log").write_text("padding line\n" * 10 + "needle here\n")
+
+    assert "big.log:11: needle here" in tools.search_workspace("needle")
+    assert "big.log:11" in tools.search_workspace(r"need\w+", regex=True)
+    assert "не найдено" in tools.search_workspace("absent")
+
+
+def test_glob_is_relative_to_path_in_both_tools(workspace):
+    (workspace / "src" / "pkg").mkdir(parents=True)
+    (workspace / "src" / "pkg" / "mod.py").write_text("target = 1\n")
+
+    assert "src/pkg/mod.py" in tools.find_files("pkg/*.py", path="src")
+    assert "src/pkg/mod.py:1" in tools.search_workspace(
+        "target", glob="pkg/*.py", path="src"
+    )
+    assert "не найдено" in tools.search_workspace(
+        "target", glob="src/pkg/*.py", path="src"
+    )
+
+
+def test_index_updates_by_path_and_skips_excluded_dirs(workspace):
+    tools.write_file("a.txt", "first\n")
+    assert "a.txt:1" in tools.search_workspace("first")
+
+    # Изменение в обход инструментов видно только после expire (как после RunCommand).
+    (workspace / "b.txt").write_text("first\n")
+    assert "b.txt" not in tools.search_workspace("first")
+    search_index.get_index(str(workspace)).expire()
+    assert "b.txt:1" in tools.search_workspace("first")
+
+    tools.write_file("node_modules/dep/index.js", "first\n")
+    tools.write_file("vendor/lib.js", "first\n")
+    tools.rename_or_move("vendor", "node_modules/vendor")
+    result = tools.search_workspace("first")
+    assert "node_modules" not in result and "vendor" not in result
@@ -0,0 +1,141 @@
+import asyncio
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from modules.server.app import AgentServer
+from modules.server.asgi_client import request, websocket_turns
+from modules.utils.fake_llm import ReactiveChatModel
+
+
+def make_server(tmp_path, latency=0.0, **overrides):
+    model = ReactiveChatModel(
+        tool_calls=[("WriteFile", {"path": "note.txt", "content": "привет"})],
+        reply="Файл записан.",
+        latency=latency,
+    )
+    return AgentServer(
+        model=model,
+        checkpointer=InMemorySaver(),
+        workspaces_dir=str(tmp_path / "sessions"),
+        telemetry=False,
+        **overrides,
+    )
+
+
+def test_sse_turn_streams_events_into_session_workspace(tmp_path, workspace):
+    server = make_server(tmp_path)
+
+    async def scenario():
+        created = await request(server, "POST", "/sessions", {"session_id": "alice"})
+        turn = await request(
+            server, "POST", "/sessions/alice/messages", {"message": "запиши"}
+        )
+        info = await request(server, "GET", "/sessions/alice")
+        return created, turn, info
+
+    created, turn, info = asyncio.run(scenario())
+
+    assert created.status == 201
+    types = [event["type"] for _, event in turn.events]
+    assert types[0] == "tool_call" and "tool_result" in types
+    assert types[-1] == "done"
+    assert turn.events[-1][1]["text"].strip() == "Файл записан."
+    assert (tmp_path / "sessions" / "alice" / "note.txt").read_text(
+        encoding="utf-8"
+    ) == "привет"
+    assert not (workspace / "note.txt").exists()
+    assert info.json()["turns"] == 1
+
+
+def test_sessions_run_concurrently_within_llm_limit(tmp_path, workspace):
+    server = make_server(tmp_path, latency=0.05, llm_max_concurrency=2)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(
+                request(server, "POST", f"/sessions/s{i}/messages", {"message": "go"})
+                for i in range(6)
+            )
+        )
+
+    responses = asyncio.run(scenario())
+
+    assert all(r.events[-1][1]["type"] == "done" for r in responses)
+    assert server.llm_limiter.peak == 2
+    assert server.llm_limiter.calls == 12
+    for i in range(6):
+        assert (tmp_path / "sessions" / f"s{i}" / "note.txt").exists()
+
+
+def test_full_queue_is_rejected(tmp_path, workspace):
+    server = make_server(tmp_path, latency=0.05, max_active_turns=1, max_queued_turns=0)
+
+    async def scenario():
+        return await asyncio.gather(
+            request(server, "POST", "/sessions/a/messages", {"message": "go"}),
+            request(server, "POST", "/sessions/b/messages", {"message": "go"}),
+        )
+
+    first, second = asyncio.run(scenario())
+
+    assert first.status == 200
+    assert second.status == 503
+    assert server.turns.rejected == 1
+
+
+def test_websocket_keeps_session_history(tmp_path, workspace):
+    server = make_server(tmp_path)
+
+    async def scenario():
+        turns = await websocket_turns(server, "/sessions/bob/ws", ["первое", "второе"])
+        agent = await server.get_agent()
+        state = await agent.aget_state({"configurable": {"thread_id": "bob"}})
+        return turns, state
+
+    turns, state = asyncio.run(scenario())
+
+    assert [events[-1]["type"] for events in turns] == ["done", "done"]
+    human = [m.content for m in state.values["messages"] if m.type == "human"]
+    assert human == ["первое", "второе"]
+
+
+def test_invalid_session_id_is_rejected(tmp_path):
+    server = make_server(tmp_path)
+
+    response = asyncio.run(request(server, "POST", "/sessions", {"session_id": "../x"}))
+
+    assert response.status == 400
+
+
+def test_queued_turn_in_busy_session_gets_409(tmp_path, workspace):
+    server = make_server(tmp_path, latency=0.05, max_active_turns=1, max_queued_turns=2)
+
+    async def scenario():
+        return await asyncio.gather(
+            request(server, "POST", "/sessions/a/messages", {"message": "go"}),
+            request(server, "POST", "/sessions/b/messages", {"message": "go"}),
+            request(server, "POST", "/sessions/b/messages", {"message": "go"}),
+        )
+
+    responses = asyncio.run(scenario())
+
+    assert [r.status for r in responses] == [200, 200, 409]
+
+
+def test_closing_session_releases_its_state(tmp_path, workspace):
+    from modules.utils import utils
+
+    server = make_server(tmp_path)
+
+    async def scenario():
+        await request(server, "POST", "/sessions/carol/messages", {"message": "go"})
+        server.compactor._seen[("carol", "ReadFile", "{}")] = ("digest", None)
+        server.compactor._seen[("dave", "ReadFile", "{}")] = ("digest", None)
+        assert "carol" in utils._context_managers
+        return await request(server, "DELETE", "/sessions/carol")
+
+    closed = asyncio.run(scenario())
+
+    assert closed.json() == {"closed": True}
+    assert "carol" not in utils._context_managers
+    assert list(server.compactor._seen) == [("dave", "ReadFile", "{}")]
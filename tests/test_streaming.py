@@ -0,0 +1,69 @@
+import io
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+
+from modules.utils.fake_llm import ScriptedChatModel
+from modules.utils.streaming import close_dangling_tool_calls, stream_turn
+
+
+@tool
+def ping(host: str) -> str:
+    """Проверяет доступность хоста."""
+    return f"pong from {host}"
+
+
+def build_agent(replies):
+    return create_react_agent(
+        model=ScriptedChatModel(messages=iter(replies)),
+        tools=[ping],
+        checkpointer=InMemorySaver(),
+    )
+
+
+def test_stream_turn_prints_tokens_and_tool_events():
+    agent = build_agent(
+        [
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "ping", "args": {"host": "a"}, "id": "1"}],
+            ),
+            AIMessage(content="Хост доступен."),
+        ]
+    )
+    out = io.StringIO()
+
+    stream_turn(
+        agent, [HumanMessage("ping a")], {"configurable": {"thread_id": "t"}}, out
+    )
+
+    printed = out.getvalue()
+    assert "→ ping {'host': 'a'}" in printed
+    assert "← ping:" in printed
+    assert "Агент: Хост доступен." in printed
+
+
+def test_close_dangling_tool_calls():
+    agent = build_agent([])
+    config = {"configurable": {"thread_id": "t"}}
+    agent.update_state(
+        config,
+        {
+            "messages": [
+                HumanMessage("ping a"),
+                AIMessage(
+                    content="",
+                    tool_calls=[{"name": "ping", "args": {"host": "a"}, "id": "1"}],
+                ),
+            ]
+        },
+        as_node="agent",
+    )
+
+    close_dangling_tool_calls(agent, config)
+
+    last = agent.get_state(config).values["messages"][-1]
+    assert isinstance(last, ToolMessage)
+    assert last.tool_call_id == "1"
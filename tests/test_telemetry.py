@@ -0,0 +1,88 @@
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+
+from modules.utils import telemetry, utils
+from modules.utils.fake_llm import ScriptedChatModel
+
+
+@tool
+def echo(text: str) -> str:
+    """Возвращает текст."""
+    return text * 3
+
+
+def run_turn(handler, replies, thread_id="telemetry", history=()):
+    agent = create_react_agent(
+        model=ScriptedChatModel(messages=iter(replies)),
+        tools=[echo],
+        pre_model_hook=utils.trim_context_hook,
+        checkpointer=InMemorySaver(),
+    )
+    config = {"configurable": {"thread_id": thread_id}, "callbacks": [handler]}
+    handler.start_turn(thread_id)
+    agent.invoke({"messages": [*history, HumanMessage("hi")]}, config)
+    return handler.end_turn()
+
+
+def test_turn_records_llm_and_tool_spans(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    handler = telemetry.TelemetryHandler(str(path))
+
+    turn = run_turn(
+        handler,
+        [
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "echo", "args": {"text": "ab"}, "id": "1"}],
+            ),
+            AIMessage(content="Готово."),
+        ],
+    )
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert spans[0] == turn
+    assert turn["attributes"]["llm.calls"] == 2
+    assert turn["attributes"]["tool.calls"] == 1
+    tool_span = next(span for span in spans if span["kind"] == "tool")
+    assert tool_span["attributes"]["tool"] == "echo"
+    assert tool_span["attributes"]["output_chars"] == 6
+    assert tool_span["parent_span_id"] == turn["span_id"]
+    assert all(span["trace_id"] == turn["trace_id"] for span in spans)
+
+
+def test_trimmed_messages_are_counted(tmp_path, monkeypatch):
+    handler = telemetry.TelemetryHandler(str(tmp_path / "telemetry.jsonl"))
+    manager = utils.get_context_manager("trimmed")
+    monkeypatch.setattr(manager, "token_budget", 30)
+    history = [HumanMessage("x" * 400, id=str(i)) for i in range(5)]
+
+    turn = run_turn(
+        handler, [AIMessage(content="Готово.")], thread_id="trimmed", history=history
+    )
+
+    assert turn["attributes"]["context.trimmed_messages"] > 0
+    utils._context_managers.pop("trimmed", None)
+
+
+def test_percentile_and_stats():
+    assert telemetry.percentile([5, 1, 3, 2, 4], 50) == 3
+    assert telemetry.percentile(list(range(1, 101)), 95) == 95
+    spans = [
+        {
+            "kind": "tool",
+            "start_time_unix_nano": 0,
+            "end_time_unix_nano": ms * 1_000_000,
+            "attributes": {"tool": "ReadFile", "output_chars": 10},
+        }
+        for ms in (1, 2, 3, 100)
+    ]
+
+    stats = telemetry.format_stats(spans)
+
+    assert "ReadFile, мс" in stats
+    assert "100.0" in stats
+    assert telemetry.format_stats([]) == "Телеметрия пока пуста."
@@ -19,16 +19,18 @@ def setup_workspace(tmp_path: Path):
 
     settings.WORKSPACE_DIR = str(test_workspace)
 
-    # Переинициализация REAL_WORKSPACE_PATH в тестируемом модуле
+    # Переинициализация песочницы в тестируемом модуле
     import modules.utils.tools
+    from modules.utils.sandbox import Sandbox
 
-    modules.utils.tools.REAL_WORKSPACE_PATH = os.path.realpath(settings.WORKSPACE_DIR)
+    original_sandbox = modules.utils.tools.sandbox
+    modules.utils.tools.sandbox = Sandbox([settings.WORKSPACE_DIR])
 
     yield str(test_workspace)
 
     # Восстановление исходной рабочей директории после теста
     settings.WORKSPACE_DIR = original_workspace
-    modules.utils.tools.REAL_WORKSPACE_PATH = os.path.realpath(settings.WORKSPACE_DIR)
+    modules.utils.tools.sandbox = original_sandbox
 
 
 @pytest.mark.parametrize(
@@ -88,3 +90,63 @@ def test_write_file_path_traversal_attack(setup_workspace):
     assert "Попытка доступа за пределы рабочей директории" in result
 
     assert not (Path(setup_workspace) / malicious_path).resolve().exists()
+
+
+def test_write_file_skips_unchanged_content(setup_workspace):
+    """Запись того же содержимого не трогает файл (inode и mtime прежние)."""
+    full_path = Path(setup_workspace) / "test_overwrite.txt"
+    before = full_path.stat()
+
+    result = write_file("test_overwrite.txt", "Initial content.")
+
+    after = full_path.stat()
+    assert "не изменен" in result
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+
+def test_write_file_failure_keeps_previous_version(setup_workspace, monkeypatch):
+    """Сбой при подмене оставляет прежний файл и не оставляет временных файлов."""
+    from modules.utils import tools
+
+    def broken_commit(tmp_path, safe_path):
+        raise OSError("диск отключен")
+
+    monkeypatch.setattr(tools, "_commit", broken_commit)
+
+    result = write_file("test_overwrite.txt", "New content.")
+
+    assert "диск отключен" in result
+    assert (Path(setup_workspace) / "test_overwrite.txt").read_text(
+        encoding="utf-8"
+    ) == "Initial content."
+    assert os.listdir(setup_workspace) == ["test_overwrite.txt"]
+
+
+def test_write_file_fsync_policy(setup_workspace, monkeypatch):
+    """WRITE_FSYNC=dir сбрасывает на диск и файл, и директорию; none — ничего."""
+    from modules.utils import tools
+
+    calls = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(
+        tools.os, "fsync", lambda fd: calls.append(fd) or real_fsync(fd)
+    )
+
+    monkeypatch.setattr(settings, "WRITE_FSYNC", "none")
+    write_file("a.txt", "a")
+    assert calls == []
+
+    monkeypatch.setattr(settings, "WRITE_FSYNC", "dir")
+    write_file("b.txt", "b")
+    assert len(calls) == 2
+
+
+def test_new_files_get_default_permissions(setup_workspace):
+    """Новый файл получает права по umask, а не 0600 временного файла."""
+    umask = os.umask(0)
+    os.umask(umask)
+
+    write_file("new.txt", "content")
+
+    mode = (Path(setup_workspace) / "new.txt").stat().st_mode & 0o777
+    assert mode == 0o666 & ~umask